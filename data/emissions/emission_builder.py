@@ -0,0 +1,163 @@
+import os
+import glob
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import xarray as xr
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor
+from unit_conversion import acei_unit
+from regrid import regrid
+from emission_merge import write_streamed
+
+'''
+    排放清单构建（与物种无关）
+    原 sumHCLnc.py / sumpCLnc.py 为逐行复制的两份脚本，只有变量前缀不同。
+    现在由 SPECIES 和 SECTORS 的声明式映射驱动：
+        ACEIC 变量 {aceic_prefix}_{ACEIC 部门名} -> {物种}_{部门}，如 HCL_power -> HCl_ene
+        GEHC  变量 {物种}_{部门}，部门见 GEHC_SECTORS
+    流程：
+    1. 各物种的 ACEIC 读取、改名、单位换算（unit_conversion.acei_unit）；
+    2. 每个 GEHC 文件只读一次，全部物种的变量一起用缓存权重重网格化（regrid.py），按物种分别写临时文件；
+    3. 各物种按时间顺序流式写出（emission_merge.write_streamed），与 GEHC 重叠的时次以 ACEIC 为准。
+    以上每一步的任务都在同一个进程池中并行。新增物种（如 Cl2、ClNO2 前体物）只需在 SPECIES 中加一项。
+'''
+
+BASE_DIR = "/mnt/d/gasdata/"
+GEHC_DIR = BASE_DIR + "GEHC/"
+OUTPUT_DIR = BASE_DIR + "result/"
+
+# ACEIC 部门名 -> 部门简称
+SECTORS = {
+    'agriculture': 'agri',
+    'biomassburning': 'bbop',
+    'power': 'ene',
+    'industry': 'ind',
+    'residential': 'res',
+}
+GEHC_SECTORS = ('agri', 'bbop', 'ene', 'ind', 'res', 'wstop')
+
+# 物种 -> ACEIC 文件、ACEIC 变量前缀、输出文件名
+SPECIES = {
+    'HCl': {
+        'aceic_file': 'ACEIC-2018/ACEIC_2018_HCL_0.1degree_by_1st_class_sector.nc',
+        'aceic_prefix': 'HCL',
+        'output': 'FinalHcl.nc',
+    },
+    'pCl': {
+        'aceic_file': 'ACEIC-2018/ACEIC_2018_PCL_0.1degree_by_1st_class_sector.nc',
+        'aceic_prefix': 'PCL',
+        'output': 'FinalpCl.nc',
+    },
+}
+ACEIC_START = '2018-01-01'
+
+
+def aceic_renames(species):
+    """ACEIC 变量名 -> 物种变量名"""
+    prefix = SPECIES[species]['aceic_prefix']
+    return {f"{prefix}_{name}": f"{species}_{sector}" for name, sector in SECTORS.items()}
+
+
+def gehc_variables(species):
+    return [f"{species}_{sector}" for sector in GEHC_SECTORS]
+
+
+def load_aceic(species, base_dir=BASE_DIR):
+    """读取 ACEIC，按映射改名、设置时间坐标并换算为 kg m-2 s-1"""
+    acei = xr.open_dataset(os.path.join(base_dir, SPECIES[species]['aceic_file']))
+    renames = aceic_renames(species)
+    acei = acei[[var for var in renames if var in acei.data_vars]].rename(renames)
+    time_coords = pd.date_range(start=ACEIC_START, periods=acei.sizes['time'], freq='MS')
+    acei = acei.assign_coords(time=time_coords)
+    return acei_unit(acei)
+
+
+def _aceic_part(species, base_dir, part_file):
+    """子进程：生成一个物种的 ACEIC 部分，返回目标网格"""
+    acei = load_aceic(species, base_dir)
+    acei.sortby('time').to_netcdf(part_file)
+    return acei['lat'].values, acei['lon'].values
+
+
+def _gehc_parts(file, lat, lon, variables, part_files, method):
+    """子进程：一个 GEHC 文件的全部物种一起重网格化，按物种写临时文件"""
+    with xr.open_dataset(file) as ds:
+        present = {species: [var for var in names if var in ds.data_vars] for species, names in variables.items()}
+        out = regrid(ds, lat, lon, method, variables=sum(present.values(), [])).load()
+        if 'time' in out.dims:
+            out = out.sortby('time')
+    for species, names in present.items():
+        out[names].to_netcdf(part_files[species])
+    return file
+
+
+def build(species_list=None, base_dir=BASE_DIR, gehc_dir=GEHC_DIR, output_dir=OUTPUT_DIR,
+          method='conservative', max_workers=4, preset='archive'):
+    """构建各物种的合并排放文件
+
+    Parameters:
+        species_list (list, optional): 物种，默认为 SPECIES 中的全部
+        method (str): GEHC 重网格化方法，见 regrid.METHODS
+        max_workers (int): 进程数
+        preset (str): 写出预设，见 nc_writer.PRESETS
+    """
+    species_list = list(species_list or SPECIES)
+    nc_files = sorted(f for f in glob.glob(os.path.join(gehc_dir, '*.nc')) if not f.endswith('merged_output.nc'))
+    if not nc_files:
+        print("No NetCDF files found in the input folder.")
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=output_dir)
+    parts = {species: [] for species in species_list}
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # 1. 各物种的 ACEIC
+            futures = {executor.submit(_aceic_part, species, base_dir, os.path.join(tmp_dir, f"{species}_aceic.nc")):
+                       species for species in species_list}
+            grids = {}
+            for future in concurrent.futures.as_completed(futures):
+                species = futures[future]
+                grids[species] = future.result()
+                parts[species].append(os.path.join(tmp_dir, f"{species}_aceic.nc"))
+                print(f"ACEIC {species} 完成")
+            lat, lon = grids[species_list[0]]
+            for species, (other_lat, other_lon) in grids.items():
+                if not (np.array_equal(lat, other_lat) and np.array_equal(lon, other_lon)):
+                    raise ValueError(f"{species} 的 ACEIC 网格与 {species_list[0]} 不同")
+
+            # 2. GEHC：每个文件读一次，全部物种一起重网格化
+            variables = {species: gehc_variables(species) for species in species_list}
+            futures = {}
+            for i, file in enumerate(nc_files):
+                part_files = {species: os.path.join(tmp_dir, f"{species}_{i:04d}.nc") for species in species_list}
+                futures[executor.submit(_gehc_parts, file, lat, lon, variables, part_files, method)] = (i, file, part_files)
+            done = {}
+            for future in concurrent.futures.as_completed(futures):
+                i, file, part_files = futures[future]
+                try:
+                    future.result()
+                    print(f"Successfully processed: {os.path.basename(file)}")
+                except Exception as e:
+                    print(f"Error processing {os.path.basename(file)}: {str(e)}")
+                    continue
+                done[i] = part_files
+            # 重叠时次取排在前面的部分（见 emission_merge），因此顺序固定为 ACEIC、GEHC 按文件名
+            for i in sorted(done):
+                for species, part_file in done[i].items():
+                    parts[species].append(part_file)
+
+            # 3. 各物种流式写出
+            futures = {executor.submit(write_streamed, parts[species],
+                                       os.path.join(output_dir, SPECIES[species]['output']), preset): species
+                       for species in species_list}
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+                print(f"Successfully saved {SPECIES[futures[future]]['output']}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    build()
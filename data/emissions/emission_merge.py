@@ -0,0 +1,115 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import xarray as xr
+import netCDF4
+
+# 写出预设位于 data/model/nc_writer.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../model')))
+from nc_writer import PRESETS
+
+'''
+    排放文件线性时间合并
+    原做法从 ACEI 开始逐个 xr.concat，每次都复制整个不断增长的数据集，耗时随文件数平方增长，
+    且合并结果整体留在内存中最后一次写出。
+    现做法（各部分的预处理与重网格化见 emission_builder.py）：
+    1. 读取各部分临时文件的结构，一次确定输出文件的结构（变量为全部文件的并集，缺少的维度广播补齐）；
+    2. 逐个文件写入输出文件的对应时次，按 (1 个时次, 整层) 分块，
+       压缩参数取 nc_writer 的预设（默认 archive），内存中同时只有一个输入文件。
+    输出的时间轴为全部文件时次的并集（升序）。各文件的时次可以重叠（如 ACEIC 与 GEHC 都有 2018 年），
+    重叠的时次取 parts 中排在前面的文件，后面文件中的重复时次丢弃并打印提示。
+'''
+
+TIME_UNITS = 'hours since 1900-01-01 00:00:00'
+CALENDAR = 'standard'
+
+
+def _layout(parts):
+    """汇总全部临时文件的结构
+
+    各文件内部的时间须严格递增。重叠的时次以 parts 中排在前面的文件为准，后面文件中的重复时次丢弃。
+
+    Returns:
+        tuple: (输出的全部时次（升序）, [(文件, 保留的时次在该文件中的下标, 在输出中的位置)],
+                各非时间维的坐标, 各变量的 (维度, dtype, attrs))
+    """
+    selections = []
+    coords = {}
+    variables = {}
+    claimed = np.array([], dtype='datetime64[ns]')
+    for part in parts:
+        with xr.open_dataset(part) as ds:
+            times = ds['time'].values
+            if len(times) and not (times[1:] > times[:-1]).all():
+                raise ValueError(f"{part} 的时间不是严格递增的")
+            keep = ~np.isin(times, claimed)
+            if not keep.all():
+                print(f"{os.path.basename(part)}: {np.count_nonzero(~keep)} 个时次已由前面的文件提供，丢弃 "
+                      f"({times[~keep][0]} - {times[~keep][-1]})")
+            claimed = np.concatenate([claimed, times[keep]])
+            selections.append((part, times[keep], np.flatnonzero(keep)))
+            for dim in ds.dims:
+                if dim != 'time' and dim not in coords:
+                    coords[dim] = (ds[dim].values if dim in ds.coords else np.arange(ds.sizes[dim]),
+                                   dict(ds[dim].attrs) if dim in ds.coords else {})
+            for var in ds.data_vars:
+                dims = ds[var].dims
+                # 维度最多的版本为准（如 ACEI 无 lev，GEHC 有 lev）
+                if var not in variables or len(dims) > len(variables[var][0]):
+                    variables[var] = (dims, ds[var].dtype, dict(ds[var].attrs))
+    for var, (dims, dtype, attrs) in variables.items():
+        if 'time' in dims and dims[0] != 'time':
+            variables[var] = (('time',) + tuple(d for d in dims if d != 'time'), dtype, attrs)
+    all_times = np.sort(claimed)
+    order = [(part, index, np.searchsorted(all_times, times)) for part, times, index in selections]
+    return all_times, order, coords, variables
+
+
+def write_streamed(parts, output_file, preset='archive'):
+    """逐个临时文件写入输出文件的对应时次，重叠时次取排在前面的文件，压缩参数见 nc_writer.PRESETS"""
+    options = PRESETS[preset]
+    all_times, order, coords, variables = _layout(parts)
+    with netCDF4.Dataset(output_file, 'w') as nc:
+        nc.createDimension('time', None)
+        time_var = nc.createVariable('time', 'f8', ('time',))
+        time_var.units = TIME_UNITS
+        time_var.calendar = CALENDAR
+        for dim, (values, attrs) in coords.items():
+            nc.createDimension(dim, len(values))
+            coord = nc.createVariable(dim, values.dtype, (dim,))
+            coord[:] = values
+            coord.setncatts({k: v for k, v in attrs.items() if k != '_FillValue'})
+        for var, (dims, dtype, attrs) in variables.items():
+            chunks = tuple(1 if d == 'time' else len(coords[d][0]) for d in dims)
+            if options['float32'] and dtype == np.float64:
+                dtype = np.dtype(np.float32)
+            fill = np.nan if np.issubdtype(dtype, np.floating) else None
+            out = nc.createVariable(var, dtype, dims, zlib=True, complevel=options['complevel'],
+                                    shuffle=options['shuffle'], chunksizes=chunks, fill_value=fill)
+            out.setncatts({k: v for k, v in attrs.items() if k != '_FillValue'})
+
+        time_var[:] = netCDF4.date2num(pd.to_datetime(all_times).to_pydatetime(), TIME_UNITS, CALENDAR)
+        written = 0
+        static = set()  # 无时间维的变量取第一个含有它的文件
+        for part, index, positions in order:
+            # 输出中连续的一段时次一次写入
+            runs = np.split(np.arange(len(positions)), np.flatnonzero(np.diff(positions) != 1) + 1)
+            with xr.open_dataset(part) as ds:
+                for var, (dims, _, _) in variables.items():
+                    if var not in ds.data_vars:
+                        continue  # 该文件没有此变量，保持缺测
+                    da = ds[var]
+                    missing = {d: len(coords[d][0]) for d in dims if d not in da.dims}
+                    if missing:
+                        da = da.expand_dims(missing)
+                    if 'time' in dims:
+                        values = da.transpose(*dims).isel(time=index).values
+                        for run in runs:
+                            if len(run):
+                                nc[var][positions[run[0]]:positions[run[-1]] + 1] = values[run]
+                    elif var not in static:
+                        nc[var][:] = da.transpose(*dims).values
+                        static.add(var)
+            written += len(positions)
+            print(f"Written: {written}/{len(all_times)} time steps")
@@ -1,8 +1,13 @@
+import os
+import sys
 import geopandas as gpd
 import xarray as xr
 from shapely.geometry import Point
 import numpy as np
 from shapely.vectorized import contains
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../model')))
+from nc_writer import write_netcdf
 list = ['HCl_agri', 'HCl_bbop', 'HCl_ene', 'HCl_ind', 'HCl_res', 'HCl_wstop']
 
 base_dir = r"/mnt/d/gasdata/"
@@ -50,4 +55,4 @@ for i in list:
     ds[i] = ds[i].where(mask_xr['mask'], np.nan)
 
 # 保存处理后的数据
-ds.to_netcdf(base_dir + "/result/maskedFinalHcl.nc")
+write_netcdf(ds, base_dir + "/result/maskedFinalHcl.nc", 'archive')
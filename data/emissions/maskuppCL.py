@@ -1,8 +1,13 @@
+import os
+import sys
 import geopandas as gpd
 import xarray as xr
 from shapely.geometry import Point
 import numpy as np
 from shapely.vectorized import contains
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../model')))
+from nc_writer import write_netcdf
 list = ['pCl_agri', 'pCl_bbop', 'pCl_ene', 'pCl_ind', 'pCl_res', 'pCl_wstop']
 
 base_dir = r"/mnt/d/gasdata/"
@@ -51,4 +56,4 @@ for i in list:
     ds[i] = ds[i].where(mask_xr['mask'], np.nan)
 
 # 保存处理后的数据
-ds.to_netcdf(base_dir + "/result/maskedFinalpcl.nc")
+write_netcdf(ds, base_dir + "/result/maskedFinalpcl.nc", 'archive')
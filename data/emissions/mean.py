@@ -4,6 +4,9 @@ import os
 from datetime import datetime
 from cdo import Cdo
 
+# fig3.1 / fig3.2 / fig3.3 已改为读取 data/model/emission_cube.py 生成的排放汇总立方体，
+# 这里的 *_mean.csv 仅供单独查看
+
 def calculate_temporal_mean(input_file, output_dir):
     """
     使用CDO的Python包计算时间平均值并导出为CSV
@@ -0,0 +1,130 @@
+import os
+import sys
+import hashlib
+import numpy as np
+import xarray as xr
+from scipy import sparse
+
+# 格点边界与格点面积使用 data/model/cell_area.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../model')))
+from cell_area import cell_edges
+
+'''
+    排放清单重网格化权重
+    GEHC 等粗分辨率清单需要插值到 ACEI 的 0.1° 网格。原做法对每个文件调用 ds.interp(method='nearest')，
+    相同网格反复做近邻搜索，且最近邻不守恒排放总量。
+    这里对每一对 (源网格, 目标网格) 只生成一次稀疏权重矩阵 W (目标格点 × 源格点)：
+        nearest      每个目标格点取经、纬向各自最近的源格点（与 interp nearest 相同）
+        conservative 一阶守恒：W[d, s] = 源格点 s 与目标格点 d 的重叠面积 / 目标格点面积，
+                     规则经纬度网格的重叠面积可分解为 sin(纬度) 区间重叠 × 经度区间重叠，W = W_lat ⊗ W_lon
+    格点边界取自 cell_area.cell_edges。
+    权重按网格哈希保存为 npz，之后直接读取；全部变量、全部时次拼成一个矩阵后做一次稀疏矩阵乘法。
+    守恒法适用于单位面积的通量（kg m-2 s-1）。
+'''
+
+CACHE_DIR = "/mnt/d/gasdata/cache/regrid/"
+METHODS = ('nearest', 'conservative')
+
+_weights = {}
+
+
+def _overlap(src_edges, dst_edges):
+    """一维区间重叠矩阵 (目标 × 源)，按目标区间长度归一"""
+    src_lo = np.minimum(src_edges[:-1], src_edges[1:])
+    src_hi = np.maximum(src_edges[:-1], src_edges[1:])
+    dst_lo = np.minimum(dst_edges[:-1], dst_edges[1:])
+    dst_hi = np.maximum(dst_edges[:-1], dst_edges[1:])
+    overlap = np.minimum(dst_hi[:, None], src_hi[None]) - np.maximum(dst_lo[:, None], src_lo[None])
+    overlap = np.clip(overlap, 0, None) / (dst_hi - dst_lo)[:, None]
+    return sparse.csr_matrix(overlap)
+
+
+def _nearest(src, dst):
+    """一维最近邻选择矩阵 (目标 × 源)"""
+    idx = np.abs(dst[:, None] - src[None]).argmin(axis=1)
+    return sparse.csr_matrix((np.ones(len(dst)), (np.arange(len(dst)), idx)), shape=(len(dst), len(src)))
+
+
+def build_weights(src_lat, src_lon, dst_lat, dst_lon, method='conservative'):
+    """生成权重矩阵 W，形状 (nlat_dst × nlon_dst, nlat_src × nlon_src)，按 (lat, lon) 行优先展开"""
+    src_lat, src_lon, dst_lat, dst_lon = (np.asarray(a, dtype=np.float64) for a in (src_lat, src_lon, dst_lat, dst_lon))
+    if method == 'nearest':
+        w_lat, w_lon = _nearest(src_lat, dst_lat), _nearest(src_lon, dst_lon)
+    elif method == 'conservative':
+        sin_edges = lambda lat: np.sin(np.deg2rad(np.clip(cell_edges(lat), -90, 90)))
+        w_lat = _overlap(sin_edges(src_lat), sin_edges(dst_lat))
+        w_lon = _overlap(cell_edges(src_lon), cell_edges(dst_lon))
+    else:
+        raise ValueError(f"未知的重网格化方法: {method}，可选 {METHODS}")
+    return sparse.kron(w_lat, w_lon, format='csr')
+
+
+def grid_key(src_lat, src_lon, dst_lat, dst_lon, method):
+    """网格对 + 方法的哈希"""
+    h = hashlib.sha1(method.encode())
+    for a in (src_lat, src_lon, dst_lat, dst_lon):
+        a = np.ascontiguousarray(a, dtype=np.float64)
+        h.update(str(a.shape).encode())
+        h.update(a.tobytes())
+    return h.hexdigest()[:16]
+
+
+def load_weights(src_lat, src_lon, dst_lat, dst_lon, method='conservative', cache_dir=CACHE_DIR):
+    """读取（或生成并保存）权重矩阵，同一进程内再缓存在内存中"""
+    key = grid_key(src_lat, src_lon, dst_lat, dst_lon, method)
+    if key in _weights:
+        return _weights[key]
+    cache_file = os.path.join(cache_dir, f"{method}_{key}.npz") if cache_dir else None
+    if cache_file and os.path.exists(cache_file):
+        weights = sparse.load_npz(cache_file).tocsr()
+    else:
+        weights = build_weights(src_lat, src_lon, dst_lat, dst_lon, method)
+        if cache_file:
+            os.makedirs(cache_dir, exist_ok=True)
+            # 先写临时文件再改名，多个进程同时生成也不会读到半个文件
+            tmp_file = f"{cache_file}.{os.getpid()}.npz"
+            sparse.save_npz(tmp_file, weights)
+            os.replace(tmp_file, cache_file)
+    _weights[key] = weights
+    return weights
+
+
+def apply_weights(weights, values, nlat, nlon):
+    """对 (..., nlat_src, nlon_src) 数组做重网格化，返回 (..., nlat, nlon)
+
+    源格点为 NaN 时按 0 参与计算；目标格点的全部源格点都为 NaN 时结果为 NaN。
+    """
+    lead = values.shape[:-2]
+    flat = values.reshape(-1, values.shape[-2] * values.shape[-1]).T  # (nsrc, m)
+    finite = np.isfinite(flat)
+    out = weights @ np.where(finite, flat, 0)
+    if not finite.all():
+        covered = weights @ finite.astype(np.float64)
+        out[covered == 0] = np.nan
+    return out.T.reshape(lead + (nlat, nlon))
+
+
+def regrid(ds, lat, lon, method='conservative', variables=None, cache_dir=CACHE_DIR):
+    """把 Dataset 中含 lat、lon 维的变量重网格化到 (lat, lon)
+
+    同一形状的变量拼成一个矩阵，只做一次稀疏矩阵乘法。
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    weights = load_weights(ds['lat'].values, ds['lon'].values, lat, lon, method, cache_dir)
+    if variables is None:
+        variables = [var for var in ds.data_vars if {'lat', 'lon'} <= set(ds[var].dims)]
+
+    groups = {}
+    for var in variables:
+        da = ds[var].transpose(..., 'lat', 'lon')
+        groups.setdefault(da.dims, []).append((var, da))
+    out = ds.drop_vars(variables).drop_dims(['lat', 'lon'], errors='ignore')
+    out = out.assign_coords(lat=('lat', lat, ds['lat'].attrs), lon=('lon', lon, ds['lon'].attrs))
+    for dims, items in groups.items():
+        stacked = np.stack([da.values.astype(np.float64) for _, da in items])
+        result = apply_weights(weights, stacked, len(lat), len(lon))
+        for (var, da), values in zip(items, result):
+            out[var] = xr.DataArray(values.astype(da.dtype), dims=dims,
+                                    coords={d: out[d] for d in dims if d in out.coords}, attrs=da.attrs)
+    return out
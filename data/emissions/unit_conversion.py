@@ -0,0 +1,49 @@
+import os
+import sys
+import xarray as xr
+
+# 格点面积服务位于 data/model/cell_area.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../model')))
+from cell_area import cell_areas, seconds_in_month
+
+'''
+    排放清单单位换算
+    ACEIC 清单的单位为 Mg/grid/month，模式需要 kg m-2 s-1：
+        kg m-2 s-1 = Mg/grid/month × 1000 / 格点面积 / 当月秒数
+    格点面积取自 cell_area.cell_areas（球面带公式，按网格缓存），
+    当月秒数按时间坐标的实际日历天数计算（闰年二月为 29 天），
+    换算因子广播成 (time, lat, lon) 后对全部部门变量一次相乘。
+'''
+
+MG_TO_KG = 1000  # 1 Mg = 1000 kg
+
+
+def acei_unit(ds, variables=None):
+    """
+    将ACEI数据集的单位从Mg/grid/month转换为kg m-2 s-1
+
+    Parameters:
+        ds (xarray.Dataset): ACEI 数据集，time 坐标须为每月的日期
+        variables (list, optional): 需要换算的部门变量，默认为全部含 time、lat、lon 维的变量
+
+    Returns:
+        xarray.Dataset: 换算后的数据集
+    """
+    # 原始文件的经纬度为二维，取一维
+    if ds['lat'].ndim == 2:
+        ds['lat'] = ds['lat'].values[:, 0]
+    if ds['lon'].ndim == 2:
+        ds['lon'] = ds['lon'].values[0, :]
+    if variables is None:
+        variables = [var for var in ds.data_vars if {'time', 'lat', 'lon'} <= set(ds[var].dims)]
+
+    areas = xr.DataArray(cell_areas(ds['lat'].values, ds['lon'].values),
+                         coords={'lat': ds['lat'], 'lon': ds['lon']}, dims=('lat', 'lon'))
+    seconds = xr.DataArray(seconds_in_month(ds['time'].values), coords={'time': ds['time']}, dims='time')
+    factor = MG_TO_KG / (areas * seconds)
+
+    ds_new = ds.copy()
+    ds_new.update(ds[variables] * factor)
+    for var in variables:
+        ds_new[var].attrs = dict(ds[var].attrs, units='kg m-2 s-1')
+    return ds_new
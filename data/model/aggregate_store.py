@@ -0,0 +1,255 @@
+import os
+import glob
+import json
+import numpy as np
+import pandas as pd
+import config as cfg
+
+'''
+    年/季节聚合存储
+    由各区域逐月空间平均序列 (fldmean.csv 及 *_levels.csv 的近地面层)
+    一次性生成 情景 × 区域 × 变量 × 年 (× 季节) 的聚合数组，每个数据域
+    (surface / column) 各一组 .npy，以内存映射方式读取。
+    趋势图和偏离率统计直接从这里取数，不再每次重读 6 组 CSV、转换时间、按年分组。
+    季节按气象季节划分：某年的 DJF 为上一年 12 月与当年 1、2 月，
+    因此 12 月计入下一年的 DJF；下一年不在年份范围内（如被剔除的最后一年）时该 12 月不计入季节平均。
+    年平均仍为自然年 1-12 月。
+'''
+
+SCENARIOS = ('fin', 'nochg')
+DOMAINS = ('surface', 'column')
+SEASON_NAMES = ('DJF', 'MAM', 'JJA', 'SON')
+# 月份 -> 季节序号
+MONTH_TO_SEASON = np.array([-1, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+# 月份 -> 季节所属年份相对自然年的偏移（12 月属于下一年的 DJF）
+MONTH_TO_SEASON_YEAR = np.array([0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1])
+# 季节年份约定，写入 index.json，约定不同的旧存储需要重建
+SEASON_CONVENTION = 'DJF: December of previous year'
+INDEX_NAME = "index.json"
+
+
+def box_names():
+    """box 区域的键（与目录名一致）"""
+    return [box[0] for box in cfg.box_list]
+
+
+def source_dirs():
+    """返回 {(scenario, domain, region): 目录}，每个目录下有 fldmean.csv"""
+    dirs = {}
+    for scenario in SCENARIOS:
+        fldmean = getattr(cfg, f"fldmean_{scenario}")
+        cnmean = getattr(cfg, f"cnmean_{scenario}")
+        colmean = getattr(cfg, f"colmean_{scenario}")
+        cncolmean = getattr(cfg, f"cncolmean_{scenario}")
+        box_dir = getattr(cfg, f"box_{scenario}_dir")
+        boxcol_dir = getattr(cfg, f"boxcol_{scenario}_dir")
+        dirs[(scenario, 'surface', 'Global')] = fldmean
+        dirs[(scenario, 'surface', 'China')] = cnmean
+        dirs[(scenario, 'column', 'Global')] = colmean
+        dirs[(scenario, 'column', 'China')] = cncolmean
+        for box_name in box_names():
+            dirs[(scenario, 'surface', box_name)] = box_dir + box_name + "/boxfldmean/"
+            dirs[(scenario, 'column', box_name)] = boxcol_dir + box_name + "/colboxfldmean/"
+    return dirs
+
+
+def read_monthly(source_dir, include_levels=True):
+    """读取一个区域的逐月序列：fldmean.csv 全部变量 + 每个 *_levels.csv 的近地面层
+
+    Returns:
+        pandas.DataFrame: 索引为 YYYY-MM 字符串
+    """
+    frames = [pd.read_csv(os.path.join(source_dir, "fldmean.csv"), index_col='time')]
+    if include_levels:
+        levels = {}
+        for file in sorted(glob.glob(os.path.join(source_dir, "*_levels.csv"))):
+            # 最后一层为近地面层
+            df = pd.read_csv(file, index_col='time')
+            levels[os.path.splitext(os.path.basename(file))[0]] = df.iloc[:, -1]
+        if levels:
+            frames.append(pd.DataFrame(levels))
+    return pd.concat(frames, axis=1)
+
+
+def _group_mean(values, groups, ngroups):
+    """按组号求均值（忽略 NaN），values 形状 (time, variable)"""
+    valid = np.isfinite(values)
+    sums = np.zeros((ngroups, values.shape[1]))
+    counts = np.zeros((ngroups, values.shape[1]))
+    np.add.at(sums, groups, np.where(valid, values, 0))
+    np.add.at(counts, groups, valid)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+
+def _is_stale(store_dir, dirs):
+    index_file = os.path.join(store_dir, INDEX_NAME)
+    if not os.path.exists(index_file):
+        return True
+    with open(index_file, 'r', encoding='utf-8') as f:
+        if json.load(f).get('season_convention') != SEASON_CONVENTION:
+            return True
+    built = os.path.getmtime(index_file)
+    for source_dir in dirs.values():
+        for file in glob.glob(os.path.join(source_dir, "*.csv")):
+            if os.path.getmtime(file) > built:
+                return True
+    return False
+
+
+def build_aggregate_store(store_dir=None, exclude_years=(2039,), include_levels=True, overwrite=False):
+    """由逐月序列生成年/季节聚合存储
+
+    Parameters:
+        store_dir (str, optional): 存储目录，默认 cfg.aggregate_dir
+        exclude_years (tuple): 剔除的年份（不完整年份）
+        include_levels (bool): 是否包含 *_levels.csv 的近地面层
+        overwrite (bool): 是否强制重建
+
+    Returns:
+        str: 存储目录
+    """
+    if store_dir is None:
+        store_dir = cfg.aggregate_dir
+    os.makedirs(store_dir, exist_ok=True)
+    dirs = source_dirs()
+    if not overwrite and not _is_stale(store_dir, dirs):
+        print(f"文件已存在: {store_dir}")
+        return store_dir
+
+    regions = ['Global', 'China'] + box_names()
+    index = {'scenarios': list(SCENARIOS), 'regions': regions, 'seasons': list(SEASON_NAMES),
+             'season_convention': SEASON_CONVENTION, 'exclude_years': list(exclude_years), 'domains': {}}
+
+    for domain in DOMAINS:
+        # 读取该数据域所有情景、区域的逐月序列
+        monthly = {}
+        for scenario in SCENARIOS:
+            for region in regions:
+                source_dir = dirs[(scenario, domain, region)]
+                try:
+                    monthly[(scenario, region)] = read_monthly(source_dir, include_levels)
+                except FileNotFoundError:
+                    print(f"缺少 {source_dir}fldmean.csv，跳过")
+        if not monthly:
+            continue
+
+        # 变量取并集（保持首次出现顺序），年份取并集
+        variables = list(dict.fromkeys(v for df in monthly.values() for v in df.columns))
+        years = sorted({int(t[:4]) for df in monthly.values() for t in df.index} - set(exclude_years))
+        year_pos = {y: i for i, y in enumerate(years)}
+
+        shape = (len(SCENARIOS), len(regions), len(variables), len(years))
+        annual = np.lib.format.open_memmap(os.path.join(store_dir, f"annual_{domain}.npy"),
+                                           mode='w+', dtype=np.float64, shape=shape)
+        seasonal = np.lib.format.open_memmap(os.path.join(store_dir, f"seasonal_{domain}.npy"),
+                                             mode='w+', dtype=np.float64, shape=shape + (len(SEASON_NAMES),))
+        annual[:] = np.nan
+        seasonal[:] = np.nan
+
+        for (scenario, region), df in monthly.items():
+            time = np.asarray(df.index, dtype=str)
+            year = np.array([int(t[:4]) for t in time])
+            month = np.array([int(t[5:7]) for t in time])
+            keep = np.isin(year, years)
+            values = df.reindex(columns=variables).values[keep].astype(np.float64)
+            year_idx = np.array([year_pos[y] for y in year[keep]], dtype=int)
+
+            # 季节所属年份：12 月移到下一年，下一年不存在时去掉
+            season_year = year + MONTH_TO_SEASON_YEAR[month]
+            in_season = np.isin(season_year, years)
+            season_values = df.reindex(columns=variables).values[in_season].astype(np.float64)
+            season_year_idx = np.array([year_pos[y] for y in season_year[in_season]], dtype=int)
+            season_idx = MONTH_TO_SEASON[month[in_season]]
+
+            s = SCENARIOS.index(scenario)
+            r = regions.index(region)
+            annual[s, r] = _group_mean(values, year_idx, len(years)).T
+            seasonal_mean = _group_mean(season_values, season_year_idx * len(SEASON_NAMES) + season_idx,
+                                        len(years) * len(SEASON_NAMES))
+            seasonal[s, r] = seasonal_mean.reshape(len(years), len(SEASON_NAMES), -1).transpose(2, 0, 1)
+
+        annual.flush()
+        seasonal.flush()
+        del annual, seasonal
+        index['domains'][domain] = {'variables': variables, 'years': years}
+        print(f"{domain} 聚合完成: {len(variables)} 个变量, {len(years)} 年")
+
+    with open(os.path.join(store_dir, INDEX_NAME), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    return store_dir
+
+
+class AggregateStore:
+    """以内存映射方式读取聚合存储
+
+    用法:
+        store = AggregateStore()
+        findf, nochgdf = store.frames('surface', 'Global')
+    """
+
+    def __init__(self, store_dir=None, build=True):
+        if store_dir is None:
+            store_dir = cfg.aggregate_dir
+        if build:
+            build_aggregate_store(store_dir)
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, INDEX_NAME), 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.regions = self.index['regions']
+        self._arrays = {}
+
+    def variables(self, domain):
+        return self.index['domains'][domain]['variables']
+
+    def field_variables(self, domain):
+        """fldmean.csv 中的变量"""
+        return [v for v in self.variables(domain) if not v.endswith('_levels')]
+
+    def level_variables(self, domain):
+        """*_levels.csv 近地面层变量（以文件名命名，如 CL_levels）"""
+        return [v for v in self.variables(domain) if v.endswith('_levels')]
+
+    def years(self, domain):
+        return self.index['domains'][domain]['years']
+
+    def array(self, domain, period='annual'):
+        """返回内存映射数组
+
+        annual:   (scenario, region, variable, year)
+        seasonal: (scenario, region, variable, year, season)
+        """
+        key = (domain, period)
+        if key not in self._arrays:
+            self._arrays[key] = np.load(os.path.join(self.store_dir, f"{period}_{domain}.npy"), mmap_mode='r')
+        return self._arrays[key]
+
+    def frame(self, scenario, domain, region, variables=None, season=None):
+        """取出一个情景、区域的年均（或某季节）序列
+
+        返回格式与各趋势脚本原来的 read_data 相同：
+        RangeIndex，变量列 + 末尾的 time 列（年份整数）。
+        variables 默认为 fldmean.csv 中的变量。
+        """
+        all_variables = self.variables(domain)
+        if variables is None:
+            variables = self.field_variables(domain)
+        var_idx = [all_variables.index(v) for v in variables]
+        s = self.index['scenarios'].index(scenario)
+        r = self.regions.index(region)
+        if season is None:
+            values = self.array(domain, 'annual')[s, r][var_idx]
+        else:
+            values = self.array(domain, 'seasonal')[s, r][var_idx, :, SEASON_NAMES.index(season)]
+        df = pd.DataFrame(np.array(values).T, columns=list(variables))
+        df['time'] = self.years(domain)
+        return df
+
+    def frames(self, domain, region, variables=None, season=None):
+        """同时取出 S1(fin) 与 SSP370(nochg) 的序列"""
+        return (self.frame('fin', domain, region, variables, season),
+                self.frame('nochg', domain, region, variables, season))
+
+
+if __name__ == "__main__":
+    build_aggregate_store(overwrite=True)
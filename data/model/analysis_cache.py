@@ -0,0 +1,170 @@
+import os
+import glob
+import inspect
+import numpy as np
+import pandas as pd
+import config as cfg
+from render_cache import fingerprint
+
+'''
+    分析结果缓存
+    原先 fig3.6 / fig3.4 把结果 pickle 到固定文件名，fig3.6 只要文件不超过 36000 秒就复用，
+    与输入是否变化无关；fig3.4 的缓存则永不失效。
+    这里以 输入文件指纹 + 计算参数 (+ 计算函数源码) 的哈希作为键，结果保存为 <名字>_<键>.npz：
+        输入文件指纹 = 路径、大小、修改时间 (ns)，shapefile 同时计入同名的 .dbf/.shx/.prj/.cpg
+        输入不变时结果一直有效，输入、参数或代码一变键就不同，旧结果不再命中
+    缓存目录有容量上限 (config.analysis_cache_bytes)，写入后按最近使用时间 (LRU) 删除最旧的文件，
+    命中时更新文件修改时间作为使用时间。
+    结果为 {名字: ndarray / DataFrame / 列表}，npz 不使用 pickle，
+    因此只接受数值、布尔、日期或字符串数组，object 数组（如混合类型的 DataFrame）在保存时报错，
+    而不是写入后每次读取失败、每次都重新计算。
+    用法:
+        cache = AnalysisCache()
+        result = cache.cached('temporal_emissions', [hcl_file, pcl_file, shp_file],
+                              {'provinces': provinces}, compute, code=[compute])
+'''
+
+SHP_COMPANIONS = ('.shp', '.dbf', '.shx', '.prj', '.cpg')
+_SEP = '::'
+
+
+def file_fingerprint(path):
+    """输入文件的指纹：(路径, 大小, 修改时间)，shapefile 计入同名的附属文件"""
+    path = os.path.abspath(path)
+    stem, ext = os.path.splitext(path)
+    paths = [stem + e for e in SHP_COMPANIONS] if ext.lower() == '.shp' else [path]
+    items = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:
+            if p == path:
+                raise
+            continue
+        items.append((p, st.st_size, st.st_mtime_ns))
+    return items
+
+
+def _plain(name, value):
+    """转换为不需要 pickle 的数组，object 数组报错"""
+    array = np.asarray(value)
+    if array.dtype.kind == 'O':
+        raise ValueError(f"结果 {name} 为 object 数组，npz 无法不经 pickle 保存，请转换为数值或字符串")
+    return array
+
+
+def _encode(results):
+    """结果字典 -> npz 可保存的数组字典"""
+    arrays = {}
+    for name, value in results.items():
+        if isinstance(value, pd.DataFrame):
+            arrays[f"{name}{_SEP}frame"] = _plain(name, value.values)
+            arrays[f"{name}{_SEP}columns"] = np.asarray(value.columns, dtype=str)
+            index = np.asarray(value.index)
+            arrays[f"{name}{_SEP}index"] = index.astype(str) if index.dtype.kind == 'O' else _plain(name, index)
+        elif isinstance(value, (list, tuple)):
+            arrays[f"{name}{_SEP}list"] = _plain(name, value)
+        else:
+            arrays[name] = _plain(name, value)
+    return arrays
+
+
+def _decode(arrays):
+    """npz 数组字典 -> 结果字典"""
+    results = {}
+    for key in arrays.files:
+        name, _, kind = key.partition(_SEP)
+        if kind == 'frame':
+            results[name] = pd.DataFrame(arrays[key], columns=arrays[f"{name}{_SEP}columns"].tolist(),
+                                         index=arrays[f"{name}{_SEP}index"])
+        elif kind == 'list':
+            results[name] = arrays[key].tolist()
+        elif not kind:
+            results[name] = arrays[key]
+    return results
+
+
+class AnalysisCache:
+    """按内容寻址、有容量上限的分析结果缓存
+
+    Parameters:
+        cache_dir (str, optional): 缓存目录，默认 config.analysis_cache_dir
+        max_bytes (int, optional): 容量上限，默认 config.analysis_cache_bytes
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or cfg.analysis_cache_dir
+        self.max_bytes = cfg.analysis_cache_bytes if max_bytes is None else max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, inputs, params, code=()):
+        """由输入文件指纹、计算参数和计算函数源码生成缓存键"""
+        sources = [inspect.getsource(func) for func in code]
+        return fingerprint([file_fingerprint(p) for p in inputs], params, sources)[:20]
+
+    def path(self, name, key):
+        return os.path.join(self.cache_dir, f"{name}_{key}.npz")
+
+    def load(self, name, key):
+        """命中时返回结果字典并更新使用时间，否则返回 None"""
+        path = self.path(name, key)
+        try:
+            with np.load(path, allow_pickle=False) as arrays:
+                results = _decode(arrays)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return results
+
+    def save(self, name, key, results):
+        """保存结果字典，然后按容量上限清理；含 object 数组时报 ValueError"""
+        path = self.path(name, key)
+        arrays = _encode(results)
+        # 先写临时文件再改名，中断时不会留下半个文件
+        tmp_file = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_file, **arrays)
+        os.replace(tmp_file, path)
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """总大小超过上限时按最近使用时间从旧到新删除（keep 除外）"""
+        entries = []
+        for p in glob.glob(os.path.join(self.cache_dir, "*.npz")):
+            if p.endswith('.tmp.npz'):  # 其他进程正在写入
+                continue
+            try:
+                st = os.stat(p)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def cached(self, name, inputs, params, compute, code=()):
+        """读取缓存结果，未命中时调用 compute() 计算并保存
+
+        Parameters:
+            name (str): 结果名，作为文件名前缀
+            inputs (list): 输入文件路径
+            params (dict): 影响结果的计算参数
+            compute (callable): 无参数，返回 {名字: ndarray / DataFrame / 列表}
+            code (list): 计算所用的函数，其源码参与哈希
+
+        Returns:
+            dict: 结果字典
+        """
+        key = self.key(inputs, params, code)
+        results = self.load(name, key)
+        if results is None:
+            results = compute()
+            self.save(name, key, results)
+        return results
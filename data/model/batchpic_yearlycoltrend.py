@@ -3,78 +3,21 @@ import matplotlib.pyplot as plt
 import os
 import matplotlib.dates as mdates
 import config as cfg
+from aggregate_store import AggregateStore
+from deviation_report import deviation_rates
 
 # 柱浓度的逐年趋势图
-file_name = "fldmean.csv"
 output_dir = "/home/tgm/gasplot/plot/output/ryearlycolumn_trend/"
 
 
-def read_data(fin_dir, nochg_dir, file_name):
-    findf = pd.read_csv(fin_dir + file_name)
-    nochgdf = pd.read_csv(nochg_dir + file_name)
-
-    # 将时间列转换为 datetime 类型
-    findf['time'] = pd.to_datetime(findf['time'])
-    nochgdf['time'] = pd.to_datetime(nochgdf['time'])
-
-    # 过滤掉 2039 年的数据
-    findf = findf[findf['time'].dt.year != 2039]
-    nochgdf = nochgdf[nochgdf['time'].dt.year != 2039]
-
-    # 保存时间列
-    time_col_findf = findf['time'].dt.year
-    time_col_nochgdf = nochgdf['time'].dt.year
-
-    # 按年份分组并计算平均值，不包含时间列
-    findf = findf.drop(columns=['time']).groupby(time_col_findf).mean()
-    nochgdf = nochgdf.drop(columns=['time']).groupby(time_col_nochgdf).mean()
-
-    # 重新添加时间列
-    findf['time'] = findf.index
-    nochgdf['time'] = nochgdf.index
-    # print(findf)
-    # 重置索引
-    findf = findf.reset_index(drop=True)
-    nochgdf = nochgdf.reset_index(drop=True)
-
-    return findf, nochgdf
-
-(colfindf, colnochgdf) = read_data(cfg.colmean_fin, cfg.colmean_nochg, file_name)
-(cncolfindf, cncolnochgdf) = read_data(cfg.cncolmean_fin, cfg.cncolmean_nochg, file_name)
+# 从年/季节聚合存储中读取各区域的年均序列
+store = AggregateStore()
+(colfindf, colnochgdf) = store.frames('column', 'Global')
+(cncolfindf, cncolnochgdf) = store.frames('column', 'China')
 boxdata = []
-i = 0
-for box in cfg.box_list:
-    
-    (box_name, lon1, lon2, lat1, lat2) = box
-    boxcolfindf = pd.read_csv(cfg.boxcol_fin_dir + box_name + "/colboxfldmean/" + file_name)
-    boxcolnochgdf = pd.read_csv(cfg.boxcol_nochg_dir + box_name + "/colboxfldmean/" + file_name)
-    # 将时间列转换为 datetime 类型
-    boxcolfindf['time'] = pd.to_datetime(boxcolfindf['time'])
-    boxcolnochgdf['time'] = pd.to_datetime(boxcolnochgdf['time'])
-
-
-    # 过滤掉 2039 年的数据
-    boxcolfindf = boxcolfindf[boxcolfindf['time'].dt.year != 2039]
-    boxcolnochgdf = boxcolnochgdf[boxcolnochgdf['time'].dt.year != 2039]
-
-    # 保存时间列
-    time_col_boxcolfindf = boxcolfindf['time'].dt.year
-    time_col_boxcolnochgdf = boxcolnochgdf['time'].dt.year
-
-    # 按年份分组并计算平均值，不包含时间列
-    boxcolfindf = boxcolfindf.drop(columns=['time']).groupby(time_col_boxcolfindf).mean()
-    boxcolnochgdf = boxcolnochgdf.drop(columns=['time']).groupby(time_col_boxcolnochgdf).mean()
-
-    # 重新添加时间列
-    boxcolfindf['time'] = boxcolfindf.index
-    boxcolnochgdf['time'] = boxcolnochgdf.index
-
-    # 重置索引
-    boxcolfindf = boxcolfindf.reset_index(drop=True)
-    boxcolnochgdf = boxcolnochgdf.reset_index(drop=True)
-
-    boxdata.append((cfg.Enbox_list[i][0], boxcolfindf, boxcolnochgdf))
-    i += 1
+for box, enbox in zip(cfg.box_list, cfg.Enbox_list):
+    (boxcolfindf, boxcolnochgdf) = store.frames('column', box[0])
+    boxdata.append((enbox[0], boxcolfindf, boxcolnochgdf))
 
 if not os.path.exists(output_dir):
     os.makedirs(output_dir)
@@ -82,30 +25,9 @@ if not os.path.exists(output_dir):
 # 设置图片清晰度
 plt.rcParams['figure.dpi'] = 300
 
-# 计算偏离率并求历年平均
-deviation_rates = {}
-
-# 全局数据
-global_diff = colfindf.drop(columns=['time']) - colnochgdf.drop(columns=['time'])
-global_deviation_rate = global_diff / colnochgdf.drop(columns=['time'])
-global_avg_deviation_rate = global_deviation_rate[-5:].mean()
-deviation_rates['Global'] = global_avg_deviation_rate
-
-# 中国数据
-china_diff = cncolfindf.drop(columns=['time']) - cncolnochgdf.drop(columns=['time'])
-china_deviation_rate = china_diff / cncolnochgdf.drop(columns=['time'])
-china_avg_deviation_rate = china_deviation_rate[-5:].mean()
-deviation_rates['China'] = china_avg_deviation_rate
-
-# 各个区域数据
-for box_name, boxcolfindf, boxcolnochgdf in boxdata:
-    box_diff = boxcolfindf.drop(columns=['time']) - boxcolnochgdf.drop(columns=['time'])
-    box_deviation_rate = box_diff / boxcolnochgdf.drop(columns=['time'])
-    box_avg_deviation_rate = box_deviation_rate[-5:].mean()
-    deviation_rates[box_name] = box_avg_deviation_rate
-
-# 将结果保存为 DataFrame
-result_df = pd.DataFrame(deviation_rates)
+# 计算偏离率并求近 5 年平均（全部变量、区域一次计算）
+box_labels = {box[0]: enbox[0] for box, enbox in zip(cfg.box_list, cfg.Enbox_list)}
+result_df = deviation_rates(store, 'column', window='last5', labels=box_labels)
 
 # 保存为 CSV 文件
 result_df.to_csv(os.path.join(output_dir, 'deviation_rates.csv'))
@@ -142,8 +64,6 @@ for column in colfindf.columns:
     cncolfindf['time'] = pd.to_datetime(cncolfindf['time'], format='%Y')
     colnochgdf['time'] = pd.to_datetime(colnochgdf['time'], format='%Y')
     cncolnochgdf['time'] = pd.to_datetime(cncolnochgdf['time'], format='%Y')
-    china_diff['time'] = pd.to_datetime(cncolnochgdf['time'], format='%Y')
-    global_diff['time'] = pd.to_datetime(cncolnochgdf['time'], format='%Y')
     
     # 创建包含三个子图的画布
     y_min = min(colfindf[column].min(), cncolfindf[column].min(),
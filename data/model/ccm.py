@@ -10,73 +10,127 @@ import matplotlib.pyplot as plt
 from pyEDM import *
 import concurrent.futures
 from concurrent.futures import ProcessPoolExecutor
+from render_cache import RenderCache, fingerprint
+from ccm_kernel import ccm as native_ccm, SAMPLES
+from ccm_significance import significance_table, SIGNIFICANCE_NAME
+from ccm_store import CCMStore, STORE_NAME, pair_hash, engine_key
+from ccm_screening import screen_pairs, passed_pairs
+from shared_arrays import SharedArrays, attach, get
 
-def bestEdim(data, output_dir):
+def simplex_mae(values, E, Tp=1):
     '''
-    读取数据，计算每个变量的最佳 E 值
+    单个序列、单个 E 的 Simplex 自预测平均绝对误差
     '''
-    output_dir = output_dir + "/best_embed_dimension/"
-    if os.path.exists(output_dir + "bestEDim.csv"):
-        print("文件已存在" + str(output_dir + "bestEDim.csv"))
-        return pd.read_csv(output_dir + "bestEDim.csv")
-    elif not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    # 将 time 列转换为 ISO 8601 格式
-    data['time'] = data['time'].astype(str) + '-01'
-    data['time'] = pd.to_datetime(data['time'])
-    data.set_index('time', inplace=True)
+    # pyEDM 将第一列视为时间列
+    frame = pd.DataFrame({'time': np.arange(1, len(values) + 1), 'x': values})
+    library_string = "1 {}".format(len(values) - E)
+    preds = Simplex(dataFrame=frame, columns='x', target='x',
+                    E=E, Tp=Tp, lib=library_string, pred=library_string)
+    return np.nanmean(np.abs((preds['Predictions'] - preds['Observations']).values))
 
-    # 保存每个变量的最小 MAE 对应的 E 值
-    bestEDim = pd.DataFrame(np.zeros((len(data.columns[1:]), 2)), index=data.columns[1:], columns=['E', 'MAE'])
-
-    for i, sp in enumerate(data.columns[1:]):
-        MAEs = np.zeros(len(range(2, 25)))
-        # 测试从二维到 24 维
-        # print(f"Calculating best E for {sp}")
-        for E in range(2, 25):
-            library_string = "1 {}".format(len(data) - E)
-            # 移除索引，避免索引中的时间信息干扰
-            data_without_index = data.reset_index(drop=True)
-            # 使用 pyEDM 的 Simplex 函数，将自变量和因变量都计算为自身
-            # Tp 是预测多少步的参数
-            preds = Simplex(dataFrame=data_without_index, columns=sp, target=sp,
-                            E=E, Tp=1, lib=library_string, pred=library_string)
-            # 计算平均绝对误差
-            MAEs[E - 2] = np.nanmean(np.abs((preds['Predictions'] - preds['Observations']).values))
 
+def searchEdim(series, E_range=range(2, 25), Tp=1, store=None, max_workers=6):
+    '''
+    并行计算每个序列在各个 E 下的 MAE
+    series: {标签: 序列}，标签可以是变量名或 (来源, 变量)
+    按 (序列哈希, E, Tp) 缓存在 store 中，每个结果完成即写入，
+    重复运行、中断后继续或新增变量时只计算缺少的部分；内容相同的序列只计算一次
+    返回 DataFrame，索引为标签，列为 E
+    '''
+    cache = store.edim_cache() if store is not None else {}
+
+    series = {sp: np.asarray(values, dtype=np.float64) for sp, values in series.items()}
+    hashes = {sp: fingerprint(values) for sp, values in series.items()}
+    tasks = {(hashes[sp], E, Tp): (sp, E) for sp in series for E in E_range
+             if (hashes[sp], E, Tp) not in cache}
+
+    if tasks:
+        print(f"计算 {len(tasks)} 个 (序列, E) 组合")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(simplex_mae, series[sp], E, Tp): key for key, (sp, E) in tasks.items()}
+            for n_done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                key = futures[future]
+                cache[key] = future.result()
+                if store is not None:
+                    store.write_edim(key, cache[key])
+                if n_done % 100 == 0 or n_done == len(tasks):
+                    print(f"Simplex 已完成 {n_done}/{len(tasks)}")
+
+    return pd.DataFrame([[cache[(hashes[sp], E, Tp)] for E in E_range] for sp in series],
+                        index=list(series), columns=list(E_range))
+
+
+def plotEdim(MAEs, output_dir):
+    '''
+    绘制每个变量的 MAE-E 曲线，曲线未变化的图不重画
+    '''
+    render_cache = RenderCache(output_dir)
+    for sp, row in MAEs.iterrows():
+        path = output_dir + f"/best_embed_dimension_{sp}.png"
+        render_key = render_cache.key(row, {'figure': 'best_embed_dimension', 'var': sp})
+        if render_cache.is_fresh(path, render_key):
+            continue
         # 创建新的图形窗口
         fig = plt.figure(figsize=(6, 4))
-        plt.plot(range(2, 25), MAEs, label=sp)
+        plt.plot(row.index, row.values, label=sp)
         plt.ylabel('MAE')
         plt.xlabel('EmbedDimension')
         plt.legend()
-
-        # 记录最小 MAE 对应的 E 值
-        best_E = np.argmin(MAEs) + 2
-        bestEDim.loc[sp, 'E'] = best_E
-        bestEDim.loc[sp, 'MAE'] = MAEs[best_E - 2]
-
         # 保存当前图形
-        plt.savefig(output_dir + f"/best_embed_dimension_{sp}.png")
+        plt.savefig(path)
         # 关闭当前图形窗口
         plt.close(fig)
+        render_cache.record(path, render_key)
+
 
-    # 保存最佳 E 值和对应的 MAE 到 CSV 文件
+def bestEdim(data, output_dir, E_range=range(2, 25), Tp=1, store=None, source=None):
+    '''
+    读取数据，计算每个变量的最佳 E 值
+    store/source: 结果存储及序列来源标识
+    '''
+    output_dir = output_dir + "/best_embed_dimension/"
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    # 将 time 列转换为 ISO 8601 格式
+    data['time'] = data['time'].astype(str) + '-01'
+    data['time'] = pd.to_datetime(data['time'])
+    data.set_index('time', inplace=True)
+
+    # 测试从二维到 24 维，Tp 是预测多少步的参数
+    # 第一列在 pyEDM 中被视为时间列，不参与计算
+    MAEs = searchEdim({sp: data[sp].values for sp in data.columns[1:]}, E_range, Tp, store=store)
+
+    # 保存每个变量的最小 MAE 对应的 E 值
+    bestEDim = pd.DataFrame({'E': MAEs.idxmin(axis=1), 'MAE': MAEs.min(axis=1)})
     bestEDim.to_csv(output_dir + "bestEDim.csv")
-    return bestEDim
+    if store is not None:
+        store.write_best_edim(source, bestEDim)
 
+    plotEdim(MAEs, output_dir)
+    # 与读取已有 bestEDim.csv 的结果格式一致（变量名在 Unnamed: 0 列）
+    return pd.read_csv(output_dir + "bestEDim.csv")
 
-def calculate_ccm(data, output_dir, key1, key2, E):
+
+def calculate_ccm(data, output_dir, key1, key2, E, engine='native'):
+    '''
+    engine: 'native' 使用 ccm_kernel（随机库，每次抽样一次扫描全部库大小），'pyEDM' 使用 pyEDM CCM，
+    两者每个库大小都取 SAMPLES 个随机库的平均
+    是否需要计算由结果存储决定，图片已存在时只跳过绘图
+    '''
     path = os.path.join(output_dir, f"{key1}_{key2}_{E}_CCM.png")
-    if os.path.exists(path):
-        return None
 
     lib_start = 26
     lib_end = len(data) - 26
     lib_int = 1
-    ccm = CCM(dataFrame=data, E=int(E), columns=key1, target=key2, libSizes=f'{lib_start} {lib_end} {lib_int}',
-              sample=1, showPlot=False)
+    if engine == 'native':
+        ccm = native_ccm(data[key1].values, data[key2].values, E, range(lib_start, lib_end + 1, lib_int),
+                         names=(key1, key2), sample=SAMPLES)
+    else:
+        ccm = CCM(dataFrame=data, E=int(E), columns=key1, target=key2, libSizes=f'{lib_start} {lib_end} {lib_int}',
+                  sample=SAMPLES, seed=0, showPlot=False)
     print(f"CCM between {key1} and {key2} with E={E} calculated")
+    if os.path.exists(path):
+        return ccm
     # 生成 CCM 图
     plt.figure()
     plt.plot(ccm['LibSize'], ccm[f'{key1}:{key2}'], label=f'{key1}:{key2}')
@@ -89,76 +143,158 @@ def calculate_ccm(data, output_dir, key1, key2, E):
     # 关闭当前图形窗口
     plt.close()
 
-    # 存储 CCM 值到 Series
-    col_name = f"{key1}_{key2}_{E}"
-    series1 = pd.Series(ccm[f'{key1}:{key2}'], name=col_name)
-    series2 = pd.Series(ccm[f'{key2}:{key1}'], name=f"{key2}_{key1}_{E}")
-    return series1, series2
+    return ccm
 
 
-def process_key(data, output_dir, bestEDim, keys, i):
-    ccm_list = []
-    for j in range(i + 1, len(keys)):
-        key1 = keys[i]
-        key2 = keys[j]
-        embed = []
-        # 修改为通过筛选 Unnamed: 0 列来获取 E 值
-        embed.append(bestEDim[bestEDim['Unnamed: 0'] == key1]['E'].values[0])
-        embed.append(bestEDim[bestEDim['Unnamed: 0'] == key2]['E'].values[0])
-        embed = list(set(embed))
-        for E in embed:
-            result = calculate_ccm(data, output_dir, key1, key2, E)
-            if result:
-                ccm_list.extend(result)
-    return ccm_list
+def process_pair(source, columns, output_dir, key1, key2, E, engine='native'):
+    '''
+    计算一对变量在一个 E 下的 CCM，返回两个方向的 (key1, key2, E, LibSize, rho) 行
+    source: 共享数组名（见 shared_arrays），序列矩阵 (time, key)；columns: key1、key2 所在的列
+    '''
+    array = get(source)
+    # pyEDM 将第一列视为时间列
+    data = pd.DataFrame({'time': np.arange(1, array.shape[0] + 1),
+                         key1: array[:, columns[0]], key2: array[:, columns[1]]})
+    ccm = calculate_ccm(data, output_dir, key1, key2, E, engine)
+    rows = []
+    for a, b in ((key1, key2), (key2, key1)):
+        rows.extend(zip([a] * len(ccm), [b] * len(ccm), [E] * len(ccm), ccm['LibSize'], ccm[f'{a}:{b}']))
+    return rows
 
 
-def calCCM(data, output_dir, bestEDim):
+def ccm_tasks(keys, edims, pairs=None):
     '''
-    读取数据，计算每个变量的最佳 E 值
+    展开为 (key1, key2, E) 任务，两个变量的最佳 E 相同时只算一次
+    pairs: 只保留这些变量对（frozenset 集合，见 ccm_screening.passed_pairs）
+    '''
+    tasks = []
+    for i, key1 in enumerate(keys):
+        for key2 in keys[i + 1:]:
+            if pairs is not None and frozenset((key1, key2)) not in pairs:
+                continue
+            for E in sorted({int(edims[key1]), int(edims[key2])}):
+                tasks.append((key1, key2, E))
+    return tasks
+
+
+def task_hashes(data, tasks):
+    '''
+    每个变量对两个序列的内容哈希 {(key1, key2): hash}，与引擎一起作为结果存储中 CCM 任务的键
+    '''
+    return {(key1, key2): pair_hash(data[key1].values, data[key2].values)
+            for key1, key2 in {task[:2] for task in tasks}}
+
+
+def pending_tasks(store, source, data, tasks, engine='native'):
+    '''
+    去掉结果存储中该引擎、相同序列内容已完成的任务
+    '''
+    done = store.done_tasks(source, engine_key(engine))
+    hashes = task_hashes(data, tasks)
+    return [task for task in tasks if task + (hashes[task[:2]],) not in done]
+
+
+def run_ccm_jobs(jobs, datasets, store, max_workers=6, engine='native'):
+    '''
+    在一个进程池中运行多个序列来源的 CCM 任务
+    jobs: [(source, output_dir, key1, key2, E)]，已完成的任务应事先去掉
+    datasets: {source: (data, keys)}，每个来源的序列矩阵作为一个共享数组（shared_arrays.SharedArrays）
+    每个任务完成即连同序列内容哈希和引擎写入结果存储
+    '''
+    if not jobs:
+        return
+    hashes = {source: task_hashes(datasets[source][0], [job[2:] for job in jobs if job[0] == source])
+              for source in {job[0] for job in jobs}}
+    index = {source: {key: i for i, key in enumerate(keys)} for source, (_, keys) in datasets.items()}
+    arrays = {source: data[keys].values.astype(np.float64) for source, (data, keys) in datasets.items()}
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=attach,
+                                 initargs=(shared.specs,)) as executor:
+            futures = {executor.submit(process_pair, source, (index[source][key1], index[source][key2]),
+                                       output_dir, key1, key2, E, engine):
+                       (source, key1, key2, E) for source, output_dir, key1, key2, E in jobs}
+            for n_done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                source, key1, key2, E = futures[future]
+                store.write_pair(source, key1, key2, E, future.result(), hashes[source][(key1, key2)],
+                                 engine_key(engine))
+                if n_done % 100 == 0 or n_done == len(jobs):
+                    print(f"CCM 已完成 {n_done}/{len(jobs)}")
+
+
+def export_ccm(store, source, output_dir, data, tasks, engine='native'):
+    '''
+    从结果存储导出当前序列内容、该引擎的 all_ccm_values.csv (key1, key2, E, LibSize, rho)
+    '''
+    results = store.query(source, engine=engine_key(engine))
+    results = results[results['hash'].isin(set(task_hashes(data, tasks).values()))]
+    results = results.drop(columns=['source', 'hash', 'engine']).rename(columns={'libsize': 'LibSize'})
+    results.to_csv(os.path.join(output_dir, 'all_ccm_values.csv'), index=False)
+
+
+def calCCM(data, output_dir, bestEDim, store, source, max_workers=6, engine='native', pairs=None):
+    '''
+    计算所有变量对的 CCM
+    序列矩阵放入共享数组（shared_arrays），按 (key1, key2, E) 逐个任务动态分配给工作进程，
+    每个任务完成即写入结果存储；已完成的任务不再计算。
+    最后从存储导出 all_ccm_values.csv (key1, key2, E, LibSize, rho)
     '''
     output_dir = output_dir + "/ccm/"
-    if os.path.exists(output_dir + "ccm.csv"):
-        print("文件已存在" + str(output_dir + "ccm.csv"))
-        # return
-    elif not os.path.exists(output_dir):
+    if not os.path.exists(output_dir):
         os.makedirs(output_dir)
-    keys = [col for col in data.columns.values if col in bestEDim.iloc[:, 0].values]
-    # print(keys)
-    ccm_list = []
+    edims = dict(zip(bestEDim.iloc[:, 0], bestEDim['E']))
+    keys = [col for col in data.columns.values if col in edims]
+    all_tasks = ccm_tasks(keys, edims, pairs)
+    jobs = [(source, output_dir) + task for task in pending_tasks(store, source, data, all_tasks, engine)]
+    print(f"共 {len(all_tasks)} 个 CCM 任务，其中 {len(jobs)} 个待计算")
+
+    run_ccm_jobs(jobs, {source: (data, keys)}, store, max_workers, engine)
+    export_ccm(store, source, output_dir, data, all_tasks, engine)
+
+
+SCREENING_NAME = "screening.csv"
 
-    with ProcessPoolExecutor(max_workers=6) as executor:
-        futures = [executor.submit(process_key, data, output_dir, bestEDim, keys, i) for i in range(len(keys))]
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            ccm_list.extend(result)
 
-    # 使用 pd.concat 一次性合并所有列
-    ccm_results = pd.concat(ccm_list, axis=1)
-    # 将所有 CCM 值保存为 CSV 文件
-    ccm_results.to_csv(os.path.join(output_dir, 'all_ccm_values.csv'), index=False)
+# 由分量求和得到的气溶胶总量
+DERIVED = {
+    'soa': [f'soa{i}_{m}{n}' for i in range(1, 6) for m in 'ac' for n in (1, 2)],
+    'pom': ['pom_a1', 'pom_a4', 'pom_c1', 'pom_c4'],
+    'pcl': ['pcl_a1', 'pcl_c1'],
+    'dust': ['dst_a1', 'dst_a2', 'dst_a3', 'dst_c1', 'dst_c2', 'dst_c3'],
+    'bc': ['bc_a1', 'bc_a4', 'bc_c1', 'bc_c4'],
+    'ncl': ['ncl_a1', 'ncl_a2', 'ncl_a3', 'ncl_c1', 'ncl_c2', 'ncl_c3'],
+    'sulfate': ['so4_a1', 'so4_a2', 'so4_a3', 'so4_c1', 'so4_c2', 'so4_c3'],
+    'allaerosol': ['soa', 'pom', 'dust', 'bc', 'ncl', 'sulfate'],
+}
+
+
+def add_derived(data):
+    '''
+    添加气溶胶总量列，缺少分量的总量跳过
+    '''
+    for name, parts in DERIVED.items():
+        if all(part in data.columns for part in parts):
+            data[name] = data[parts].sum(axis=1, min_count=len(parts))
+    return data
 
 
 def process_stream(filedir, output_dir):
     data = pd.read_csv(filedir)
-    data = pd.DataFrame(data)
-    data['soa'] = data['soa1_a1'] + data['soa1_a2']  + data['soa2_a1'] + data['soa2_a2']+ data['soa3_a1'] + data['soa3_a2']+ data['soa4_a1'] + data['soa4_a2']+ data['soa5_a1'] + data['soa5_a2'] + \
-                data['soa1_c1'] + data['soa1_c2'] + data['soa2_c1'] + data['soa2_c2'] + data['soa3_c1'] + data['soa3_c2'] + data['soa4_c1'] + data['soa4_c2'] + data['soa5_c1'] + data['soa5_c2']
-    data['pom'] = data['pom_a1'] + data['pom_a4'] + \
-                data['pom_c1'] + data['pom_c4']
-    data['pcl'] = data['pcl_a1'] + data['pcl_c1']
-    data['dust'] = data['dst_a1'] + data['dst_a2'] + data['dst_a3'] + \
-                data['dst_c1'] + data['dst_c2'] + data['dst_c3']
-    data['bc'] = data['bc_a1'] + data['bc_a4'] + \
-                data['bc_c1'] + data['bc_c4']
-    data['ncl'] = data['ncl_a1'] + data['ncl_a2'] + data['ncl_a3'] + \
-                data['ncl_c1'] + data['ncl_c2'] + data['ncl_c3']
-    data['sulfate'] = data['so4_a1'] + data['so4_a2'] + data['so4_a3'] + \
-                data['so4_c1'] + data['so4_c2'] + data['so4_c3']
-    # print(data['sulfate'])
-    data['allaerosol'] = data['soa'] + data['pom'] + data['dust'] + data['bc'] + data['ncl'] + data['sulfate']
-    edm = bestEdim(data, output_dir)
-    calCCM(data, output_dir, edm)
+    data = add_derived(pd.DataFrame(data))
+    store = CCMStore(os.path.join(output_dir, STORE_NAME))
+    edm = bestEdim(data, output_dir, store=store, source=filedir)
+    edims = dict(zip(edm.iloc[:, 0], edm['E']))
+    keys = [col for col in data.columns.values if col in edims]
+    # 滞后互相关与传递熵预筛选，只对通过的变量对做 CCM
+    screening = screen_pairs(data, keys)
+    os.makedirs(output_dir + "/ccm/", exist_ok=True)
+    screening.to_csv(os.path.join(output_dir + "/ccm/", SCREENING_NAME), index=False)
+    pairs = passed_pairs(screening)
+    calCCM(data, output_dir, edm, store, filedir, pairs=pairs)
+    # 收敛性与替代序列显著性检验
+    significance_table(data, ccm_tasks(keys, edims, pairs), range(26, len(data) - 26 + 1),
+                       output_file=os.path.join(output_dir + "/ccm/", SIGNIFICANCE_NAME),
+                       store=store, source=filedir)
+    store.close()
 
 
 if __name__ == "__main__":
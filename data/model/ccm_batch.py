@@ -0,0 +1,95 @@
+import os
+import pandas as pd
+from aggregate_store import source_dirs
+from ccm import searchEdim, plotEdim, ccm_tasks, pending_tasks, run_ccm_jobs, export_ccm, add_derived, SCREENING_NAME
+from ccm_screening import screen_pairs, passed_pairs
+from ccm_store import CCMStore, STORE_NAME
+
+'''
+    EDM/CCM 批量计算
+    枚举全部空间平均序列来源：Global/China/各 box × 高度/柱浓度 × S1/SSP370，
+    所有来源的最佳 E 搜索放在一个进程池中（内容相同的序列只算一次），
+    每个来源先用滞后互相关和传递熵预筛选变量对，
+    所有来源通过筛选的 CCM 任务放在一个进程池中，统一显示总进度。
+    结果写入同一个结果存储，来源标识为 {scenario}/{domain}/{region}，
+    每个来源的 bestEDim.csv、图片和 all_ccm_values.csv 输出到 OUTPUT_ROOT/{来源}/。
+'''
+
+OUTPUT_ROOT = "/home/tgm/gasplot/plot/output/ccm/"
+
+
+def load_sources(output_root=OUTPUT_ROOT, scenarios=None, domains=None, regions=None):
+    """读取全部序列来源
+
+    Returns:
+        dict: {source: (data, variables, output_dir)}
+    """
+    datasets = {}
+    for (scenario, domain, region), source_dir in source_dirs().items():
+        if ((scenarios and scenario not in scenarios) or (domains and domain not in domains) or
+                (regions and region not in regions)):
+            continue
+        file = os.path.join(source_dir, "fldmean.csv")
+        if not os.path.exists(file):
+            print(f"缺少 {file}，跳过")
+            continue
+        source = f"{scenario}/{domain}/{region}"
+        data = add_derived(pd.read_csv(file)).set_index('time')
+        # 与 bestEdim 一致：第一列在 pyEDM 中被视为时间列，不参与计算
+        datasets[source] = (data, list(data.columns[1:]), os.path.join(output_root, source) + "/")
+    return datasets
+
+
+def run_batch(output_root=OUTPUT_ROOT, E_range=range(2, 25), Tp=1, max_workers=6, engine='native', **selection):
+    """批量计算全部来源的最佳 E 与 CCM
+
+    Parameters:
+        output_root (str): 输出根目录，结果存储位于其下
+        selection: 传给 load_sources 的 scenarios / domains / regions 筛选
+    """
+    store = CCMStore(os.path.join(output_root, STORE_NAME))
+    datasets = load_sources(output_root, **selection)
+    print(f"共 {len(datasets)} 个序列来源")
+
+    # 1. 全部来源、全部变量的 Simplex 一次调度
+    series = {(source, sp): data[sp].values
+              for source, (data, variables, _) in datasets.items() for sp in variables}
+    MAEs = searchEdim(series, E_range, Tp, store, max_workers)
+    MAEs.index = pd.MultiIndex.from_tuples(MAEs.index)
+
+    # 2. 汇总全部来源未完成的 CCM 任务
+    jobs = []
+    ccm_data = {}
+    source_tasks = {}
+    for source, (data, variables, output_dir) in datasets.items():
+        maes = MAEs.loc[source]
+        edim_dir = output_dir + "best_embed_dimension/"
+        os.makedirs(edim_dir, exist_ok=True)
+        bestEDim = pd.DataFrame({'E': maes.idxmin(axis=1), 'MAE': maes.min(axis=1)})
+        bestEDim.to_csv(edim_dir + "bestEDim.csv")
+        store.write_best_edim(source, bestEDim)
+        plotEdim(maes, edim_dir)
+
+        edims = bestEDim['E'].to_dict()
+        keys = [col for col in data.columns.values if col in edims]
+        ccm_dir = output_dir + "ccm/"
+        os.makedirs(ccm_dir, exist_ok=True)
+        # 滞后互相关与传递熵预筛选
+        screening = screen_pairs(data, keys)
+        screening.to_csv(ccm_dir + SCREENING_NAME, index=False)
+        tasks = ccm_tasks(keys, edims, passed_pairs(screening))
+        jobs.extend((source, ccm_dir) + task for task in pending_tasks(store, source, data, tasks, engine))
+        ccm_data[source] = (data, keys)
+        source_tasks[source] = tasks
+    print(f"共 {len(jobs)} 个 CCM 任务待计算")
+
+    # 3. 全部来源的 CCM 在一个进程池中计算
+    run_ccm_jobs(jobs, ccm_data, store, max_workers, engine)
+    for source, (_, _, output_dir) in datasets.items():
+        export_ccm(store, source, output_dir + "ccm/", ccm_data[source][0], source_tasks[source], engine)
+    store.close()
+
+
+if __name__ == "__main__":
+    run_batch()
+    print("完成")
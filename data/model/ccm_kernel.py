@@ -0,0 +1,180 @@
+import warnings
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+
+'''
+    CCM 计算核心
+    用 NumPy/SciPy 实现收敛交叉映射 (Convergent Cross Mapping)，替代逐个库大小调用 pyEDM CCM：
+    时间延迟嵌入只构建一次。与 pyEDM 相同，每个库大小 L 的库为从有效行中随机抽取（不放回）的 L 行，
+    rho(L) 为 sample 次抽样的平均：每次抽样先把有效行随机排列，库沿该排列逐点增大，
+    前 L 个即为一个随机的 L 行库，增量维护每个预测点的 E+1 个最近邻，
+    一次扫描得到该次抽样全部库大小的预测技能。
+    不使用按时间顺序的库（前 L 行）：那样 rho(L) 会混入趋势和非平稳性，不是收敛性。
+    序列较短时一次算出完整距离矩阵（各次抽样共用），较长时逐个库点计算距离；
+    固定库（全部数据）的近邻查询使用 cKDTree。
+    约定与 pyEDM 一致：tau = 1，Tp = 0，近邻数 E+1，权重 exp(-d/d_min)，
+    预测点自身不作为近邻，预测集为全部有效行。随机数不同，逐次抽样的结果与 pyEDM 不同，
+    平均值在抽样误差内一致（tests/test_ccm_kernel.py）。
+'''
+
+# 嵌入后行数不超过该值时一次计算完整距离矩阵
+DENSE_LIMIT = 3000
+# 每个库大小的随机抽样次数（pyEDM CCM 的默认值）
+SAMPLES = 30
+
+
+def embed(x, E, tau=1):
+    """时间延迟嵌入，第 i 行为 [x_t, x_{t-tau}, ..., x_{t-(E-1)tau}]，t = i + (E-1)tau
+
+    Returns:
+        ndarray: (len(x) - (E-1)tau, E)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    offset = (E - 1) * tau
+    return np.column_stack([x[offset - j * tau:len(x) - j * tau] for j in range(E)])
+
+
+def simplex_weights(distances):
+    """近邻距离 (n, k) -> Simplex 指数权重；近邻不足（距离为 inf）的行权重为 NaN"""
+    d_min = distances[:, :1]
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        weights = np.exp(-distances / np.where(d_min > 0, d_min, 1.0))
+    # 最近邻距离为 0 时只使用距离为 0 的近邻
+    zero = d_min[:, 0] == 0
+    weights[zero] = distances[zero] == 0
+    weights[~np.isfinite(distances).all(axis=1)] = np.nan
+    return weights
+
+
+def predict(distances, indices, target):
+    """由近邻加权平均得到预测值
+
+    Parameters:
+        distances, indices (ndarray): (n, k) 近邻距离与库中行号
+        target (ndarray): (..., nlib) 目标序列，前导维度可用于批量（如替代序列）
+
+    Returns:
+        ndarray: (..., n)
+    """
+    weights = simplex_weights(distances)
+    total = weights.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (np.take(target, indices, axis=-1) * weights).sum(axis=-1) / total
+
+
+def skill(pred, obs):
+    """沿最后一维的 Pearson 相关系数，忽略 NaN"""
+    pred = np.asarray(pred, dtype=np.float64)
+    obs = np.broadcast_to(np.asarray(obs, dtype=np.float64), pred.shape)
+    valid = np.isfinite(pred) & np.isfinite(obs)
+    n = valid.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = np.where(valid, pred, 0)
+        o = np.where(valid, obs, 0)
+        pm = p.sum(axis=-1, keepdims=True) / n[..., None]
+        om = o.sum(axis=-1, keepdims=True) / n[..., None]
+        dp = np.where(valid, p - pm, 0)
+        do = np.where(valid, o - om, 0)
+        return (dp * do).sum(axis=-1) / np.sqrt((dp ** 2).sum(axis=-1) * (do ** 2).sum(axis=-1))
+
+
+def neighbors(manifold, k, valid=None):
+    """以全部有效行为库，查询每一行的 k 个最近邻（排除自身），使用 cKDTree
+
+    Returns:
+        tuple: (distances, indices)，形状 (n, k)
+    """
+    n = len(manifold)
+    if valid is None:
+        valid = np.isfinite(manifold).all(axis=1)
+    lib_rows = np.where(valid)[0]
+    distances = np.full((n, k), np.inf)
+    indices = np.zeros((n, k), dtype=int)
+    if len(lib_rows) < 2:
+        return distances, indices
+    tree = cKDTree(manifold[lib_rows])
+    kk = min(k + 1, len(lib_rows))
+    d, i = tree.query(manifold[valid], k=kk)
+    d = d.reshape(-1, kk)
+    i = lib_rows[i.reshape(-1, kk)]
+    # 排除自身：去掉与查询行相同的近邻，否则去掉最远的一个
+    rows = np.where(valid)[0]
+    is_self = i == rows[:, None]
+    drop = np.where(is_self.any(axis=1), is_self.argmax(axis=1), kk - 1)
+    keep = np.ones_like(is_self)
+    keep[np.arange(len(rows)), drop] = False
+    m = kk - 1
+    distances[rows, :m] = d[keep].reshape(-1, m)
+    indices[rows, :m] = i[keep].reshape(-1, m)
+    return distances, indices
+
+
+def _sweep(manifold, target, lib_sizes, valid, k, lib_rows, dense=None):
+    """库沿 lib_rows 的顺序逐点增大，增量维护 k 近邻，返回每个库大小的预测技能"""
+    n = len(manifold)
+    distances = np.full((n, k), np.inf)
+    indices = np.zeros((n, k), dtype=int)
+    rho = np.full(len(lib_sizes), np.nan)
+    added = 0
+    for s, size in enumerate(lib_sizes):
+        for j in lib_rows[added:size]:
+            d = dense[:, j].copy() if dense is not None else np.sqrt(((manifold - manifold[j]) ** 2).sum(axis=1))
+            d[j] = np.inf
+            # 新库点比当前第 k 近邻更近的行：替换后按距离重新排序
+            closer = d < distances[:, -1]
+            if not closer.any():
+                continue
+            rows = np.where(closer)[0]
+            distances[rows, -1] = d[rows]
+            indices[rows, -1] = j
+            order = np.argsort(distances[rows], axis=1, kind='stable')
+            distances[rows] = np.take_along_axis(distances[rows], order, axis=1)
+            indices[rows] = np.take_along_axis(indices[rows], order, axis=1)
+        added = max(added, size)
+        pred = predict(distances, indices, target)
+        pred[~valid] = np.nan
+        rho[s] = skill(pred, target)
+    return rho
+
+
+def ccm(x, y, E, lib_sizes, tau=1, names=('x', 'y'), sample=SAMPLES, seed=0):
+    """双向 CCM，每次抽样一次扫描全部库大小
+
+    Parameters:
+        x, y (array): 等长时间序列
+        E (int): 嵌入维数
+        lib_sizes (iterable): 库大小（有效嵌入行数）
+        tau (int): 延迟步长
+        names (tuple): 两个序列的名称
+        sample (int): 每个库大小的随机库个数
+        seed (int, optional): 随机数种子，相同种子结果可重复
+
+    Returns:
+        pandas.DataFrame: 列为 LibSize, '{x}:{y}', '{y}:{x}'，为 sample 个随机库的平均 rho，
+        '{x}:{y}' 为用 x 的影子流形预测 y 的技能（与 pyEDM columns=x, target=y 相同）
+    """
+    E = int(E)
+    lib_sizes = np.sort(np.unique(np.asarray(lib_sizes, dtype=int)))
+    offset = (E - 1) * tau
+    mx = embed(x, E, tau)
+    my = embed(y, E, tau)
+    tx = np.asarray(x, dtype=np.float64)[offset:]
+    ty = np.asarray(y, dtype=np.float64)[offset:]
+    valid = np.isfinite(mx).all(axis=1) & np.isfinite(my).all(axis=1) & np.isfinite(tx) & np.isfinite(ty)
+    k = E + 1
+    rng = np.random.default_rng(seed)
+    lib_rows = np.where(valid)[0]
+    dense_x = cdist(mx, mx) if len(mx) <= DENSE_LIMIT else None
+    dense_y = cdist(my, my) if len(my) <= DENSE_LIMIT else None
+    rho = np.full((sample, 2, len(lib_sizes)), np.nan)
+    for i in range(sample):
+        order = rng.permutation(lib_rows)
+        rho[i, 0] = _sweep(mx, ty, lib_sizes, valid, k, order, dense_x)
+        rho[i, 1] = _sweep(my, tx, lib_sizes, valid, k, order, dense_y)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # 全部抽样都没有结果的库大小
+        rho = np.nanmean(rho, axis=0)
+    a, b = names
+    return pd.DataFrame({'LibSize': lib_sizes, f'{a}:{b}': rho[0], f'{b}:{a}': rho[1]})
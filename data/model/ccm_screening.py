@@ -0,0 +1,205 @@
+import warnings
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+'''
+    CCM 前的变量对筛选
+    逐月序列先按位置去掉多年月平均（季节循环），否则共同的年循环会让几乎全部变量对
+    都在滞后 0 / 12 上高度相关、传递熵也偏大，筛选失去意义。
+    对全部变量对一次计算：
+    1. 滞后互相关：标准化后做 FFT，互谱逆变换得到所有滞后的交叉和，各滞后两段重叠部分的均值和方差由累积和得到，
+       即每个滞后上的 Pearson 相关（|r| ≤ 1），取 |r| 最大值及其滞后；
+    2. 分箱传递熵：按分位数离散化（缺测不参与），用 bincount 一次统计一个目标变量与全部源变量的联合频数。
+       少量样本上的分箱 TE 有明显的正偏差，不能直接比较大小：把源序列按时间随机打乱得到替代序列的 TE，
+       以替代序列的均值作偏差修正，以其均值和标准差换算的单侧 p 值做检验，
+       全部有向变量对的 p 值再做 Benjamini–Hochberg 多重比较校正。
+    只有通过阈值的变量对才交给 CCM；相互独立的序列几乎全部被排除，减少 N² 的计算量。
+'''
+
+
+def deseasonalize(values, period=12):
+    """(time, nvar) 序列按位置减去各相位（月份）的平均，第一行为第一个相位"""
+    anomaly = np.array(values, dtype=np.float64)
+    for phase in range(min(period, len(anomaly))):
+        column = anomaly[phase::period]
+        finite = np.isfinite(column)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(finite, column, 0).sum(axis=0) / finite.sum(axis=0)
+        anomaly[phase::period] = column - mean
+    return anomaly
+
+
+def _standardize(values):
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0)
+    # 缺测和常数序列置 0，不贡献相关
+    return np.nan_to_num(z, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def lagged_correlation(values, max_lag=24, block=64):
+    """全部变量对在 -max_lag..max_lag 滞后上的最大绝对相关
+
+    Parameters:
+        values (ndarray): (time, nvar)
+        max_lag (int): 最大滞后（月）
+        block (int): 每次处理的源变量数，控制内存
+
+    缺测按均值（标准化后为 0）处理。
+
+    Returns:
+        tuple: (r, lag)，均为 (nvar, nvar)；lag > 0 表示第一个变量超前
+    """
+    z = _standardize(values)
+    n, nvar = z.shape
+    max_lag = min(max_lag, n - 2)
+    nfft = 1 << int(np.ceil(np.log2(2 * n - 1)))
+    spectrum = np.fft.rfft(z, n=nfft, axis=0)  # (freq, nvar)
+    lags = np.arange(-max_lag, max_lag + 1)
+    overlap = n - np.abs(lags)
+    # 各滞后两段（前 overlap 个与后 overlap 个时次）的均值与标准差
+    cs = np.vstack([np.zeros(nvar), np.cumsum(z, axis=0)])
+    cs2 = np.vstack([np.zeros(nvar), np.cumsum(z * z, axis=0)])
+    head = cs[overlap] / overlap[:, None], cs2[overlap] / overlap[:, None]
+    tail = (cs[n] - cs[n - overlap]) / overlap[:, None], (cs2[n] - cs2[n - overlap]) / overlap[:, None]
+    ahead = (lags >= 0)[:, None]
+    # lag >= 0 时第一个变量取前段、第二个变量取后段，lag < 0 时相反
+    mean1, sq1 = (np.where(ahead, h, t) for h, t in zip(head, tail))
+    mean2, sq2 = (np.where(ahead, t, h) for h, t in zip(head, tail))
+    sd1 = np.sqrt(np.maximum(sq1 - mean1 ** 2, 0))
+    sd2 = np.sqrt(np.maximum(sq2 - mean2 ** 2, 0))
+    best_r = np.zeros((nvar, nvar))
+    best_lag = np.zeros((nvar, nvar), dtype=int)
+    for start in range(0, nvar, block):
+        stop = min(start + block, nvar)
+        # 循环互相关：c[k] = sum_t z_i[t] z_j[t + k]
+        cross = np.fft.irfft(np.conj(spectrum[:, start:stop, None]) * spectrum[:, None, :], n=nfft, axis=0)
+        cov = cross[lags % nfft] / overlap[:, None, None] - mean1[:, start:stop, None] * mean2[:, None, :]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = cov / (sd1[:, start:stop, None] * sd2[:, None, :])  # (lag, block, nvar)
+        corr = np.clip(np.nan_to_num(corr, nan=0.0, posinf=0.0, neginf=0.0), -1, 1)  # 常数段不贡献相关
+        idx = np.abs(corr).argmax(axis=0)
+        best_r[start:stop] = np.take_along_axis(corr, idx[None], axis=0)[0]
+        best_lag[start:stop] = lags[idx]
+    return best_r, best_lag
+
+
+def discretize(values, bins=4):
+    """按各列分位数离散化为 0..bins-1，缺测为 -1"""
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # 全部缺测的列
+        edges = np.nanquantile(values, np.linspace(0, 1, bins + 1)[1:-1], axis=0)  # (bins-1, nvar)
+    codes = (values[None] > edges[:, None, :]).sum(axis=0)
+    return np.where(finite, np.minimum(codes, bins - 1), -1)
+
+
+def _entropy(counts, axis):
+    """由频数计算熵（沿 axis 的各维度求和）"""
+    total = counts.sum(axis=axis, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = counts / total
+        return -np.nansum(np.where(p > 0, p * np.log(p), 0), axis=axis)
+
+
+def transfer_entropy(values, bins=4, lag=1):
+    """全部变量对的分箱传递熵 TE(源 -> 目标)
+
+    TE = H(Y_t+1 | Y_t) - H(Y_t+1 | Y_t, X_t)
+    任一项缺测的时次不计入联合频数。
+
+    Returns:
+        ndarray: (nvar, nvar)，[i, j] 为变量 i -> 变量 j
+    """
+    return _transfer_entropy(discretize(values, bins), bins, lag)
+
+
+def te_surrogates(values, bins=4, lag=1, n_surrogates=100, seed=0):
+    """源序列按时间随机打乱（目标序列不变）后的传递熵，即源与目标无关时 TE 的零分布
+
+    Returns:
+        ndarray: (n_surrogates, nvar, nvar)
+    """
+    rng = np.random.default_rng(seed)
+    codes = discretize(values, bins)
+    source = codes[:-lag]
+    return np.stack([_transfer_entropy(codes, bins, lag, source[rng.permutation(len(source))])
+                     for _ in range(n_surrogates)])
+
+
+def _transfer_entropy(codes, bins, lag, source=None):
+    """由离散化编码计算 TE；source 为替代的源序列编码 (time - lag, nvar)，默认为 codes[:-lag]"""
+    x0 = codes[:-lag] if source is None else source
+    y0 = codes[:-lag]
+    y1 = codes[lag:]
+    nvar = codes.shape[1]
+    te = np.zeros((nvar, nvar))
+    for j in range(nvar):
+        # 目标 j 与全部源变量的联合编码 (y1, y0, x0)，按源变量偏移后一次 bincount
+        joint = (y1[:, j, None] * bins + y0[:, j, None]) * bins + x0  # (time, nvar)
+        valid = (y1[:, j, None] >= 0) & (y0[:, j, None] >= 0) & (x0 >= 0)
+        joint = np.where(valid, joint, 0) + np.arange(nvar) * bins ** 3
+        counts = np.bincount(joint.ravel(), weights=valid.ravel(),
+                             minlength=nvar * bins ** 3).reshape(nvar, bins, bins, bins)
+        h_y1y0x0 = _entropy(counts, axis=(1, 2, 3))
+        h_y0x0 = _entropy(counts.sum(axis=1), axis=(1, 2))
+        h_y1y0 = _entropy(counts.sum(axis=3), axis=(1, 2))
+        h_y0 = _entropy(counts.sum(axis=(1, 3)), axis=1)
+        te[:, j] = (h_y1y0 - h_y0) - (h_y1y0x0 - h_y0x0)
+    np.fill_diagonal(te, 0)
+    return te
+
+
+def screen_pairs(data, variables, max_lag=24, corr_threshold=0.5, te_alpha=0.05, bins=4, period=12,
+                 n_surrogates=100, seed=0):
+    """筛选值得做 CCM 的变量对
+
+    Parameters:
+        data (DataFrame): 逐月序列
+        variables (list): 参与筛选的变量
+        max_lag (int): 互相关最大滞后
+        corr_threshold (float): |r| 阈值
+        te_alpha (float): 传递熵检验的错误发现率（Benjamini–Hochberg 校正后的 p 值阈值）
+        bins (int): 传递熵离散化箱数
+        period (int): 季节循环的周期（行数），先去掉各相位的平均；None 为不去
+        n_surrogates (int): 每个变量对的源打乱替代序列个数
+        seed (int): 替代序列的随机数种子
+
+    Returns:
+        pandas.DataFrame: 每个无序变量对一行，te_12 / te_21 为减去替代序列均值后的 TE，
+        q_12 / q_21 为校正后的 p 值，passed 列为是否通过
+    """
+    variables = list(variables)
+    values = data[variables].values.astype(np.float64)
+    if period:
+        values = deseasonalize(values, period)
+    r, lag = lagged_correlation(values, max_lag)
+    te = transfer_entropy(values, bins)
+    null = te_surrogates(values, bins, n_surrogates=n_surrogates, seed=seed)
+    null_mean, null_std = null.mean(axis=0), null.std(axis=0, ddof=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = stats.norm.sf((te - null_mean) / null_std)
+    p = np.where(np.isfinite(p), p, 1.0)  # 替代序列 TE 全部相同（如常数序列）
+    i, j = np.triu_indices(len(variables), k=1)
+    q = stats.false_discovery_control(np.concatenate([p[i, j], p[j, i]])) if len(i) else np.array([])
+    table = pd.DataFrame({
+        'key1': np.asarray(variables)[i],
+        'key2': np.asarray(variables)[j],
+        'max_corr': r[i, j],
+        'lag': lag[i, j],
+        'te_12': te[i, j] - null_mean[i, j],
+        'te_21': te[j, i] - null_mean[j, i],
+        'q_12': q[:len(i)],
+        'q_21': q[len(i):],
+    })
+    te_passed = np.minimum(table['q_12'], table['q_21']) < te_alpha
+    table['passed'] = (table['max_corr'].abs() >= corr_threshold) | te_passed
+    return table
+
+
+def passed_pairs(table):
+    """通过筛选的变量对集合（无序）"""
+    passed = table[table['passed']]
+    return {frozenset(pair) for pair in zip(passed['key1'], passed['key2'])}
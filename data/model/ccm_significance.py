@@ -0,0 +1,174 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy import stats
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor
+from ccm_kernel import ccm, embed, neighbors, predict, skill
+from ccm_store import pair_hash, engine_key
+
+'''
+    CCM 显著性与收敛性检验
+    对每个变量对的两个方向：
+    1. 收敛性：rho 随库大小的增量 (rho(L_max) - rho(L_min)) 及 Kendall tau，
+       rho(L) 为随机库的平均（ccm_kernel.py），不受按时间顺序增大库时趋势的影响；
+    2. 显著性：以全部数据为库，将被预测序列替换为
+       季节替代序列（月气候态 + 打乱的距平）和随机打乱序列，
+       得到零分布下的 rho 及 p 值。
+    rho 随库大小的曲线直接读取结果存储中 calCCM 已算好的值（ccm_store.py），不再重新计算 CCM；
+    影子流形的近邻与被预测序列无关，只需查询一次，
+    全部替代序列的预测是一次批量加权平均，不需要逐个替代序列重新计算 CCM。
+'''
+
+SIGNIFICANCE_NAME = "ccm_significance.csv"
+# 收敛判据：rho(L_max) - rho(L_min) 的最小增量，及 Kendall tau 检验的显著性水平。
+# rho(L) 为随机库的平均，曲线平滑，只要求增量 > 0 时平坦的曲线约一半也能通过
+MIN_DELTA_RHO = 0.05
+ALPHA = 0.05
+
+
+def seasonal_surrogates(y, n, period=12, rng=None):
+    """季节替代序列：保留月气候态，打乱距平
+
+    Returns:
+        ndarray: (n, len(y))
+    """
+    rng = np.random.default_rng(rng)
+    y = np.asarray(y, dtype=np.float64)
+    phase = np.arange(len(y)) % period
+    climatology = np.array([np.nanmean(y[phase == p]) for p in range(period)])
+    anomaly = y - climatology[phase]
+    order = np.argsort(rng.random((n, len(y))), axis=1)
+    return anomaly[order] + climatology[phase]
+
+
+def shuffle_surrogates(y, n, rng=None):
+    """随机打乱序列
+
+    Returns:
+        ndarray: (n, len(y))
+    """
+    rng = np.random.default_rng(rng)
+    y = np.asarray(y, dtype=np.float64)
+    return y[np.argsort(rng.random((n, len(y))), axis=1)]
+
+
+def convergence(lib_sizes, rho):
+    """收敛性统计：rho 的增量与 rho 随库大小的 Kendall tau"""
+    lib_sizes = np.asarray(lib_sizes)
+    rho = np.asarray(rho, dtype=np.float64)
+    valid = np.isfinite(rho)
+    if valid.sum() < 3:
+        return np.nan, np.nan, np.nan
+    tau, p_value = stats.kendalltau(lib_sizes[valid], rho[valid])
+    delta = rho[valid][-1] - rho[valid][0]
+    return delta, tau, p_value
+
+
+def surrogate_pvalue(observed, null):
+    """单侧 p 值：替代序列 rho 不小于观测值的比例，观测值缺测时为 NaN"""
+    if not np.isfinite(observed):
+        return np.nan
+    null = null[np.isfinite(null)]
+    return (1 + np.sum(null >= observed)) / (1 + len(null))
+
+
+def stored_sweep(store, source, key1, key2, E, series_hash, engine='native'):
+    """从结果存储读取一个任务两个方向的 rho(L)，列为 LibSize、'{key1}:{key2}'、'{key2}:{key1}'；没有结果时为 None"""
+    sweep = None
+    for a, b in ((key1, key2), (key2, key1)):
+        rows = store.query(source, a, b, int(E), series_hash, engine_key(engine))
+        if rows.empty:
+            return None
+        rho = rows.set_index('libsize')['rho'].rename(f'{a}:{b}')
+        sweep = rho.to_frame() if sweep is None else sweep.join(rho, how='inner')
+    return sweep.rename_axis('LibSize').reset_index()
+
+
+def pair_significance(x, y, E, lib_sizes, n_surrogates=100, period=12, seed=0, names=('x', 'y'), tau=1,
+                      sweep=None):
+    """一个变量对两个方向的收敛性与显著性
+
+    sweep: 已有的 rho(L)（见 stored_sweep），为 None 时按 lib_sizes 计算 CCM
+
+    Returns:
+        list: 每个方向一个 dict，'{x}:{y}' 为用 x 的影子流形预测 y
+    """
+    E = int(E)
+    rng = np.random.default_rng(seed)
+    offset = (E - 1) * tau
+    if sweep is None:
+        sweep = ccm(x, y, E, lib_sizes, tau, names)
+    series = {names[0]: np.asarray(x, dtype=np.float64), names[1]: np.asarray(y, dtype=np.float64)}
+    rows = []
+    for a, b in (names, names[::-1]):
+        manifold = embed(series[a], E, tau)
+        target = series[b]
+        valid = np.isfinite(manifold).all(axis=1) & np.isfinite(target[offset:])
+        distances, indices = neighbors(manifold, E + 1, valid)
+        observed = skill(predict(distances, indices, target[offset:]), target[offset:])
+
+        # 全部替代序列一次预测
+        null = {}
+        for kind, surrogates in (('seasonal', seasonal_surrogates(target, n_surrogates, period, rng)),
+                                 ('shuffle', shuffle_surrogates(target, n_surrogates, rng))):
+            surrogates = surrogates[:, offset:]
+            pred = predict(distances, indices, surrogates)
+            pred[:, ~valid] = np.nan
+            null[kind] = skill(pred, surrogates)
+
+        delta, kendall_tau, kendall_p = convergence(sweep['LibSize'], sweep[f'{a}:{b}'])
+        rows.append({
+            'key1': a, 'key2': b, 'E': E,
+            'rho': observed,
+            'rho_min_lib': sweep[f'{a}:{b}'].iloc[0],
+            'delta_rho': delta,
+            'kendall_tau': kendall_tau,
+            'kendall_p': kendall_p,
+            'seasonal_q95': np.nanquantile(null['seasonal'], 0.95),
+            'p_seasonal': surrogate_pvalue(observed, null['seasonal']),
+            'shuffle_q95': np.nanquantile(null['shuffle'], 0.95),
+            'p_shuffle': surrogate_pvalue(observed, null['shuffle']),
+        })
+    return rows
+
+
+def significance_table(data, tasks, lib_sizes, n_surrogates=100, period=12, max_workers=6, output_file=None,
+                       store=None, source=None, engine='native'):
+    """全部变量对的显著性表
+
+    Parameters:
+        data (DataFrame): 各变量的逐月序列
+        tasks (list): (key1, key2, E) 任务，见 ccm.ccm_tasks
+        lib_sizes (iterable): 收敛性检验的库大小，结果存储中没有该任务时使用
+        output_file (str, optional): 结果 CSV
+        store (CCMStore, optional): 读取 calCCM 已算好的 rho(L)
+        source (str, optional): store 中的序列来源
+        engine (str): store 中 CCM 结果的计算引擎
+
+    Returns:
+        pandas.DataFrame
+    """
+    rows = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(pair_significance, data[key1].values, data[key2].values, E, lib_sizes,
+                                   n_surrogates, period, i, (key1, key2),
+                                   sweep=None if store is None else stored_sweep(
+                                       store, source, key1, key2, E,
+                                       pair_hash(data[key1].values, data[key2].values), engine))
+                   for i, (key1, key2, E) in enumerate(tasks)]
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            rows.extend(future.result())
+            if done % 100 == 0:
+                print(f"显著性检验已完成 {done}/{len(tasks)}")
+    table = pd.DataFrame(rows)
+    if len(table):
+        # 收敛且优于两种零分布
+        table['significant'] = ((table['delta_rho'] > MIN_DELTA_RHO) & (table['kendall_tau'] > 0) &
+                                (table['kendall_p'] < ALPHA) &
+                                (table['p_seasonal'] < ALPHA) & (table['p_shuffle'] < ALPHA))
+        table = table.sort_values('rho', ascending=False).reset_index(drop=True)
+    if output_file is not None:
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        table.to_csv(output_file, index=False)
+    return table
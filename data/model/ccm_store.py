@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from render_cache import fingerprint
+from ccm_kernel import SAMPLES
+
+'''
+    CCM 结果存储
+    用 SQLite 保存最佳嵌入维数搜索和 CCM 的全部结果（长表），每个任务完成即提交，
+    中断后重新运行只计算未完成的任务；下游按条件查询，不需要读入整张宽表 CSV。
+    表：
+        edim      (hash, E, Tp, MAE)                     Simplex 自预测误差，按序列哈希缓存
+        best_edim (source, variable, E, MAE)             每个序列来源的最佳 E
+        ccm       (source, hash, engine, key1, key2, E, libsize, rho)  key1:key2 为用 key1 的影子流形预测 key2
+        ccm_done  (source, hash, engine, key1, key2, E)                已完成的 CCM 任务
+    CCM 任务的 hash 为两个序列的内容哈希（pair_hash），engine 为引擎与每个库大小的随机库个数（engine_key），
+    两者一起作为键：序列内容、引擎或抽样方式变化后旧结果不再视为完成，查询时按 hash、engine 取当前结果。
+    只由主进程写入。
+'''
+
+STORE_NAME = "ccm_store.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS edim (
+    hash TEXT, E INTEGER, Tp INTEGER, MAE REAL,
+    PRIMARY KEY (hash, E, Tp));
+CREATE TABLE IF NOT EXISTS best_edim (
+    source TEXT, variable TEXT, E INTEGER, MAE REAL,
+    PRIMARY KEY (source, variable));
+CREATE TABLE IF NOT EXISTS ccm (
+    source TEXT, hash TEXT, engine TEXT, key1 TEXT, key2 TEXT, E INTEGER, libsize INTEGER, rho REAL,
+    PRIMARY KEY (source, hash, engine, key1, key2, E, libsize));
+CREATE TABLE IF NOT EXISTS ccm_done (
+    source TEXT, hash TEXT, engine TEXT, key1 TEXT, key2 TEXT, E INTEGER,
+    PRIMARY KEY (source, hash, engine, key1, key2, E));
+"""
+
+
+def pair_hash(x, y):
+    """CCM 任务 (key1, key2) 两个序列的内容哈希"""
+    return fingerprint(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+
+
+def engine_key(engine, sample=SAMPLES):
+    """结果存储中的引擎标识，如 native/sample=30"""
+    return f"{engine}/sample={sample}"
+
+
+class CCMStore:
+    """CCM 结果存储
+
+    用法:
+        store = CCMStore(output_dir + STORE_NAME)
+        done = store.done_tasks(source, engine)
+        store.write_pair(source, key1, key2, E, rows, series_hash, engine)
+        df = store.query(source, key1='CL', engine=engine)
+    """
+
+    def __init__(self, db_file):
+        os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # 旧版本的 CCM 表没有 hash、engine 列，无法判断结果是否仍然有效，删除后重新计算
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(ccm)")]
+        if columns and 'hash' not in columns:
+            self.conn.executescript("DROP TABLE ccm; DROP TABLE IF EXISTS ccm_done;")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    # 最佳嵌入维数
+    def edim_cache(self):
+        """返回 {(hash, E, Tp): MAE}"""
+        return {(h, e, tp): mae for h, e, tp, mae in self.conn.execute("SELECT hash, E, Tp, MAE FROM edim")}
+
+    def write_edim(self, key, mae):
+        h, E, Tp = key
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO edim VALUES (?, ?, ?, ?)", (h, int(E), int(Tp), float(mae)))
+
+    def write_best_edim(self, source, bestEDim):
+        """bestEDim: 索引为变量，含 E、MAE 列"""
+        with self.conn:
+            self.conn.execute("DELETE FROM best_edim WHERE source = ?", (source,))
+            self.conn.executemany("INSERT INTO best_edim VALUES (?, ?, ?, ?)",
+                                  [(source, var, int(E), float(mae)) for var, E, mae in
+                                   zip(bestEDim.index, bestEDim['E'], bestEDim['MAE'])])
+
+    def best_edim(self, source):
+        return pd.read_sql_query("SELECT variable, E, MAE FROM best_edim WHERE source = ?",
+                                 self.conn, params=(source,), index_col='variable')
+
+    # CCM
+    def done_tasks(self, source, engine):
+        """该引擎已完成的 (key1, key2, E, hash) 集合"""
+        return {(k1, k2, E, h) for k1, k2, E, h in
+                self.conn.execute("SELECT key1, key2, E, hash FROM ccm_done WHERE source = ? AND engine = ?",
+                                  (source, engine))}
+
+    def write_pair(self, source, key1, key2, E, rows, series_hash, engine):
+        """写入一个任务的全部 (key1, key2, E, libsize, rho) 行并标记完成（同一事务）"""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO ccm VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                  [(source, series_hash, engine, a, b, int(e), int(lib), float(rho))
+                                   for a, b, e, lib, rho in rows])
+            self.conn.execute("INSERT OR REPLACE INTO ccm_done VALUES (?, ?, ?, ?, ?, ?)",
+                              (source, series_hash, engine, key1, key2, int(E)))
+
+    def query(self, source=None, key1=None, key2=None, E=None, series_hash=None, engine=None):
+        """按条件查询 CCM 长表"""
+        conditions = []
+        params = []
+        for column, value in (('source', source), ('key1', key1), ('key2', key2), ('E', E),
+                              ('hash', series_hash), ('engine', engine)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT source, hash, engine, key1, key2, E, libsize, rho FROM ccm"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return pd.read_sql_query(sql + " ORDER BY key1, key2, E, libsize", self.conn, params=params)
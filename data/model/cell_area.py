@@ -0,0 +1,105 @@
+import functools
+import numpy as np
+import pandas as pd
+
+'''
+    格点面积服务
+    原先格点面积有三种互不一致的算法：acei_unit 中的双重循环、省份排放中的 Web Mercator (EPSG:3857)
+    多边形面积（高纬省份面积偏大），以及 cdo/xarray 求区域平均时隐含的等权重。
+    现在统一由本模块提供：
+        cell_areas       规则经纬度网格的球面格点面积 (m², float64)，按网格缓存
+        region_areas     区域面积 = Σ 格点面积 × 格点在区域内的比例，与格点面积一致
+        weighted_mean    按格点面积加权的区域平均
+        flux_to_mass     kg m-2 s-1 -> 每个格点、每个时段的 kg
+        mass_to_flux     kg/格点/时段 -> kg m-2 s-1
+        seconds_in_month 按实际日历的每月秒数
+    单位换算、省份/区域排放量和区域平均都应使用这里的面积。
+'''
+
+R = 6371000  # 地球半径 (m)
+SECONDS_PER_DAY = 24 * 3600
+
+
+def cell_edges(centers):
+    """由格点中心坐标推算格点边界（相邻中点，两端外推半个格距）"""
+    centers = np.asarray(centers, dtype=np.float64)
+    mid = (centers[1:] + centers[:-1]) / 2
+    first = centers[0] - (mid[0] - centers[0])
+    last = centers[-1] + (centers[-1] - mid[-1])
+    return np.concatenate([[first], mid, [last]])
+
+
+@functools.lru_cache(maxsize=16)
+def _cell_areas(lat_bytes, lon_bytes):
+    lat = np.frombuffer(lat_bytes, dtype=np.float64)
+    lon = np.frombuffer(lon_bytes, dtype=np.float64)
+    lat_edges = np.clip(cell_edges(lat), -90, 90)
+    lon_edges = cell_edges(lon)
+    band = np.abs(np.diff(np.sin(np.deg2rad(lat_edges))))
+    dlon = np.abs(np.diff(np.deg2rad(lon_edges)))
+    areas = R**2 * np.outer(band, dlon)
+    areas.setflags(write=False)
+    return areas
+
+
+def cell_areas(lat, lon):
+    """规则经纬度网格每个格点的球面面积 (m²)，形状 (nlat, nlon)，同一网格只计算一次（只读数组）"""
+    lat = np.ascontiguousarray(lat, dtype=np.float64)
+    lon = np.ascontiguousarray(lon, dtype=np.float64)
+    return _cell_areas(lat.tobytes(), lon.tobytes())
+
+
+def seconds_in_month(time):
+    """时间坐标中每个月的秒数（按实际日历，闰年二月为 29 天）"""
+    return pd.DatetimeIndex(time).days_in_month.values * SECONDS_PER_DAY
+
+
+def region_areas(lat, lon, masks):
+    """各区域面积 (m²)
+
+    Parameters:
+        masks (ndarray): (区域, lat, lon)，bool 掩码或格点落在区域内的比例
+
+    Returns:
+        ndarray: (区域,)
+    """
+    masks = np.asarray(masks, dtype=np.float64)
+    return masks.reshape(len(masks), -1) @ cell_areas(lat, lon).ravel()
+
+
+def weighted_mean(values, lat, lon, mask=None):
+    """按格点面积加权的区域平均，NaN 不参与
+
+    Parameters:
+        values (ndarray): (..., lat, lon)
+        mask (ndarray, optional): (lat, lon) bool 掩码或区域内比例
+
+    Returns:
+        ndarray: (...)，区域内全部为 NaN 时为 NaN
+    """
+    weights = cell_areas(lat, lon)
+    if mask is not None:
+        weights = weights * np.asarray(mask, dtype=np.float64)
+    values = np.asarray(values)
+    finite = np.isfinite(values)
+    total = np.where(finite, values, 0) * weights
+    norm = finite * weights
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total.sum(axis=(-2, -1)) / norm.sum(axis=(-2, -1))
+
+
+def flux_to_mass(flux, lat, lon, seconds):
+    """kg m-2 s-1 转换为每个格点、每个时段的排放量 (kg)
+
+    Parameters:
+        flux (ndarray): (time, lat, lon)
+        seconds (float or ndarray): 时段秒数，标量或 (time,)
+    """
+    seconds = np.asarray(seconds, dtype=np.float64).reshape(-1, 1, 1) if np.ndim(seconds) else seconds
+    return flux * cell_areas(lat, lon) * seconds
+
+
+def mass_to_flux(mass, lat, lon, seconds):
+    """每个格点、每个时段的排放量 (kg) 转换为 kg m-2 s-1"""
+    seconds = np.asarray(seconds, dtype=np.float64).reshape(-1, 1, 1) if np.ndim(seconds) else seconds
+    return mass / (cell_areas(lat, lon) * seconds)
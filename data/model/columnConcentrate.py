@@ -3,6 +3,7 @@ import xarray as xr
 import numpy as np
 from astropy import units as u
 import concurrent.futures
+from nc_writer import write_netcdf
 
 # 定义重力加速度（单位：m/s^2）
 g = 9.80665 * u.m / u.s
@@ -122,7 +123,7 @@ def convert_to_column_concentration(filename):
 
         except Exception as e:
             print(f"❌ 处理文件 {var_name} 时出错: {e}")
-    ds.to_netcdf(new_filename)
+    write_netcdf(ds, new_filename, 'fast-write')
     print(f"✅ 文件保存成功: {new_filename}")
 
 if __name__ == "__main__":
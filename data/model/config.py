@@ -62,3 +62,17 @@ colmean_nochg = col_nochg_dir + "/colfldmean/"
 
 cncolmean_fin = cncol_fin_dir + "/colcutfldmean/"
 cncolmean_nochg = cncol_nochg_dir + "/colcutfldmean/"
+
+# 排放清单与地理数据路径
+gasdata_dir = "/mnt/d/gasdata/"
+province_shp = gasdata_dir + "2024年全国shp/中国_省.shp"
+cache_dir = gasdata_dir + "cache/"
+# 分析结果缓存（analysis_cache.py）及其容量上限
+analysis_cache_dir = cache_dir + "analysis/"
+analysis_cache_bytes = 2 * 1024**3
+# 年/季节聚合存储
+aggregate_dir = "/mnt/d/fin/aggregate/"
+# 排放汇总立方体（emission_cube.py）
+emission_cube_dir = gasdata_dir + "result/emission_cube/"
+# 格点趋势图（trend_map.py）
+trend_map_dir = "/mnt/d/fin/trend_map/"
@@ -0,0 +1,134 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+import config as cfg
+from aggregate_store import AggregateStore, DOMAINS
+
+'''
+    偏离率报告
+    直接在聚合存储的 (情景, 区域, 变量, 年) 数组上计算 S1 相对 SSP370 的偏离率
+    (fin - nochg) / nochg，对所有变量、区域和时间窗口一次向量化得到
+    (变量 × 区域 × 窗口) 的平均值、最大值、最小值，输出为一张可排序的长表。
+    取代各趋势脚本中逐区域计算、逐文件写出的 deviation_rates_*.csv
+    以及 difference.py 中逐文件计算的最大/平均/最小比值。
+'''
+
+REPORT_NAME = "deviation_report.csv"
+
+# 时间窗口：末尾若干年（None 为全部年份）
+WINDOWS = {
+    'last1': 1,
+    'last5': 5,
+    'all': None,
+}
+
+
+def deviation_tensor(store, domain):
+    """全部区域、变量、年份的偏离率
+
+    Returns:
+        ndarray: (region, variable, year)
+    """
+    annual = np.asarray(store.array(domain, 'annual'))
+    fin = annual[store.index['scenarios'].index('fin')]
+    nochg = annual[store.index['scenarios'].index('nochg')]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = (fin - nochg) / nochg
+    # SSP370 为 0 的位置偏离率无意义
+    rate[~np.isfinite(rate)] = np.nan
+    return rate
+
+
+def window_statistics(rate, windows=None):
+    """沿年份轴计算各窗口的平均、最大、最小偏离率
+
+    Parameters:
+        rate (ndarray): (region, variable, year)
+        windows (dict, optional): {窗口名: 末尾年数或 None}，默认 WINDOWS
+
+    Returns:
+        dict: {统计量: ndarray (window, region, variable)}
+    """
+    if windows is None:
+        windows = WINDOWS
+    nyear = rate.shape[-1]
+    # (window, year) 掩码，一次广播完成所有窗口
+    mask = np.zeros((len(windows), nyear), dtype=bool)
+    for i, length in enumerate(windows.values()):
+        mask[i, -(length or nyear):] = True
+    stacked = np.where(mask[:, None, None, :], rate[None], np.nan)
+    # 全为 NaN 的窗口结果为 NaN，不提示
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return {
+            'mean': np.nanmean(stacked, axis=-1),
+            'max': np.nanmax(stacked, axis=-1),
+            'min': np.nanmin(stacked, axis=-1),
+        }
+
+
+def deviation_report(store=None, domains=DOMAINS, windows=None, variables=None):
+    """生成 (数据域, 变量, 区域, 窗口) 的偏离率长表
+
+    Parameters:
+        store (AggregateStore, optional): 聚合存储，默认新建
+        domains (tuple): 数据域 surface / column
+        windows (dict, optional): 时间窗口，默认 WINDOWS
+        variables (list, optional): 只保留这些变量
+
+    Returns:
+        pandas.DataFrame: 列为 domain, variable, region, window, mean, max, min, abs_mean，
+        按 abs_mean 从大到小排序
+    """
+    if store is None:
+        store = AggregateStore()
+    if windows is None:
+        windows = WINDOWS
+    tables = []
+    for domain in domains:
+        if domain not in store.index['domains']:
+            continue
+        stats = window_statistics(deviation_tensor(store, domain), windows)
+        window_idx, region_idx, var_idx = np.indices(stats['mean'].shape).reshape(3, -1)
+        table = pd.DataFrame({
+            'domain': domain,
+            'variable': np.asarray(store.variables(domain))[var_idx],
+            'region': np.asarray(store.regions)[region_idx],
+            'window': np.asarray(list(windows))[window_idx],
+            'mean': stats['mean'].ravel(),
+            'max': stats['max'].ravel(),
+            'min': stats['min'].ravel(),
+        })
+        tables.append(table)
+    report = pd.concat(tables, ignore_index=True)
+    if variables is not None:
+        report = report[report['variable'].isin(variables)]
+    report['abs_mean'] = report['mean'].abs()
+    return report.sort_values('abs_mean', ascending=False, na_position='last').reset_index(drop=True)
+
+
+def deviation_rates(store, domain, window='last5', variables=None, labels=None):
+    """单个数据域、单个窗口的平均偏离率宽表（变量 × 区域）
+
+    与各趋势脚本原来写出的 deviation_rates.csv 格式相同。
+
+    Parameters:
+        labels (dict, optional): 区域名 -> 输出列名
+    """
+    stats = window_statistics(deviation_tensor(store, domain), {window: WINDOWS.get(window, window)})
+    table = pd.DataFrame(stats['mean'][0].T, index=store.variables(domain), columns=store.regions)
+    if variables is None:
+        variables = store.field_variables(domain)
+    table = table.loc[variables]
+    if labels is not None:
+        table = table.rename(columns=labels)
+    return table
+
+
+if __name__ == "__main__":
+    report = deviation_report()
+    output_file = os.path.join(cfg.aggregate_dir, REPORT_NAME)
+    report.to_csv(output_file, index=False)
+    print(report.head(30))
+    print(f"偏离率报告已保存: {output_file}")
@@ -0,0 +1,222 @@
+import os
+import json
+import warnings
+import numpy as np
+import pandas as pd
+import xarray as xr
+import geopandas as gpd
+import config as cfg
+from cell_area import cell_areas
+from province_emissions import province_masks
+from analysis_cache import file_fingerprint
+from render_cache import fingerprint
+
+'''
+    排放汇总立方体
+    原先 fig3.1 / fig3.2 / fig3.3 各自读取 mean.py 经 cdo fldmean 生成的 maskedFinalHcl_mean.csv、
+    maskedFinalpcl_mean.csv，再各自求 HCl_all、按年 resample 或按月 groupby。
+    这里由格点排放清单一次生成 物种 × 部门 × 区域 × 年 × 月 的区域平均通量 (kg m-2 s-1)：
+        区域平均按格点面积加权（cell_area.py），NaN（中国以外）不参与，与 cdo fldmean 相同
+        区域为 China（全部省份，与 maskup 的掩码相同）及 East / Middle / West（由省份组成）
+        每个部门按时间分块读取，块内全部区域由一次矩阵乘法得到
+    存储为内存映射的 .npy 及 index.json，index.json 记录输入文件指纹，输入不变时不再重建。
+    读取：
+        cube = EmissionCube()
+        cube.monthly('HCl')      逐月序列（与原 CSV 相同的列，另加 HCl_all、TOTAL）
+        cube.annual('HCl')       年平均（索引为年末日期，与 resample('YE') 相同）
+        cube.climatology('HCl')  多年月平均（索引为月份 1-12）
+    路径：
+        emission_cube_dir/index.json
+        emission_cube_dir/emission_cube.npy   (species, sector, region, year, month)
+'''
+
+SECTORS = ('agri', 'bbop', 'ene', 'ind', 'res', 'wstop')
+# 汇总为“其它”的部门
+OTHER_SECTORS = ('agri', 'bbop', 'wstop')
+EMISSION_FILES = {
+    'HCl': cfg.gasdata_dir + "result/maskedFinalHcl.nc",
+    'pCl': cfg.gasdata_dir + "result/maskedFinalpcl.nc",
+}
+REGIONS = {
+    'East': ['北京市', '天津市', '河北省', '上海市', '江苏省', '浙江省', '福建省', '山东省', '广东省', '海南省'],
+    'Middle': ['山西省', '安徽省', '江西省', '河南省', '湖北省', '湖南省'],
+    'West': ['内蒙古自治区', '广西壮族自治区', '重庆市', '四川省', '贵州省', '云南省',
+             '西藏自治区', '陕西省', '甘肃省', '青海省', '宁夏回族自治区', '新疆维吾尔自治区'],
+}
+INDEX_NAME = "index.json"
+CUBE_NAME = "emission_cube.npy"
+
+
+def region_weights(lat, lon, shp_file=None, regions=REGIONS):
+    """区域权重矩阵：格点面积 × 区域掩码
+
+    Returns:
+        tuple: (区域名列表, (区域, lat × lon) 权重)，第一个区域为 China（全部省份）
+    """
+    province_shapes = gpd.read_file(shp_file or cfg.province_shp)
+    names, masks = province_masks(lat, lon, province_shapes)
+    region_masks = [masks.any(axis=0)]
+    for provinces in regions.values():
+        region_masks.append(masks[[names.index(p) for p in provinces if p in names]].any(axis=0))
+    weights = np.stack(region_masks).reshape(len(region_masks), -1) * cell_areas(lat, lon).ravel()
+    return ['China'] + list(regions), weights
+
+
+def region_means(values, weights):
+    """面积加权区域平均，NaN 不参与
+
+    Parameters:
+        values (ndarray): (time, 格点)
+        weights (ndarray): (区域, 格点)
+
+    Returns:
+        ndarray: (time, 区域)
+    """
+    finite = np.isfinite(values)
+    total = np.where(finite, values, 0) @ weights.T
+    covered = finite.astype(np.float64) @ weights.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / covered
+
+
+def _input_key(files, shp_file, regions):
+    inputs = list(files.values()) + [shp_file]
+    return fingerprint([file_fingerprint(p) for p in inputs], list(files), SECTORS, regions)
+
+
+def build_emission_cube(cube_dir=None, files=EMISSION_FILES, shp_file=None, regions=REGIONS,
+                        time_chunk=120, overwrite=False):
+    """由格点排放清单生成排放汇总立方体
+
+    Parameters:
+        cube_dir (str, optional): 存储目录，默认 cfg.emission_cube_dir
+        files (dict): {物种: 格点排放文件}
+        shp_file (str, optional): 省份 shapefile，默认 cfg.province_shp
+        time_chunk (int): 每次读取的时次数
+        overwrite (bool): 是否强制重建
+
+    Returns:
+        str: 存储目录
+    """
+    cube_dir = cube_dir or cfg.emission_cube_dir
+    shp_file = shp_file or cfg.province_shp
+    os.makedirs(cube_dir, exist_ok=True)
+    index_file = os.path.join(cube_dir, INDEX_NAME)
+    key = _input_key(files, shp_file, regions)
+    if not overwrite and os.path.exists(index_file):
+        with open(index_file, 'r', encoding='utf-8') as f:
+            if json.load(f).get('key') == key:
+                print(f"文件已存在: {cube_dir}")
+                return cube_dir
+
+    datasets = {species: xr.open_dataset(file) for species, file in files.items()}
+    years = sorted({int(y) for ds in datasets.values() for y in np.unique(ds['time'].dt.year.values)})
+    species_list = list(datasets)
+    region_names, areas, weights = None, None, {}
+
+    cube = np.lib.format.open_memmap(os.path.join(cube_dir, CUBE_NAME), mode='w+', dtype=np.float64,
+                                     shape=(len(species_list), len(SECTORS), len(regions) + 1, len(years), 12))
+    cube[:] = np.nan
+    for s, (species, ds) in enumerate(datasets.items()):
+        lat, lon = ds['lat'].values, ds['lon'].values
+        grid = (lat.tobytes(), lon.tobytes())
+        if grid not in weights:
+            region_names, weights[grid] = region_weights(lat, lon, shp_file, regions)
+        w = weights[grid]
+        inside = w.any(axis=0)  # 只取落在某个区域内的格点
+        w = w[:, inside]
+        if areas is None:
+            areas = w.sum(axis=1).tolist()
+
+        year_idx = np.searchsorted(years, ds['time'].dt.year.values)
+        month_idx = ds['time'].dt.month.values - 1
+        for k, sector in enumerate(SECTORS):
+            var = f"{species}_{sector}"
+            if var not in ds:
+                continue
+            da = ds[var]
+            if 'lev' in da.dims:
+                da = da.isel(lev=0)
+            da = da.transpose('time', 'lat', 'lon')
+            view = cube[s, k]
+            for start in range(0, da.sizes['time'], time_chunk):
+                stop = min(start + time_chunk, da.sizes['time'])
+                block = da.isel(time=slice(start, stop)).values.reshape(stop - start, -1)[:, inside]
+                view[:, year_idx[start:stop], month_idx[start:stop]] = region_means(block, w).T
+        print(f"{species} 汇总完成")
+    cube.flush()
+    del cube
+
+    index = {'key': key, 'species': species_list, 'sectors': list(SECTORS), 'regions': region_names,
+             'region_areas': areas, 'years': years, 'units': 'kg m-2 s-1'}
+    with open(index_file, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    return cube_dir
+
+
+class EmissionCube:
+    """以内存映射方式读取排放汇总立方体
+
+    用法:
+        cube = EmissionCube()
+        Hcl_yearly = cube.annual('HCl')
+    """
+
+    def __init__(self, cube_dir=None, build=True):
+        cube_dir = cube_dir or cfg.emission_cube_dir
+        if build:
+            build_emission_cube(cube_dir)
+        self.cube_dir = cube_dir
+        with open(os.path.join(cube_dir, INDEX_NAME), 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.species = self.index['species']
+        self.sectors = self.index['sectors']
+        self.regions = self.index['regions']
+        self.years = self.index['years']
+        self._array = None
+
+    def array(self):
+        """(species, sector, region, year, month) 内存映射数组"""
+        if self._array is None:
+            self._array = np.load(os.path.join(self.cube_dir, CUBE_NAME), mmap_mode='r')
+        return self._array
+
+    def region_area(self, region='China'):
+        """区域面积 (m²)，乘以区域平均通量即为区域排放速率 (kg/s)"""
+        return self.index['region_areas'][self.regions.index(region)]
+
+    def _frame(self, species, values, index):
+        """(sector, time) -> DataFrame，列为 {物种}_{部门}、{物种}_all（其它部门之和）与 TOTAL"""
+        df = pd.DataFrame(np.array(values).T, index=index,
+                          columns=[f"{species}_{sector}" for sector in self.sectors])
+        df[f"{species}_all"] = df[[f"{species}_{sector}" for sector in OTHER_SECTORS]].sum(axis=1)
+        df['TOTAL'] = df[[f"{species}_{sector}" for sector in self.sectors]].sum(axis=1, min_count=1)
+        return df
+
+    def _values(self, species, region):
+        return self.array()[self.species.index(species), :, self.regions.index(region)]  # (sector, year, month)
+
+    def monthly(self, species, region='China'):
+        """逐月区域平均通量，索引为每月第一天，去掉没有数据的月份"""
+        values = self._values(species, region).reshape(len(self.sectors), -1)
+        index = pd.to_datetime([f"{y}-{m:02d}-01" for y in self.years for m in range(1, 13)])
+        keep = np.isfinite(values).any(axis=0)
+        return self._frame(species, values[:, keep], index[keep])
+
+    def annual(self, species, region='China'):
+        """年平均区域平均通量，索引为年末日期"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # 没有数据的年份
+            values = np.nanmean(self._values(species, region), axis=2)
+        return self._frame(species, values, pd.to_datetime([f"{y}-12-31" for y in self.years]))
+
+    def climatology(self, species, region='China'):
+        """多年月平均区域平均通量，索引为月份 1-12"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            values = np.nanmean(self._values(species, region), axis=1)
+        return self._frame(species, values, pd.Index(range(1, 13), name='time'))
+
+
+if __name__ == "__main__":
+    build_emission_cube(overwrite=True)
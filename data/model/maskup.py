@@ -7,6 +7,7 @@ import numpy as np
 from shapely.geometry import Point
 import numpy as np
 from shapely.vectorized import contains
+from nc_writer import write_netcdf
 input_dir = "/mnt/d/fin/nochg/cam/"
 output_dir = input_dir+"/cut/"
 file_name = "mergedmean.nc"
@@ -41,7 +42,7 @@ def process_files():
             # Create output filename
             
             # 保存结果
-            ds_selected.to_netcdf(output_file)
+            write_netcdf(ds_selected, output_file, 'fast-write')
             print(f"处理完成: {filename} -> {os.path.basename(output_file)}")
             
             ds.close()
@@ -112,7 +113,7 @@ def maskup():
                 if i == "time" or i == "time_bnds" or i == "lon" or i == "lat":
                     continue
                 ds[i] = ds[i].where(mask_xr['mask'], np.nan)
-            ds.to_netcdf(output_file)
+            write_netcdf(ds, output_file, 'fast-write')
             print(f"mask完成: {filename} -> {os.path.basename(output_file)}")
 
 if __name__ == "__main__":
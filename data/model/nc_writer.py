@@ -0,0 +1,227 @@
+import os
+import sys
+import time
+import zlib
+import itertools
+import tempfile
+import importlib.util
+import numpy as np
+import pandas as pd
+import xarray as xr
+from concurrent.futures import ThreadPoolExecutor
+import config as cfg
+
+'''
+    NetCDF 写出预设
+    项目中各处的 to_netcdf 要么不压缩、连续存储，要么单线程 zlib 5 级压缩，写出慢。
+    这里统一为三种预设（均使用 shuffle 过滤器，显著提高浮点数据的压缩率）：
+        fast-write     zlib 1 级，每个时次一个块（CDO fldmean、逐时次读图最快）
+        archive        zlib 6 级，float64 降为 float32，每个时次一个块（长期保存的结果）
+        analysis-read  zlib 4 级，块沿时间取全长、空间分块约 CHUNK_BYTES（逐格点时间序列、趋势分析）
+    workers > 0 且安装了 h5py 时，各块在线程池中独立做 shuffle + zlib 压缩（zlib 释放 GIL），
+    再由主线程按块直接写入 HDF5（write_direct_chunk），结果与 netCDF4 库写出的文件相同。
+    python nc_writer.py [样本文件] 对样本文件测试各预设的写出耗时、文件大小和各访问方式的读取耗时，
+    并给出每种访问方式的推荐预设。
+'''
+
+PRESETS = {
+    'fast-write': {'complevel': 1, 'shuffle': True, 'float32': False, 'chunking': 'map'},
+    'archive': {'complevel': 6, 'shuffle': True, 'float32': True, 'chunking': 'map'},
+    'analysis-read': {'complevel': 4, 'shuffle': True, 'float32': False, 'chunking': 'series'},
+}
+CHUNK_BYTES = 4 * 1024**2  # analysis-read 的目标块大小
+BENCHMARK_NAME = "nc_writer_benchmark.csv"
+
+
+def _compressible(da):
+    """只对二维及以上的数值变量分块压缩"""
+    return da.ndim >= 2 and (np.issubdtype(da.dtype, np.floating) or np.issubdtype(da.dtype, np.integer))
+
+
+def _out_dtype(da, float32):
+    return np.dtype(np.float32) if float32 and da.dtype == np.float64 else da.dtype
+
+
+def chunk_shape(da, chunking, itemsize=None):
+    """按预设的分块方式确定块形状"""
+    itemsize = itemsize or da.dtype.itemsize
+    sizes = dict(zip(da.dims, da.shape))
+    if 'time' not in sizes:
+        return tuple(da.shape)
+    if chunking == 'map':
+        return tuple(1 if dim == 'time' else n for dim, n in sizes.items())
+    # series：时间取全长，lat/lon 取方形空间块，其余维度（如 lev）取全长
+    other = np.prod([n for dim, n in sizes.items() if dim not in ('lat', 'lon')])
+    tile = max(1, int(np.sqrt(CHUNK_BYTES / (other * itemsize))))
+    return tuple(min(n, tile) if dim in ('lat', 'lon') else n for dim, n in sizes.items())
+
+
+def encoding(ds, preset='fast-write', float32=None):
+    """xarray to_netcdf 的 encoding 字典"""
+    options = PRESETS[preset]
+    float32 = options['float32'] if float32 is None else float32
+    result = {}
+    for var in ds.data_vars:
+        da = ds[var]
+        if not _compressible(da):
+            continue
+        dtype = _out_dtype(da, float32)
+        result[var] = {'zlib': True, 'complevel': options['complevel'], 'shuffle': options['shuffle'],
+                       'chunksizes': chunk_shape(da, options['chunking'], dtype.itemsize)}
+        if dtype != da.dtype:
+            result[var]['dtype'] = dtype
+    return result
+
+
+def _encode_chunk(block, shape, dtype, fill, shuffle, complevel):
+    """一个块：补齐边缘块、转换类型、shuffle、zlib 压缩"""
+    block = np.asarray(block, dtype=dtype)
+    if block.shape != shape:
+        padded = np.full(shape, fill, dtype=dtype)
+        padded[tuple(slice(0, n) for n in block.shape)] = block
+        block = padded
+    raw = np.ascontiguousarray(block).view(np.uint8)
+    if shuffle and dtype.itemsize > 1:
+        raw = raw.reshape(-1, dtype.itemsize).T
+    return zlib.compress(raw.tobytes(), complevel)
+
+
+def _coordinates(ds, da):
+    """变量的 coordinates 属性：与 xarray 写出时相同，列出维度包含于该变量的非维度坐标"""
+    if 'coordinates' in da.encoding:
+        return da.encoding['coordinates']
+    names = [name for name, coord in ds.coords.items()
+             if name not in ds.dims and set(coord.dims) <= set(da.dims)]
+    return ' '.join(names)
+
+
+def _write_parallel(ds, output_file, options, float32, workers):
+    """先由 netCDF4 建立文件结构，再在线程池中压缩各块并直接写入"""
+    import netCDF4
+    import h5py
+
+    large = [var for var in ds.data_vars if _compressible(ds[var])]
+    ds.drop_vars(large).to_netcdf(output_file)
+    specs = {}
+    with netCDF4.Dataset(output_file, 'a') as nc:
+        for var in large:
+            da = ds[var]
+            dtype = _out_dtype(da, float32)
+            shape = chunk_shape(da, options['chunking'], dtype.itemsize)
+            for dim, n in zip(da.dims, da.shape):
+                if dim not in nc.dimensions:
+                    nc.createDimension(dim, n)
+            fill = np.nan if np.issubdtype(dtype, np.floating) else netCDF4.default_fillvals[dtype.str[1:]]
+            out = nc.createVariable(var, dtype, da.dims, zlib=True, complevel=options['complevel'],
+                                    shuffle=options['shuffle'], chunksizes=shape, fill_value=fill)
+            attrs = {k: v for k, v in da.attrs.items() if k != '_FillValue'}
+            coordinates = _coordinates(ds, da)
+            if coordinates:
+                attrs['coordinates'] = coordinates
+            out.setncatts(attrs)
+            specs[var] = (dtype, shape, fill)
+
+    with h5py.File(output_file, 'r+') as h5, ThreadPoolExecutor(max_workers=workers) as executor:
+        for var in large:
+            values = ds[var].values
+            dtype, shape, fill = specs[var]
+            offsets = list(itertools.product(*[range(0, n, c) for n, c in zip(values.shape, shape)]))
+            blocks = (values[tuple(slice(o, o + c) for o, c in zip(offset, shape))] for offset in offsets)
+            chunks = executor.map(lambda block: _encode_chunk(block, shape, dtype, fill, options['shuffle'],
+                                                              options['complevel']), blocks)
+            dset = h5[var]
+            # 沿无限维（如 CAM 文件的 time）建立的变量初始长度为 0，先扩展到实际大小再写块
+            if dset.shape != values.shape:
+                dset.resize(values.shape)
+            for offset, data in zip(offsets, chunks):
+                dset.id.write_direct_chunk(offset, data)
+
+
+def write_netcdf(ds, output_file, preset='fast-write', float32=None, workers=None):
+    """按预设写出 NetCDF
+
+    Parameters:
+        ds (xarray.Dataset): 待写出的数据集
+        output_file (str): 输出文件
+        preset (str): PRESETS 中的预设名
+        float32 (bool, optional): 是否将 float64 降为 float32，默认取预设值
+        workers (int, optional): 压缩线程数，默认 CPU 数；0 表示由 netCDF4 库单线程压缩
+    """
+    options = PRESETS[preset]
+    float32 = options['float32'] if float32 is None else float32
+    workers = os.cpu_count() if workers is None else workers
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    if workers and (importlib.util.find_spec('h5py') is None or importlib.util.find_spec('netCDF4') is None):
+        workers = 0
+    # 先写临时文件，成功后再改名，失败时不留下不完整的输出文件
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    try:
+        if workers:
+            _write_parallel(ds, tmp_file, options, float32, workers)
+        else:
+            ds.to_netcdf(tmp_file, encoding=encoding(ds, preset, float32))
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    return output_file
+
+
+# 访问方式：每种方式读取 ds 的一部分
+PATTERNS = {
+    'map': lambda da: da.isel(time=da.sizes['time'] // 2),           # 一个时次的整场
+    'series': lambda da: da.isel(lat=da.sizes['lat'] // 2, lon=da.sizes['lon'] // 2),  # 一个格点的时间序列
+    'full': lambda da: da,                                            # 全部数据（如区域平均）
+}
+
+
+def benchmark(ds, output_dir=None, presets=PRESETS, repeat=3, workers=None):
+    """测试各预设的写出耗时、文件大小和各访问方式的读取耗时
+
+    Returns:
+        pandas.DataFrame: 索引为预设，列为 write_s、size_mb 和 read_{访问方式}_s
+    """
+    variables = [var for var in ds.data_vars if _compressible(ds[var]) and
+                 {'time', 'lat', 'lon'} <= set(ds[var].dims)]
+    ds = ds[variables].load()
+    rows = {}
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        for preset in presets:
+            output_file = os.path.join(tmp_dir, f"{preset}.nc")
+            start = time.perf_counter()
+            write_netcdf(ds, output_file, preset, workers=workers)
+            row = {'write_s': time.perf_counter() - start, 'size_mb': os.path.getsize(output_file) / 1024**2}
+            for name, select in PATTERNS.items():
+                elapsed = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    with xr.open_dataset(output_file, cache=False) as saved:
+                        for var in variables:
+                            select(saved[var]).values
+                    elapsed.append(time.perf_counter() - start)
+                row[f'read_{name}_s'] = min(elapsed)
+            rows[preset] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def recommend(table):
+    """每种访问方式读取最快的预设，以及写出最快的预设"""
+    choice = {name: table[f'read_{name}_s'].idxmin() for name in PATTERNS}
+    choice['write'] = table['write_s'].idxmin()
+    choice['smallest'] = table['size_mb'].idxmin()
+    return choice
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sample = sys.argv[1]
+    else:
+        sample = sorted(os.path.join(cfg.fin_dir, f) for f in os.listdir(cfg.fin_dir)
+                        if f.startswith("merge") and f.endswith(".nc"))[0]
+    print(f"样本文件: {sample}")
+    with xr.open_dataset(sample) as ds:
+        table = benchmark(ds)
+    print(table)
+    print(recommend(table))
+    table.to_csv(os.path.join(cfg.fldmean_fin, BENCHMARK_NAME))
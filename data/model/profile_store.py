@@ -0,0 +1,178 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+import xarray as xr
+import config as cfg
+from nc_writer import write_netcdf
+
+'''
+    垂直廓线引擎
+    一次性读取 fldmean 目录下全部 {species}_levels.csv，按层数分组
+    (lev: 70 层 / ilev: 71 层) 堆叠为 (species, time, level) 数组，
+    附上样例文件中的真实气压坐标，保存为列式存储 profiles.nc。
+    之后任意年份/季节窗口平均，以及 S1 与 SSP370 的绝对差、相对差，
+    对所有物种都是一次向量化计算，不再逐物种解析 CSV、试探层数。
+'''
+
+STORE_NAME = "profiles.nc"
+LEVEL_DIMS = ('lev', 'ilev')
+
+# 定义季节
+seasons = {
+    'DJF': [12, 1, 2],
+    'MAM': [3, 4, 5],
+    'JJA': [6, 7, 8],
+    'SON': [9, 10, 11]
+}
+
+
+def build_profile_store(fldmean_dir, example_file=None, store_file=None, overwrite=False):
+    """把 fldmean 目录下所有多层 CSV 合并为一个廓线存储文件
+
+    Parameters:
+        fldmean_dir (str): 含 *_levels.csv 的目录
+        example_file (str, optional): 提供 lev/ilev 气压坐标的 nc 文件
+        store_file (str, optional): 输出文件，默认 fldmean_dir/profiles.nc
+        overwrite (bool): 是否强制重建
+
+    Returns:
+        str: 存储文件路径
+    """
+    if example_file is None:
+        example_file = cfg.fin_dir + "merge2025.nc"
+    if store_file is None:
+        store_file = os.path.join(fldmean_dir, STORE_NAME)
+
+    files = sorted(glob.glob(os.path.join(fldmean_dir, "*_levels.csv")))
+    if not files:
+        raise FileNotFoundError(f"{fldmean_dir} 中没有 *_levels.csv 文件")
+    # 存储文件比所有 CSV 都新时直接复用
+    if (not overwrite and os.path.exists(store_file) and
+            os.path.getmtime(store_file) >= max(os.path.getmtime(f) for f in files)):
+        print(f"文件已存在: {store_file}")
+        return store_file
+
+    with xr.open_dataset(example_file) as ds:
+        level_coords = {dim: ds[dim].values for dim in LEVEL_DIMS}
+
+    groups = {dim: ([], []) for dim in LEVEL_DIMS}
+    time = None
+    for file in files:
+        species = os.path.basename(file)[:-len("_levels.csv")]
+        df = pd.read_csv(file, index_col='time')
+        if time is None:
+            time = df.index
+        elif not df.index.equals(time):
+            df = df.reindex(time)
+        # 按层数归入 lev 或 ilev 组
+        for dim in LEVEL_DIMS:
+            if df.shape[1] == len(level_coords[dim]):
+                groups[dim][0].append(species)
+                groups[dim][1].append(df.values)
+                break
+        else:
+            print(f"跳过 {species}: 层数 {df.shape[1]} 与 lev/ilev 均不匹配")
+
+    # 时间为 YYYY-MM 字符串
+    time = np.asarray(time, dtype=str)
+    coords = {
+        'time': time,
+        'year': ('time', np.array([int(t[:4]) for t in time])),
+        'month': ('time', np.array([int(t[5:7]) for t in time])),
+    }
+    data_vars = {}
+    for dim, (names, values) in groups.items():
+        if not names:
+            continue
+        coords[dim] = level_coords[dim]
+        coords[f"species_{dim}"] = np.asarray(names, dtype=str)
+        data_vars[f"{dim}_profiles"] = ((f"species_{dim}", 'time', dim), np.stack(values))
+
+    profiles = xr.Dataset(data_vars, coords=coords)
+    write_netcdf(profiles, store_file, 'analysis-read')
+    print(f"廓线存储已保存: {store_file}")
+    return store_file
+
+
+def load_profiles(store_file):
+    """读取廓线存储到内存"""
+    with xr.open_dataset(store_file) as ds:
+        return ds.load()
+
+
+def window_mean(profiles, years=None, months=None):
+    """计算所有物种在指定年份/季节窗口内的平均廓线
+
+    Parameters:
+        profiles (xarray.Dataset): load_profiles 的结果
+        years (int or list, optional): 年份，默认全部
+        months (str or list, optional): 季节名（如 'DJF'）或月份列表，默认全部
+
+    Returns:
+        xarray.Dataset: 去掉 time 维的平均廓线
+    """
+    selected = np.ones(profiles.sizes['time'], dtype=bool)
+    if years is not None:
+        selected &= np.isin(profiles['year'].values, np.atleast_1d(years))
+    if months is not None:
+        if isinstance(months, str):
+            months = seasons[months]
+        selected &= np.isin(profiles['month'].values, np.atleast_1d(months))
+    if not selected.any():
+        raise ValueError(f"所选窗口内没有数据: years={years}, months={months}")
+    return profiles.isel(time=selected).mean('time')
+
+
+def profile_difference(fin_profiles, nochg_profiles, years=None, months=None):
+    """一次性计算所有物种 S1 与 SSP370 的窗口平均廓线及其差异
+
+    Returns:
+        xarray.Dataset: 每个层组包含 {dim}_s1, {dim}_ssp370, {dim}_diff, {dim}_rel
+    """
+    fin_mean = window_mean(fin_profiles, years, months)
+    nochg_mean = window_mean(nochg_profiles, years, months)
+    # 只保留两个情景都有的物种
+    fin_mean, nochg_mean = xr.align(fin_mean, nochg_mean, join='inner')
+
+    result = xr.Dataset()
+    for dim in LEVEL_DIMS:
+        name = f"{dim}_profiles"
+        if name not in fin_mean or name not in nochg_mean:
+            continue
+        s1 = fin_mean[name]
+        ssp370 = nochg_mean[name]
+        diff = s1 - ssp370
+        result[f"{dim}_s1"] = s1
+        result[f"{dim}_ssp370"] = ssp370
+        result[f"{dim}_diff"] = diff
+        result[f"{dim}_rel"] = diff / ssp370.where(ssp370 != 0)
+    return result
+
+
+def profile_species(result):
+    """列出结果中的全部物种"""
+    species = []
+    for dim in LEVEL_DIMS:
+        if f"species_{dim}" in result.coords:
+            species.extend(result[f"species_{dim}"].values.tolist())
+    return species
+
+
+def species_profile(result, species, field='profiles'):
+    """取出单个物种的廓线，索引为气压 (hPa)
+
+    Parameters:
+        result (xarray.Dataset): window_mean 或 profile_difference 的结果
+        species (str): 物种名
+        field (str): 'profiles'（window_mean）或 's1'/'ssp370'/'diff'/'rel'
+
+    Returns:
+        pandas.Series
+    """
+    for dim in LEVEL_DIMS:
+        name = f"{dim}_{field}"
+        if name in result and species in result[f"species_{dim}"].values:
+            da = result[name].sel({f"species_{dim}": species})
+            return pd.Series(da.values, index=da[dim].values, name=species)
+    raise KeyError(f"结果中没有 {species} 的 {field} 廓线")
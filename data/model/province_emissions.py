@@ -0,0 +1,134 @@
+import os
+import multiprocessing as mp
+import numpy as np
+from shapely.vectorized import contains
+from shared_arrays import SharedArrays, attach, get
+from cell_area import cell_areas, region_areas
+
+'''
+    省份排放时间序列
+    原做法对每个省份、每个时次分别 isel、逐变量求和、where 掩码、求平均，HCl 与 pCl 各一遍，
+    共数万次小的 xarray 操作，且每个省份都要为全部格点构造 Point 判断是否在省内。
+    现做法：
+    1. 各部门通量求和为一个 (time, lat, lon) 数组，最后一年不计 _wstop 用时间掩码广播实现；
+    2. 全部省份的格点掩码用 shapely.vectorized.contains 一次生成，组成 (省份, 格点) 矩阵；
+    3. 全部省份 × 全部月份的排放量由一次矩阵乘法得到，权重为格点面积（cell_area.py），
+       省份面积为省内格点面积之和，与通量换算一致。
+    all_province_emissions 把通量数组放入共享内存，按省份分组在进程池中生成掩码并计算，
+    子进程挂载共享数组，不再把整个数据集 pickle 进每个任务。
+'''
+
+SECONDS_PER_MONTH = 30.44 * 24 * 3600  # 平均每月秒数，没有时间坐标时使用
+
+
+def sector_flux(dataset, wstop_last=12, skip_nan_wstop=False):
+    """各部门排放通量之和 (kg/m²/s)，形状 (time, lat, lon)
+
+    带 lev 维的变量取第一层；_wstop 在最后 wstop_last 个时次不计入，
+    skip_nan_wstop 为 True 时含 NaN 的时次也不计入 _wstop。
+    """
+    total_times = dataset.sizes['time']
+    keep_wstop = np.arange(total_times) < total_times - wstop_last
+    total = 0
+    for var in dataset.data_vars:
+        da = dataset[var]
+        if 'lev' in da.dims:
+            da = da.isel(lev=0)
+        values = da.transpose('time', 'lat', 'lon').values
+        if var.endswith('_wstop'):
+            keep = keep_wstop
+            if skip_nan_wstop:
+                keep = keep & ~np.isnan(values).reshape(total_times, -1).any(axis=1)
+            values = np.where(keep[:, None, None], values, 0)
+        total = total + values
+    return total
+
+
+def province_masks(lat, lon, province_shapes, name_column='name'):
+    """全部省份的格点掩码
+
+    Returns:
+        tuple: (省份名列表, bool 数组 (省份, lat, lon))
+    """
+    lon_mesh, lat_mesh = np.meshgrid(lon, lat)
+    names = list(province_shapes[name_column].unique())
+    masks = np.stack([contains(province_shapes[province_shapes[name_column] == name].geometry.union_all(),
+                               lon_mesh, lat_mesh) for name in names])
+    return names, masks
+
+
+def province_flux(flux, masks, lat, lon, reduce='mean'):
+    """全部省份 × 全部时次的排放速率 (kg/s)，一次矩阵乘法
+
+    权重为格点面积 × 省份掩码（cell_area.cell_areas）：
+        sum   Σ 通量 × 格点面积，NaN 格点记为 0
+        mean  省内有效格点的面积加权平均通量 × 省份面积（NaN 格点按省内平均计）
+
+    Parameters:
+        flux (ndarray): (time, lat, lon) 排放通量 (kg/m²/s)
+        masks (ndarray): (省份, lat, lon) bool
+
+    Returns:
+        ndarray: (省份, time)，mean 时省内全部格点为 NaN 则为 NaN
+    """
+    cells = masks.reshape(len(masks), -1)
+    inside = cells.any(axis=0)  # 只取落在某个省内的格点
+    values = flux.reshape(flux.shape[0], -1)[:, inside]
+    finite = np.isfinite(values)
+    weights = cells[:, inside] * cell_areas(lat, lon).ravel()[inside]
+    total = weights @ np.where(finite, values, 0).T
+    if reduce == 'sum':
+        return total
+    covered = weights @ finite.T.astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / covered * weights.sum(axis=1)[:, None]
+
+
+def province_emissions(flux, masks, lat, lon, seconds=SECONDS_PER_MONTH, reduce='mean'):
+    """全部省份的月排放量 (kg/month)，NaN 记为 0
+
+    Parameters:
+        flux (ndarray): (time, lat, lon) 排放通量 (kg/m²/s)
+        masks (ndarray): (省份, lat, lon) bool
+        seconds (float or ndarray): 每个时次的秒数，标量或 (time,)，见 cell_area.seconds_in_month
+        reduce (str): 见 province_flux
+
+    Returns:
+        ndarray: (省份, time)
+    """
+    emission = province_flux(flux, masks, lat, lon, reduce) * np.asarray(seconds, dtype=np.float64)
+    return np.nan_to_num(emission, nan=0.0)
+
+
+def _province_chunk(lat, lon, geometries, keys, seconds, reduce):
+    """子进程：一组省份的掩码、面积及各共享通量数组的月排放量"""
+    lon_mesh, lat_mesh = np.meshgrid(lon, lat)
+    masks = np.stack([contains(geometry, lon_mesh, lat_mesh) for geometry in geometries])
+    result = {key: province_emissions(get(key), masks, lat, lon, seconds, reduce) for key in keys}
+    return result, region_areas(lat, lon, masks)
+
+
+def all_province_emissions(fluxes, lat, lon, province_shapes, seconds=SECONDS_PER_MONTH, processes=None,
+                           backend='shm', reduce='mean', name_column='name'):
+    """全部省份的月排放量，进程池中的子进程通过共享内存读取通量数组
+
+    Parameters:
+        fluxes (dict): {名字: (time, lat, lon) 通量数组}，如 {'hcl': ..., 'pcl': ...}
+        province_shapes (GeoDataFrame): 省份地理信息数据
+        seconds (float or ndarray): 每个时次的秒数
+        processes (int, optional): 进程数，默认 CPU 数
+        backend (str): 'shm' 或 'npy'，见 shared_arrays.SharedArrays
+
+    Returns:
+        tuple: (省份名列表, {名字: (省份, time) 数组}, 省份面积 (m²，由格点面积求和))
+    """
+    names = list(province_shapes[name_column].unique())
+    geometries = [province_shapes[province_shapes[name_column] == name].geometry.union_all() for name in names]
+    processes = processes or os.cpu_count()
+    chunks = [chunk for chunk in np.array_split(np.arange(len(names)), processes) if len(chunk)]
+    with SharedArrays(fluxes, backend) as shared:
+        with mp.Pool(processes, initializer=attach, initargs=(shared.specs,)) as pool:
+            results = pool.starmap(_province_chunk, [
+                (lat, lon, [geometries[i] for i in chunk], list(fluxes), seconds, reduce) for chunk in chunks])
+    emissions = {key: np.concatenate([result[key] for result, _ in results]) for key in fluxes}
+    return names, emissions, np.concatenate([areas for _, areas in results])
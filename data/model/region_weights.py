@@ -0,0 +1,132 @@
+import os
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import box
+from shapely.vectorized import contains
+import config as cfg
+from render_cache import fingerprint
+from cell_area import cell_edges, cell_areas
+
+'''
+    区域权重矩阵
+    对给定经纬度网格生成 (区域 × 格点) 的面积权重矩阵，每行归一化为 1。
+    区域包括 Global、China、各省份以及 config 中的各个 box。
+    权重 = 格点面积（cell_area.py）× 格点落在区域内的比例（子网格采样得到），
+    按 网格 + 区域定义 缓存为 npz，之后直接读取。
+'''
+
+
+def coverage_fraction(geometry, lat_edges, lon_edges, supersample=4):
+    """每个格点落在 geometry 内的面积比例（supersample × supersample 子点采样）"""
+    nlat, nlon = len(lat_edges) - 1, len(lon_edges) - 1
+    frac = np.zeros((nlat, nlon))
+    minx, miny, maxx, maxy = geometry.bounds
+    # 只在区域外接矩形覆盖的格点上采样
+    lat_lo = np.minimum(lat_edges[:-1], lat_edges[1:])
+    lat_hi = np.maximum(lat_edges[:-1], lat_edges[1:])
+    lon_lo = np.minimum(lon_edges[:-1], lon_edges[1:])
+    lon_hi = np.maximum(lon_edges[:-1], lon_edges[1:])
+    ii = np.where((lat_hi > miny) & (lat_lo < maxy))[0]
+    jj = np.where((lon_hi > minx) & (lon_lo < maxx))[0]
+    if len(ii) == 0 or len(jj) == 0:
+        return frac
+
+    offsets = (np.arange(supersample) + 0.5) / supersample
+    sub_lat = lat_edges[ii][:, None] + offsets[None, :] * np.diff(lat_edges)[ii][:, None]
+    sub_lon = lon_edges[jj][:, None] + offsets[None, :] * np.diff(lon_edges)[jj][:, None]
+    lon_grid, lat_grid = np.meshgrid(sub_lon.ravel(), sub_lat.ravel())
+    inside = contains(geometry, lon_grid, lat_grid)
+    inside = inside.reshape(len(ii), supersample, len(jj), supersample).mean(axis=(1, 3))
+    frac[np.ix_(ii, jj)] = inside
+    return frac
+
+
+def region_geometries(shp_file=None, box_list=None):
+    """返回 [(区域名, 几何体)]，Global 的几何体为 None"""
+    if shp_file is None:
+        shp_file = cfg.province_shp
+    if box_list is None:
+        box_list = cfg.Enbox_list
+    provinces = gpd.read_file(shp_file)
+    regions = [('Global', None), ('China', provinces.union_all())]
+    for name in provinces['name'].unique():
+        regions.append((name, provinces[provinces['name'] == name].geometry.union_all()))
+    for (box_name, lon1, lon2, lat1, lat2) in box_list:
+        regions.append((box_name, box(lon1, lat1, lon2, lat2)))
+    return regions
+
+
+def region_weights(lat, lon, shp_file=None, box_list=None, supersample=4, cache_dir=None):
+    """生成（或从缓存读取）区域面积权重矩阵
+
+    Parameters:
+        lat, lon (array): 网格中心坐标
+        shp_file (str, optional): 省界 shapefile
+        box_list (list, optional): box 定义 (name, lon1, lon2, lat1, lat2)
+        supersample (int): 每个格点每个方向的采样点数
+        cache_dir (str, optional): 缓存目录
+
+    Returns:
+        tuple: (区域名列表, 权重矩阵 (nregion, nlat*nlon))，每行和为 1
+    """
+    if shp_file is None:
+        shp_file = cfg.province_shp
+    if box_list is None:
+        box_list = cfg.Enbox_list
+    if cache_dir is None:
+        cache_dir = cfg.cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    shp_stat = os.stat(shp_file)
+    key = fingerprint(lat, lon, list(box_list), supersample,
+                      os.path.basename(shp_file), shp_stat.st_size, shp_stat.st_mtime)
+    cache_file = os.path.join(cache_dir, f"region_weights_{key[:16]}.npz")
+    if os.path.exists(cache_file):
+        cached = np.load(cache_file)
+        return cached['names'].tolist(), cached['weights']
+
+    print("计算区域权重矩阵...")
+    lat_edges = np.clip(cell_edges(lat), -90, 90)
+    lon_edges = cell_edges(lon)
+    areas = cell_areas(lat, lon)
+
+    names = []
+    rows = []
+    for name, geometry in region_geometries(shp_file, box_list):
+        if geometry is None:
+            frac = np.ones_like(areas)
+        else:
+            frac = coverage_fraction(geometry, lat_edges, lon_edges, supersample)
+        names.append(name)
+        rows.append((areas * frac).ravel())
+    weights = np.vstack(rows)
+    # 行归一化；与网格无交集的区域整行为 NaN
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weights = weights / weights.sum(axis=1, keepdims=True)
+
+    np.savez(cache_file, names=np.asarray(names, dtype=str), weights=weights)
+    return names, weights
+
+
+def apply_weights(values, weights):
+    """对最后两维 (lat, lon) 做区域加权平均
+
+    Parameters:
+        values (ndarray): (..., nlat, nlon)
+        weights (ndarray): (nregion, nlat*nlon)
+
+    Returns:
+        ndarray: (..., nregion)
+    """
+    lead = values.shape[:-2]
+    flat = values.reshape(-1, weights.shape[1])
+    valid = np.isfinite(flat)
+    if valid.all():
+        result = flat @ weights.T
+    else:
+        # 缺测格点不参与平均，权重按有效格点重新归一
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = (np.where(valid, flat, 0) @ weights.T) / (valid @ weights.T)
+    return result.reshape(lead + (weights.shape[0],))
@@ -0,0 +1,125 @@
+import os
+import numpy as np
+import xarray as xr
+from scipy import stats
+import config as cfg
+from region_weights import region_weights, apply_weights
+from profile_store import seasons
+from nc_writer import write_netcdf
+
+'''
+    区域垂直廓线
+    直接读取年度全数据集 (merge{year}.nc)，对每个 4 维变量 (time, lev, lat, lon)
+    用缓存的区域权重矩阵做一次矩阵乘法，同时得到 Global、China、各省份和各 box
+    的面积加权平均廓线，不需要先写出 cut/box 副本再用 cdo 求平均。
+    再按层做 S1 与 SSP370 的 Welch t 检验。
+'''
+
+FILE_NAME = "regional_profiles.nc"
+
+
+def reduce_file(filename, names, weights, variables=None):
+    """对单个年度文件的全部 4 维变量计算区域平均廓线
+
+    Returns:
+        xarray.Dataset: 每个变量维度为 (time, lev/ilev, region)
+    """
+    with xr.open_dataset(filename) as ds:
+        out = {}
+        for var in (variables or list(ds.data_vars)):
+            da = ds[var]
+            if da.ndim != 4 or da.dims[0] != 'time' or da.dims[2:] != ('lat', 'lon'):
+                continue
+            level_dim = da.dims[1]
+            out[var] = xr.DataArray(
+                apply_weights(da.values, weights),
+                dims=('time', level_dim, 'region'),
+                coords={'time': da['time'].values, level_dim: da[level_dim].values, 'region': names},
+            )
+        return xr.Dataset(out)
+
+
+def build_regional_profiles(input_dir, output_dir=None, variables=None, overwrite=False):
+    """遍历 input_dir 下的 merge{year}.nc，生成区域平均廓线文件
+
+    Parameters:
+        input_dir (str): 年度全数据集所在目录
+        output_dir (str, optional): 输出目录，默认 input_dir/fldmean/
+        variables (list, optional): 只处理这些变量，默认全部 4 维变量
+        overwrite (bool): 是否覆盖已有结果
+
+    Returns:
+        str: 输出文件路径
+    """
+    if output_dir is None:
+        output_dir = os.path.join(input_dir, "fldmean")
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, FILE_NAME)
+    if os.path.exists(output_file) and not overwrite:
+        print(f"文件已存在: {output_file}")
+        return output_file
+
+    files = sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir)
+                   if f.startswith("merge2") and f.endswith(".nc"))
+    if not files:
+        raise FileNotFoundError(f"{input_dir} 中没有 merge*.nc 文件")
+
+    with xr.open_dataset(files[0]) as ds:
+        names, weights = region_weights(ds['lat'].values, ds['lon'].values)
+
+    yearly = []
+    for filename in files:
+        print(f"处理 {os.path.basename(filename)}")
+        yearly.append(reduce_file(filename, names, weights, variables))
+    profiles = xr.concat(yearly, dim='time')
+    write_netcdf(profiles, output_file, 'analysis-read')
+    print(f"区域廓线已保存: {output_file}")
+    return output_file
+
+
+def select_window(profiles, years=None, months=None):
+    """按年份/季节（或月份列表）筛选时间"""
+    selected = np.ones(profiles.sizes['time'], dtype=bool)
+    if years is not None:
+        selected &= np.isin(profiles['time'].dt.year.values, np.atleast_1d(years))
+    if months is not None:
+        if isinstance(months, str):
+            months = seasons[months]
+        selected &= np.isin(profiles['time'].dt.month.values, np.atleast_1d(months))
+    return profiles.isel(time=selected)
+
+
+def profile_significance(fin_profiles, nochg_profiles, years=None, months=None, variables=None):
+    """逐层、逐区域比较 S1 与 SSP370 的平均廓线（Welch t 检验）
+
+    Returns:
+        xarray.Dataset: 每个变量给出 {var}_s1, {var}_ssp370, {var}_diff, {var}_rel, {var}_pvalue，
+        维度为 (lev/ilev, region)
+    """
+    fin = select_window(fin_profiles, years, months)
+    nochg = select_window(nochg_profiles, years, months)
+    result = xr.Dataset()
+    for var in (variables or list(fin.data_vars)):
+        if var not in nochg:
+            continue
+        a = fin[var]
+        b = nochg[var]
+        s1 = a.mean('time')
+        ssp370 = b.mean('time')
+        # 沿 time 轴一次完成所有层和区域的检验
+        _, p_value = stats.ttest_ind(a.values, b.values, axis=0, equal_var=False)
+        result[f"{var}_s1"] = s1
+        result[f"{var}_ssp370"] = ssp370
+        result[f"{var}_diff"] = s1 - ssp370
+        result[f"{var}_rel"] = (s1 - ssp370) / ssp370.where(ssp370 != 0)
+        result[f"{var}_pvalue"] = (s1.dims, p_value)
+    return result
+
+
+if __name__ == "__main__":
+    fin_file = build_regional_profiles(cfg.fin_dir)
+    nochg_file = build_regional_profiles(cfg.nochg_dir)
+    with xr.open_dataset(fin_file) as fin, xr.open_dataset(nochg_file) as nochg:
+        result = profile_significance(fin, nochg, years=2038)
+        write_netcdf(result, os.path.join(cfg.fldmean_fin, "regional_profile_significance.nc"), 'analysis-read')
+    print("完成")
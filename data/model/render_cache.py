@@ -0,0 +1,129 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import matplotlib as mpl
+
+'''
+    绘图缓存
+    以 输入统计量 + 图形参数(spec) + 绘图风格(rcParams) 的哈希作为键，
+    键记录在输出目录下的 .render_cache.json 中。
+    只有输入或参数发生变化的图才会重新绘制，未变化的图直接复用，
+    不再需要删除整个输出目录来强制重画。
+'''
+
+MANIFEST_NAME = ".render_cache.json"
+
+# 与图形内容无关的 rcParams（后端、交互设置等），不参与哈希
+_STYLE_IGNORE = ('backend', 'interactive', 'webagg', 'savefig.directory',
+                 'figure.raise_window', 'tk.', 'macosx.', 'toolbar')
+
+
+def _update(h, obj):
+    """将对象内容写入哈希对象 h"""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(b'pd')
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr(list(obj.columns)).encode())
+        _update(h, pd.util.hash_pandas_object(obj, index=True).values)
+    elif hasattr(obj, 'dims') and hasattr(obj, 'values'):  # xarray.DataArray
+        h.update(b'xr')
+        h.update(repr(tuple(obj.dims)).encode())
+        _update(h, obj.values)
+    elif isinstance(obj, np.ndarray):
+        h.update(str(obj.dtype).encode())
+        h.update(repr(obj.shape).encode())
+        if obj.dtype.kind == 'O':
+            h.update(repr(obj.tolist()).encode())
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b'{')
+        for k in sorted(obj, key=str):
+            h.update(repr(k).encode())
+            _update(h, obj[k])
+        h.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        h.update(b'[')
+        for item in obj:
+            _update(h, item)
+        h.update(b']')
+    else:
+        h.update(repr(obj).encode())
+
+
+def fingerprint(*objs):
+    """计算任意输入（数组、DataFrame、DataArray、字典等）的内容哈希
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    h = hashlib.sha1()
+    for obj in objs:
+        _update(h, obj)
+    return h.hexdigest()
+
+
+def style_fingerprint():
+    """当前 matplotlib 风格（rcParams）的哈希"""
+    items = sorted((k, repr(v)) for k, v in mpl.rcParams.items()
+                   if not k.startswith(_STYLE_IGNORE))
+    return fingerprint(items)
+
+
+class RenderCache:
+    """输出目录级别的绘图缓存
+
+    用法:
+        cache = RenderCache(output_dir)
+        key = cache.key((fin_data[var], nochg_data[var]), {'figure': 'spacediff', 'var': var})
+        if cache.is_fresh(output_filename, key):
+            continue
+        ...绘图...
+        plt.savefig(output_filename)
+        cache.record(output_filename, key)
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.manifest_file = os.path.join(output_dir, MANIFEST_NAME)
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def key(self, stats, spec, style=None):
+        """由输入统计量、图形参数和绘图风格生成缓存键
+
+        Parameters:
+            stats: 图形所依赖的输入数据/统计量
+            spec (dict): 图形参数（变量名、层次、季节、标题等）
+            style (str, optional): 风格哈希，默认取当前 rcParams
+        """
+        if style is None:
+            style = style_fingerprint()
+        return fingerprint(stats, spec, style)
+
+    def is_fresh(self, output_filename, key):
+        """输出文件存在且缓存键未变化时返回 True"""
+        entry = self.manifest.get(os.path.basename(output_filename))
+        if entry is None or entry.get('key') != key:
+            return False
+        try:
+            return os.path.getsize(output_filename) == entry.get('size')
+        except OSError:
+            return False
+
+    def record(self, output_filename, key):
+        """绘图保存后记录缓存键"""
+        self.manifest[os.path.basename(output_filename)] = {
+            'key': key,
+            'size': os.path.getsize(output_filename),
+        }
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=1, ensure_ascii=False)
+        os.replace(tmp_file, self.manifest_file)
@@ -1,6 +1,7 @@
 import xarray as xr
 import os
 import data.model.data.config as cfg
+from nc_writer import write_netcdf
 
 def select_box(file_name, input_dir, output_dir, list):
     
@@ -17,7 +18,7 @@ def select_box(file_name, input_dir, output_dir, list):
             elif os.path.exists(os.path.join(output_dir2, file_name)):
                 print(f"文件已存在: {os.path.join(output_dir2, file_name)}")
                 continue
-            ds.sel(lon=slice(lon1, lon2), lat=slice(lat1, lat2)).to_netcdf(os.path.join(output_dir2, file_name))
+            write_netcdf(ds.sel(lon=slice(lon1, lon2), lat=slice(lat1, lat2)), os.path.join(output_dir2, file_name), 'fast-write')
         ds.close()
         print(f"执行 sellonlatbox 操作完成: {os.path.join(output_dir, file_name)}")
 
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+from multiprocessing import shared_memory
+
+'''
+    进程池共享数组
+    mp.Pool().map(partial(f, data=大数组)) 会把整个数据集 pickle 进每个任务。
+    这里由父进程把数组一次放入共享内存（shm）或内存映射的 .npy 文件（npy），
+    进程池初始化时只传递名字、形状和类型，子进程按名字挂载，得到零拷贝的只读视图。
+    用法:
+        with SharedArrays({'hcl': hcl_flux, 'pcl': pcl_flux}) as shared:
+            with mp.Pool(initializer=attach, initargs=(shared.specs,)) as pool:
+                pool.map(func, tasks)
+        # func 中
+        hcl_flux = get('hcl')
+'''
+
+_attached = {'specs': {}, 'arrays': {}}
+
+
+class SharedArrays:
+    """父进程持有的共享数组
+
+    Parameters:
+        arrays (dict): {名字: ndarray}
+        backend (str): 'shm' 为 multiprocessing.shared_memory，'npy' 为临时目录中的内存映射 .npy
+        directory (str, optional): npy 的临时目录所在位置
+    """
+
+    def __init__(self, arrays, backend='shm', directory=None):
+        self.backend = backend
+        self.specs = {}
+        self._blocks = []
+        self._directory = None
+        if backend == 'npy':
+            self._directory = tempfile.mkdtemp(dir=directory)
+        elif backend != 'shm':
+            raise ValueError(f"未知的共享方式: {backend}")
+        try:
+            for key, values in arrays.items():
+                values = np.ascontiguousarray(values)
+                if backend == 'shm':
+                    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                    self._blocks.append(shm)
+                    np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+                    self.specs[key] = ('shm', shm.name, values.shape, values.dtype.str)
+                else:
+                    path = os.path.join(self._directory, f"{key}.npy")
+                    np.save(path, values)
+                    self.specs[key] = ('npy', path, values.shape, values.dtype.str)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+        if self._directory:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(specs):
+    """进程池初始化：记录共享数组的位置，使用时再挂载"""
+    _attached['specs'] = specs
+    _attached['arrays'] = {}
+
+
+def get(key):
+    """子进程中取得共享数组的只读视图"""
+    if key not in _attached['arrays']:
+        kind, location, shape, dtype = _attached['specs'][key]
+        if kind == 'shm':
+            shm = shared_memory.SharedMemory(name=location)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        else:
+            shm = None
+            array = np.load(location, mmap_mode='r')
+        array.flags.writeable = False
+        _attached['arrays'][key] = (shm, array)
+    return _attached['arrays'][key][1]
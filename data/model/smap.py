@@ -0,0 +1,132 @@
+import os
+import numpy as np
+import pandas as pd
+import config as cfg
+
+'''
+    S-map 相互作用强度
+    多变量 S-map (Deyle et al. 2016)：以 [目标, 驱动变量...] 的同期值为状态空间，
+    对每个预测点做以状态距离指数加权的局部线性回归，回归系数即局部 Jacobian，
+    表示各变量对目标变量的时变相互作用强度（如 CL 与 O3、OH、NOX）。
+    所有预测点、所有 theta 的加权最小二乘一次批量求解：对每行乘以权重的设计矩阵做批量 SVD，
+    小奇异值的截断容差与 pyEDM 默认的 numpy.linalg.lstsq（rcond=None）相同，
+    不再逐个预测点循环调用 pyEDM SMap。与 pyEDM SMap 的比对见 tests/test_smap.py。
+'''
+
+# 默认 theta 扫描范围
+THETAS = (0, 0.01, 0.1, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 4, 6, 8)
+
+
+def smap(data, target, columns, thetas=THETAS, Tp=1, standardize=True, exclude_self=True, chunk_size=256):
+    """多变量 S-map，一次求解全部预测点、全部 theta 的局部回归
+
+    Parameters:
+        data (DataFrame): 逐月序列
+        target (str): 目标变量
+        columns (list): 状态空间变量（通常包含 target 本身）
+        thetas (iterable): 非线性参数
+        Tp (int): 预测步长
+        standardize (bool): 是否先做标准化（不同变量单位不同）
+        exclude_self (bool): 预测点自身不参与回归
+        chunk_size (int): 每批预测点数，控制内存
+
+    Returns:
+        dict:
+            'skill': DataFrame，索引为 theta，列 rho / mae
+            'coefficients': ndarray (theta, time, 1 + len(columns))，截距 + 各变量系数；
+                standardize 时为标准化单位
+            'predictions': ndarray (theta, time)
+            'time': 预测点对应的时间索引
+    """
+    columns = list(columns)
+    thetas = np.asarray(thetas, dtype=np.float64)
+    frame = data[columns + ([target] if target not in columns else [])].astype(np.float64)
+    if standardize:
+        frame = (frame - frame.mean()) / frame.std()
+
+    X = frame[columns].values[:len(frame) - Tp]
+    y = frame[target].values[Tp:]
+    valid = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    X, y = X[valid], y[valid]
+    time = data.index[:len(frame) - Tp][valid]
+    n, p = X.shape
+    A = np.hstack([np.ones((n, 1)), X])  # 设计矩阵，含截距
+
+    coefficients = np.full((len(thetas), n, p + 1), np.nan)
+    for start in range(0, n, chunk_size):
+        rows = np.arange(start, min(start + chunk_size, n))
+        # 预测点到全部库点的距离 (chunk, n)，按平均距离归一（与 pyEDM 相同，排除自身时不计入自身的 0 距离）
+        dist = np.sqrt(((X[rows, None, :] - X[None, :, :]) ** 2).sum(axis=-1))
+        dbar = dist.sum(axis=1, keepdims=True) / (n - 1 if exclude_self else n)
+        scaled = np.divide(dist, dbar, out=np.zeros_like(dist), where=dbar > 0)
+        # 与 pyEDM 相同，权重乘在设计矩阵和目标的每一行上，即残差平方按 w^2 加权
+        weights = np.exp(-thetas[:, None, None] * scaled[None])  # w，(theta, chunk, n)
+        if exclude_self:
+            weights[:, np.arange(len(rows)), rows] = 0
+        coefficients[:, rows] = _weighted_lstsq(weights[..., None] * A, weights * y)
+
+    predictions = np.einsum('tcp,cp->tc', coefficients, A)
+    obs = np.broadcast_to(y, predictions.shape)
+    rho = np.array([np.corrcoef(pred, y)[0, 1] for pred in predictions])
+    mae = np.nanmean(np.abs(predictions - obs), axis=1)
+    return {
+        'skill': pd.DataFrame({'rho': rho, 'mae': mae}, index=pd.Index(thetas, name='theta')),
+        'coefficients': coefficients,
+        'predictions': predictions,
+        'time': time,
+    }
+
+
+def _weighted_lstsq(wA, wy):
+    """批量最小二乘 wA c = wy，等价于逐个调用 numpy.linalg.lstsq(wA, wy, rcond=None)
+
+    不构造法方程 A^T W A（条件数为设计矩阵的平方），直接对加权设计矩阵做 SVD，
+    奇异值小于 eps * max(M, N) * 最大奇异值的分量置零。
+
+    Parameters:
+        wA (ndarray): (..., M, N) 加权设计矩阵
+        wy (ndarray): (..., M) 加权目标
+
+    Returns:
+        ndarray: (..., N) 系数
+    """
+    U, sv, Vt = np.linalg.svd(wA, full_matrices=False)
+    cutoff = np.finfo(wA.dtype).eps * max(wA.shape[-2:]) * sv[..., :1]
+    inverse = np.divide(1, sv, out=np.zeros_like(sv), where=sv > cutoff)
+    projected = np.einsum('...mn,...m->...n', U, wy) * inverse
+    return np.einsum('...nk,...n->...k', Vt, projected)
+
+
+def interaction_strengths(data, target, columns, thetas=THETAS, Tp=1, standardize=True):
+    """在预测技能最高的 theta 下，各变量对目标变量的时变相互作用强度
+
+    standardize 时回归在标准化空间中进行，系数乘以 std(target) / std(var) 换回原始单位，
+    使 d{target}/d{var} 与 standardize=False 时的量纲相同。
+
+    Returns:
+        tuple: (DataFrame 索引为时间、列为 d{target}/d{var}, 最佳 theta, theta 扫描的技能表)
+    """
+    columns = list(columns)
+    result = smap(data, target, columns, thetas, Tp, standardize)
+    skill = result['skill']
+    best = int(np.nanargmax(skill['rho'].values))
+    coefficients = result['coefficients'][best, :, 1:]
+    if standardize:
+        std = data[columns].astype(np.float64).std().values
+        coefficients = coefficients * (data[target].astype(np.float64).std() / std)
+    jacobian = pd.DataFrame(coefficients, index=result['time'],
+                            columns=[f"d{target}/d{col}" for col in columns])
+    return jacobian, skill.index[best], skill
+
+
+if __name__ == "__main__":
+    output_dir = "/home/tgm/gasplot/plot/output/smap/"
+    os.makedirs(output_dir, exist_ok=True)
+    data = pd.read_csv(os.path.join(cfg.fldmean_fin, "fldmean.csv"), index_col='time')
+    target = 'CL'
+    columns = [col for col in ['CL', 'O3', 'OH', 'NOX'] if col in data.columns]
+    jacobian, theta, skill = interaction_strengths(data, target, columns)
+    print(skill)
+    print(f"最佳 theta = {theta}")
+    skill.to_csv(os.path.join(output_dir, f"{target}_theta_skill.csv"))
+    jacobian.to_csv(os.path.join(output_dir, f"{target}_interaction_strength.csv"))
@@ -0,0 +1,150 @@
+import os
+import re
+import sys
+import glob
+import numpy as np
+import xarray as xr
+import matplotlib.pyplot as plt
+import config as cfg
+from series_stats import mann_kendall, theil_sen, PAIR_BYTES
+from nc_writer import write_netcdf
+from province_emissions import sector_flux
+
+'''
+    格点趋势图
+    原先趋势只对省份合计（fig3.5b、fig3.6）和区域平均（prec/trend.py）计算。
+    这里对每个格点计算 Theil–Sen 斜率和 Mann–Kendall 显著性（series_stats.py），
+    格点按块批量计算，不逐格点循环：
+        排放清单  maskedFinalHcl / maskedFinalpcl 各部门通量之和，逐月序列先去掉多年月平均（季节循环）
+        模式场    TS、PRECC+PRECL、近地面 CL，merge<年>.nc 逐年平均后的年序列，S1 与 SSP370 两个情景
+    每个场输出 <名字>_trend.nc（slope、intercept、S、z、p）和 <名字>_trend.png（斜率，打点为 p < ALPHA）：
+        trend_map_dir/
+    python trend_map.py [emissions|model]
+'''
+
+ALPHA = 0.05
+# 模式场：(由 merge<年>.nc 的 Dataset 生成 (time, lat, lon) 场的函数, 取单位的变量)
+MODEL_FIELDS = {
+    'TS': (lambda ds: ds['TS'], 'TS'),
+    'PREC': (lambda ds: ds['PRECC'] + ds['PRECL'], 'PRECC'),
+    'CL': (lambda ds: ds['CL'].isel(lev=-1), 'CL'),  # 最后一层为近地面层
+}
+SCENARIOS = {'S1': cfg.fin_dir, 'SSP370': cfg.nochg_dir}
+EMISSIONS = {
+    'HCl': cfg.gasdata_dir + "result/maskedFinalHcl.nc",
+    'pCl': cfg.gasdata_dir + "result/maskedFinalpcl.nc",
+}
+
+
+def decimal_years(time):
+    """月时间坐标 -> 小数年（取月中），datetime64 与 cftime 均可"""
+    return time.dt.year.values + (time.dt.month.values - 0.5) / 12
+
+
+def deseasonalize(values, months):
+    """(time, ...) 逐月数组减去多年月平均，缺测不参与（全部缺测的格点保持缺测）"""
+    anomaly = np.array(values, dtype=np.float64)
+    for month in np.unique(months):
+        sel = months == month
+        finite = np.isfinite(anomaly[sel])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(finite, anomaly[sel], 0).sum(axis=0) / finite.sum(axis=0)
+        anomaly[sel] -= mean
+    return anomaly
+
+
+def trend_map(values, t, lat, lon, units='', max_bytes=PAIR_BYTES):
+    """格点趋势
+
+    Parameters:
+        values (ndarray): (time, lat, lon)
+        t (ndarray): (time,) 时间坐标（年）
+
+    只对有有效值的格点计算（如排放清单中国以外的格点全部缺测），其余格点为 NaN
+
+    Returns:
+        xarray.Dataset: slope、intercept（Theil–Sen），S、z、p（Mann–Kendall），形状 (lat, lon)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    series = values.reshape(len(values), -1).T  # (格点, time)
+    valid = np.isfinite(series).any(axis=1)
+    maps = np.full((5, series.shape[0]), np.nan)
+    maps[:2, valid] = theil_sen(series[valid], t, max_bytes)
+    maps[2:, valid] = mann_kendall(series[valid])
+    slope, intercept, s, z, p = maps.reshape((5,) + values.shape[1:])
+    coords = {'lat': ('lat', np.asarray(lat), {'units': 'degrees_north'}),
+              'lon': ('lon', np.asarray(lon), {'units': 'degrees_east'})}
+    ds = xr.Dataset({
+        'slope': (('lat', 'lon'), slope, {'long_name': 'Theil-Sen slope', 'units': f"{units} / year".strip()}),
+        'intercept': (('lat', 'lon'), intercept, {'long_name': 'Theil-Sen intercept', 'units': units}),
+        'S': (('lat', 'lon'), s, {'long_name': 'Mann-Kendall S'}),
+        'z': (('lat', 'lon'), z, {'long_name': 'Mann-Kendall Z'}),
+        'p': (('lat', 'lon'), p, {'long_name': 'Mann-Kendall two-sided p-value'}),
+    }, coords=coords)
+    ds.attrs['time_range'] = f"{t[0]:.2f}-{t[-1]:.2f}"
+    return ds
+
+
+def plot_trend(ds, title, output_file, alpha=ALPHA):
+    """斜率图，p < alpha 的格点打点"""
+    slope = ds['slope'].values
+    limit = np.nanpercentile(np.abs(slope), 98) if np.isfinite(slope).any() else 1
+    fig, ax = plt.subplots(figsize=(10, 6))
+    mesh = ax.pcolormesh(ds['lon'], ds['lat'], slope, cmap='RdBu_r', vmin=-limit, vmax=limit, shading='auto')
+    significant = (ds['p'].values < alpha).astype(float)
+    if significant.any():
+        ax.contourf(ds['lon'], ds['lat'], significant, levels=[0.5, 1.5], colors='none', hatches=['..'])
+    fig.colorbar(mesh, ax=ax, label=ds['slope'].attrs.get('units', ''))
+    ax.set_title(f"{title} (dots: p < {alpha})")
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    fig.savefig(output_file, dpi=200, bbox_inches='tight')
+    plt.close(fig)
+
+
+def save(ds, name, output_dir):
+    write_netcdf(ds, os.path.join(output_dir, f"{name}_trend.nc"), preset='archive')
+    plot_trend(ds, name, os.path.join(output_dir, f"{name}_trend.png"))
+    print(f"{name}: 显著格点 {int((ds['p'] < ALPHA).sum())} / {int(np.isfinite(ds['p']).sum())}")
+
+
+def emission_trends(output_dir=None, emissions=EMISSIONS):
+    """排放清单逐月通量的格点趋势（去季节循环）"""
+    output_dir = output_dir or cfg.trend_map_dir
+    for species, file in emissions.items():
+        ds = xr.open_dataset(file)
+        flux = sector_flux(ds, skip_nan_wstop=True)
+        anomaly = deseasonalize(flux, ds['time'].dt.month.values)
+        result = trend_map(anomaly, decimal_years(ds['time']), ds['lat'].values, ds['lon'].values, 'kg m-2 s-1')
+        save(result, f"emission_{species}", output_dir)
+
+
+def load_model_field(directory, field):
+    """逐年读取 merge<年>.nc，返回 (年份, 年平均场 (year, lat, lon), lat, lon, 单位)"""
+    files = sorted(glob.glob(os.path.join(directory, "merge[0-9][0-9][0-9][0-9].nc")))
+    func, units_var = MODEL_FIELDS[field]
+    years, maps = [], []
+    for file in files:
+        with xr.open_dataset(file) as ds:
+            maps.append(func(ds).mean('time').transpose('lat', 'lon').values)
+            units = ds[units_var].attrs.get('units', '')
+            lat, lon = ds['lat'].values, ds['lon'].values
+        years.append(int(re.search(r"merge(\d{4})\.nc$", file).group(1)))
+    return np.array(years, dtype=np.float64), np.stack(maps), lat, lon, units
+
+
+def model_trends(output_dir=None, fields=MODEL_FIELDS, scenarios=SCENARIOS):
+    """模式场年平均的格点趋势"""
+    output_dir = output_dir or cfg.trend_map_dir
+    for scenario, directory in scenarios.items():
+        for field in fields:
+            years, maps, lat, lon, units = load_model_field(directory, field)
+            save(trend_map(maps, years, lat, lon, units), f"{field}_{scenario}", output_dir)
+
+
+if __name__ == '__main__':
+    targets = sys.argv[1:] or ['emissions', 'model']
+    if 'emissions' in targets:
+        emission_trends()
+    if 'model' in targets:
+        model_trends()
@@ -14,10 +14,12 @@ config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/mo
 sys.path.append(config_dir)
 
 import config as cfg
+from render_cache import RenderCache
 
 fin_data = xr.open_dataset(cfg.fin_dir + "collastThreeyear.nc")
 nochg_data = xr.open_dataset(cfg.nochg_dir + "collastThreeyearnochg.nc")
 output_dir = cfg.output_dir('colspacediff')
+render_cache = RenderCache(output_dir)
 base_time = xr.open_dataset(cfg.fin_dir + "lastThreeyear.nc", decode_times=True).time
 
 # 读取中国省份边界
@@ -81,8 +83,10 @@ for var in fin_data.data_vars:
             nochg_data[var] = nochg_data[var].isel(ilev=len(nochg_data.ilev) - 1)
     
     output_filename = os.path.join(output_dir, f'{var}_diff_CN.png')
-    if os.path.exists(output_filename):
-        print(f"File {output_filename} already exists. Skipping...")
+    # 输入数据或图形参数未变化时直接复用已有图片
+    render_key = render_cache.key((fin_data[var], nochg_data[var]), {'figure': 'colspacediff_CN', 'var': var, 'seasons': seasons})
+    if render_cache.is_fresh(output_filename, render_key):
+        print(f"File {output_filename} is up to date. Skipping...")
         continue
     # 创建一个包含5张子图的画布，调整布局参数
     fig = plt.figure(figsize=(12, 14))
@@ -200,4 +204,5 @@ for var in fin_data.data_vars:
     # 调整布局并保存
     plt.savefig(output_filename, bbox_inches='tight')
     plt.close()
+    render_cache.record(output_filename, render_key)
     print(f"已保存 {var} 的空间差异图。")
\ No newline at end of file
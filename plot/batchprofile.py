@@ -2,6 +2,15 @@ import pandas as pd
 import xarray as xr
 import matplotlib.pyplot as plt
 import os
+import sys
+
+# 获取 config.py 文件所在的目录
+config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/model'))
+# 将该目录添加到 sys.path 中
+sys.path.append(config_dir)
+
+from render_cache import RenderCache
+from profile_store import build_profile_store, load_profiles, window_mean, profile_difference, profile_species, species_profile
 
 '''
 垂直廓线图
@@ -91,113 +100,78 @@ def spicail():
 
 def batch(final_folder, nochg_folder):
     exampleFile = "/mnt/d/fin/fin/cam/merge2025.nc"
-    ds = xr.open_dataset(exampleFile)
-    print(ds.lev)
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
-    def get_last_year(file):
-        """
-        读取文件并筛选出 2038 年的数据。
-
-        参数:
-        file (str): 要读取的文件路径。
+    render_cache = RenderCache(output_dir)
+
+    # 一次性读取全部物种的廓线（附带 lev/ilev 气压坐标）
+    fin_profiles = load_profiles(build_profile_store(final_folder, exampleFile))
+    nochg_profiles = load_profiles(build_profile_store(nochg_folder, exampleFile))
+    # 所有物种 2038 年的平均廓线以及 S1 与 SSP370 的差异一次算完
+    fin_mean = window_mean(fin_profiles, years=2038)
+    result = profile_difference(fin_profiles, nochg_profiles, years=2038)
+
+    for species in profile_species(fin_mean):
+        spice = species
+        if spice == 'O3':
+                spice = "$O_{3}$ "
+        output_path = output_dir+f'{spice}_combined_vertical_profile.png'
+        final_df = species_profile(fin_mean, species)
 
-        返回:
-        pandas.DataFrame: 包含 2038 年数据的 DataFrame。
-        """
-        df = pd.read_csv(file)
-        df['time'] = pd.to_datetime(df['time'])
-        # 筛选 2038 年的数据
-        df = df[df['time'].dt.year == 2038]
-        # 计算 final_df 的平均值并去掉第一列（假设第一列是时间列）
-        df = df.mean().iloc[1:]
-
-        # 确保 ds.lev 的长度和 final_mean 的行数一致
-        if len(ds.lev) == len(df):
-            # 将 Series 转换为 DataFrame
-            df = df.reset_index()
-            # 将 DataArray 转换为一维 numpy 数组
-            lev_array = ds.lev.values
-            # 设置索引
-            df = df.set_index(lev_array)
-            df = df.drop(columns='index')
-        elif len(ds.ilev) == len(df):
-            df = df.reset_index()
-            lev_array = ds.ilev.values
-            df = df.set_index(lev_array)
-            df = df.drop(columns='index')
-        else:
-            print(f"警告: ds.lev 的长度 ({len(ds.lev)}) 与 DataFrame final_mean 的行数 ({len(df)}) 不匹配，无法重命名索引。")
-        return df
-
-    # 遍历 final_folder 中的所有文件
-    for file in os.listdir(final_folder):
-        if file.endswith("_levels.csv"):
-            spice = file.replace("_levels.csv", "")
-
-            final_file = os.path.join(final_folder, file)
-            nochg_file = os.path.join(nochg_folder, file)
-            if spice == 'O3':
-                    spice = "$O_{3}$ "
-            output_path = output_dir+f'{spice}_combined_vertical_profile.png'
+        try:
+            nochg_df = species_profile(result, species, 'ssp370')
+            rel_diff = species_profile(result, species, 'rel')
 
-            if os.path.exists(output_path):
-                print(f"{output_path} 已存在，跳过。")
+            # 廓线数据或图形参数未变化时直接复用已有图片
+            render_key = render_cache.key((final_df, nochg_df), {'figure': 'profile', 'spice': spice, 'year': 2038})
+            if render_cache.is_fresh(output_path, render_key):
+                print(f"{output_path} 未变化，跳过。")
                 continue
 
-            try:
-                # 获取 2038 年的数据
-                final_df = get_last_year(final_file)
-                nochg_df = get_last_year(nochg_file)
-
-
-                # 创建一个包含两个子图的图形
-                fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
-
-                # 左图：绘制 diff
-                # ax1.plot(final_df.iloc[:, 0] - nochg_df.iloc[:, 0], nochg_df.index, label='diff')
-                ax1.plot((final_df.iloc[:, 0] - nochg_df.iloc[:, 0])/nochg_df.iloc[:,0], nochg_df.index, label='diff')
-                ax1.invert_yaxis()  # 反转纵坐标
-                # ax1.set_xscale('log')  # 将横坐标设置为对数坐标系
-                # ax1.set_xlabel(spice + 'mixing ratio(mol/mol)-dryair')
-                ax1.set_xlabel(spice + ' Relative Difference-dryair')
-                ax1.set_ylabel('pressure (hPa)')
-                ax1.set_title("Relative Difference in " + spice + ' mixing ratio between S1 and SSP370')
-                ax1.set_title("Difference in " + spice + ' mixing ratio between S1 and SSP370')
-                ax1.grid(True)
-                ax1.legend()
-
-                # 在左图的左上角添加标注 'a'
-                ax1.text(-0.15, 0.95, '(a)', transform=ax1.transAxes, fontsize=12, fontweight='bold')
-
-                # 右图：绘制 s1 和 ssp370，并将横坐标设置为对数坐标系
-                ax2.plot(final_df.iloc[:, 0], final_df.index, label='S1')
-                ax2.plot(nochg_df.iloc[:, 0], nochg_df.index, label='SSP370')
-                ax2.invert_yaxis()  # 反转纵坐标
-                ax2.set_xscale('log')  # 将横坐标设置为对数坐标系
-                ax2.set_xlabel(spice + ' (mol/mol)-dryair') 
-                ax2.set_ylabel('pressure (hPa)')
-
-                # 在右图的左上角添加标注 'b'
-                ax2.text(-0.15, 0.95, '(b)', transform=ax2.transAxes, fontsize=12, fontweight='bold')
-
-                ax2.set_title(f'{spice} S1 and SSP370 vertical profile')
-                ax2.grid(True)
-                ax2.legend()
-
-                # 保存图形
-                plt.savefig(output_path)
-                plt.close(fig)
-            except Exception as e:
-                plt.plot(final_df.iloc[:, 0], final_df.index, label='S1')
-                plt.title(f'{spice} S1 vertical profile')
-                plt.xlabel(spice + ' mixing ratio(mol/mol)-dryair')
-                plt.ylabel('pressure (hPa)')
-                plt.grid(True)
-                plt.legend()
-                plt.savefig(output_dir+f'{spice}_S1_vertical_profile.png')
-                plt.close()
-                print(f"处理 {spice} 时出错: {e}，跳过该物种。")
+            # 创建一个包含两个子图的图形
+            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
+
+            # 左图：绘制相对差异
+            ax1.plot(rel_diff, rel_diff.index, label='diff')
+            ax1.invert_yaxis()  # 反转纵坐标
+            ax1.set_xlabel(spice + ' Relative Difference-dryair')
+            ax1.set_ylabel('pressure (hPa)')
+            ax1.set_title("Difference in " + spice + ' mixing ratio between S1 and SSP370')
+            ax1.grid(True)
+            ax1.legend()
+
+            # 在左图的左上角添加标注 'a'
+            ax1.text(-0.15, 0.95, '(a)', transform=ax1.transAxes, fontsize=12, fontweight='bold')
+
+            # 右图：绘制 s1 和 ssp370，并将横坐标设置为对数坐标系
+            ax2.plot(final_df, final_df.index, label='S1')
+            ax2.plot(nochg_df, nochg_df.index, label='SSP370')
+            ax2.invert_yaxis()  # 反转纵坐标
+            ax2.set_xscale('log')  # 将横坐标设置为对数坐标系
+            ax2.set_xlabel(spice + ' (mol/mol)-dryair') 
+            ax2.set_ylabel('pressure (hPa)')
+
+            # 在右图的左上角添加标注 'b'
+            ax2.text(-0.15, 0.95, '(b)', transform=ax2.transAxes, fontsize=12, fontweight='bold')
+
+            ax2.set_title(f'{spice} S1 and SSP370 vertical profile')
+            ax2.grid(True)
+            ax2.legend()
+
+            # 保存图形
+            plt.savefig(output_path)
+            plt.close(fig)
+            render_cache.record(output_path, render_key)
+        except Exception as e:
+            plt.plot(final_df, final_df.index, label='S1')
+            plt.title(f'{spice} S1 vertical profile')
+            plt.xlabel(spice + ' mixing ratio(mol/mol)-dryair')
+            plt.ylabel('pressure (hPa)')
+            plt.grid(True)
+            plt.legend()
+            plt.savefig(output_dir+f'{spice}_S1_vertical_profile.png')
+            plt.close()
+            print(f"处理 {spice} 时出错: {e}，跳过该物种。")
 
 
 # 调用函数
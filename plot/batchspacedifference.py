@@ -13,10 +13,12 @@ config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/mo
 sys.path.append(config_dir)
 
 import config as cfg
+from render_cache import RenderCache
 
 fin_data = xr.open_dataset(cfg.fin_dir + "lastThreeyear.nc")
 nochg_data = xr.open_dataset(cfg.nochg_dir + "lastThreeyearnochg.nc")
 output_dir = cfg.output_dir('spacediff')
+render_cache = RenderCache(output_dir)
 
 # 定义季节
 seasons = {
@@ -70,8 +72,10 @@ for var in ['SOA','pom','dust','bc','ncl','so4','all aerosol','Precipitation']:
             nochg_data[var] = nochg_data[var].isel(lev=50)
     
     output_filename = os.path.join(output_dir, f'{var}_diff.png')
-    if os.path.exists(output_filename):
-        print(f"File {output_filename} already exists. Skipping...")
+    # 输入数据或图形参数未变化时直接复用已有图片
+    render_key = render_cache.key((fin_data[var], nochg_data[var]), {'figure': 'spacediff', 'var': var, 'seasons': seasons})
+    if render_cache.is_fresh(output_filename, render_key):
+        print(f"File {output_filename} is up to date. Skipping...")
         continue
     # 创建一个包含5张子图的画布，调整布局参数
 
@@ -177,4 +181,5 @@ for var in ['SOA','pom','dust','bc','ncl','so4','all aerosol','Precipitation']:
     # 调整布局并保存
     plt.savefig(output_filename, bbox_inches='tight')
     plt.close()
+    render_cache.record(output_filename, render_key)
     print(f"已保存 {var} 的空间差异图。")
\ No newline at end of file
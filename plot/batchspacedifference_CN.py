@@ -14,10 +14,12 @@ config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/mo
 sys.path.append(config_dir)
 
 import config as cfg
+from render_cache import RenderCache
 
 fin_data = xr.open_dataset(cfg.fin_dir + "lastThreeyear.nc")
 nochg_data = xr.open_dataset(cfg.nochg_dir + "lastThreeyearnochg.nc")
 output_dir = cfg.finoutput_dir('')
+render_cache = RenderCache(output_dir)
 # 读取中国省份边界
 base_dir = r"/mnt/d/gasdata/"
 china_map = gpd.read_file(base_dir + "2024年全国shp/中国_省.shp")
@@ -58,9 +60,11 @@ for var in ['O$_3$']:
             fin_data[var] = fin_data[var].isel(lev=len(fin_data.lev)-1)
             nochg_data[var] = nochg_data[var].isel(lev=len(nochg_data.lev)-1)
     
-    output_filename = os.path.join(output_dir, f'{var}_diff_CN.png')
-    if os.path.exists(output_filename):
-        print(f"File {output_filename} already exists. Skipping...")
+    output_filename = os.path.join(output_dir, f'4.2{var}_diff.png')
+    # 输入数据或图形参数未变化时直接复用已有图片
+    render_key = render_cache.key((fin_data[var], nochg_data[var]), {'figure': 'spacediff_CN', 'var': var, 'seasons': seasons})
+    if render_cache.is_fresh(output_filename, render_key):
+        print(f"File {output_filename} is up to date. Skipping...")
         continue
     # 创建一个包含5张子图的画布，调整布局参数
     fig = plt.figure(figsize=(12, 14))
@@ -174,8 +178,8 @@ for var in ['O$_3$']:
         # 给季节性子图添加标注
         label = chr(98 + i) + ') ' + f'{var}: {season} Difference'
         ax.text(0.5, -0.2, label, transform=ax.transAxes, ha='center', fontsize=12)
-    output_filename = os.path.join(output_dir, f'4.2{var}_diff.png')
     # 调整布局并保存
     plt.savefig(output_filename, bbox_inches='tight')
     plt.close()
+    render_cache.record(output_filename, render_key)
     print(f"已保存 {var} 的空间差异图。")
\ No newline at end of file
@@ -1,9 +1,16 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
-import numpy as np
 import matplotlib.font_manager as fm
+import os
+import sys
+
+# 获取 config.py 文件所在的目录
+config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/model'))
+# 将该目录添加到 sys.path 中
+sys.path.append(config_dir)
+
+from emission_cube import EmissionCube
 
 # 设置 matplotlib 参数
 plt.rcParams['font.size'] = 12
@@ -21,20 +28,14 @@ print("当前字体名为：", my_font.get_name())
 # 3. 设置 matplotlib 默认字体
 plt.rcParams['font.family'] = my_font.get_name()
 plt.rcParams['axes.unicode_minus'] = False
-# 读取数据
+# 读取数据：排放汇总立方体中的年平均值（全国面积加权平均，含 HCl_all 与 TOTAL）
 try:
-    base_dir = r"/mnt/d/gasdata/"
-    Hcldata = pd.read_csv(base_dir + "result/means/maskedFinalHcl_mean.csv", index_col="time", parse_dates=True)
-    Hcldata['HCl_all'] = Hcldata[['HCl_agri', 'HCl_bbop', 'HCl_wstop']].sum(axis=1)
-    Pcldata = pd.read_csv(base_dir + "result/means/maskedFinalpcl_mean.csv", index_col="time", parse_dates=True)
-    Pcldata['pCl_all'] = Pcldata[['pCl_agri', 'pCl_bbop', 'pCl_wstop']].sum(axis=1)
+    cube = EmissionCube()
 except FileNotFoundError:
     print("Error: Data files not found. Please check the file paths.")
     exit(1)
-
-# 计算年平均值
-Hcl_yearly = Hcldata.resample('YE').mean()
-Pcl_yearly = Pcldata.resample('YE').mean()
+Hcl_yearly = cube.annual('HCl')
+Pcl_yearly = cube.annual('pCl')
 
 # 计算HCl各部门占HCl总量的比例
 for col in ['HCl_ene', 'HCl_ind', 'HCl_res', 'HCl_all']:
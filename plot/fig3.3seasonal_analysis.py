@@ -6,6 +6,14 @@ import numpy as np
 import matplotlib.font_manager as fm
 import matplotlib as mpl
 import os
+import sys
+
+# 获取 config.py 文件所在的目录
+config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/model'))
+# 将该目录添加到 sys.path 中
+sys.path.append(config_dir)
+
+from emission_cube import EmissionCube
 plt.rcParams['axes.unicode_minus'] = False
 
 # 设置 matplotlib 参数
@@ -23,27 +31,16 @@ print("当前字体名为：", my_font.get_name())
 
 # 3. 设置 matplotlib 默认字体
 plt.rcParams['font.family'] = my_font.get_name()
+# 读取数据：排放汇总立方体
 try:
-    base_dir = r"/mnt/d/gasdata/"
-    Hcldata = pd.read_csv(base_dir + "result/means/maskedFinalHcl_mean.csv", 
-                         index_col="time", 
-                         parse_dates=True)
-    Hcldata['HCl_all'] = Hcldata[['HCl_agri', 'HCl_bbop', 'HCl_wstop']].sum(axis=1)
-    Pcldata = pd.read_csv(base_dir + "result/means/maskedFinalpcl_mean.csv", 
-                         index_col="time", 
-                         parse_dates=True)
-    Pcldata['pCl_all'] = Pcldata[['pCl_agri', 'pCl_bbop', 'pCl_wstop']].sum(axis=1)
+    cube = EmissionCube()
 except FileNotFoundError:
     print("错误：未找到数据文件。请检查文件路径。")
     exit(1)
 
-# 选择需要的列
-Hcl_data = Hcldata[['HCl_ene', 'HCl_ind', 'HCl_res', 'HCl_all', 'TOTAL']]
-Pcl_data = Pcldata[['pCl_ene', 'pCl_ind', 'pCl_res', 'pCl_all', 'TOTAL']]
-
-# 计算每个月的平均值
-Hcl_monthly = Hcl_data.groupby(Hcl_data.index.month).mean()
-Pcl_monthly = Pcl_data.groupby(Pcl_data.index.month).mean()
+# 每个月的多年平均值，选择需要的列
+Hcl_monthly = cube.climatology('HCl')[['HCl_ene', 'HCl_ind', 'HCl_res', 'HCl_all', 'TOTAL']]
+Pcl_monthly = cube.climatology('pCl')[['pCl_ene', 'pCl_ind', 'pCl_res', 'pCl_all', 'TOTAL']]
 
 # 定义标签映射
 labels = {
@@ -5,8 +5,17 @@ import pandas as pd
 import numpy as np
 from matplotlib.gridspec import GridSpec
 import os
-import pickle
 import matplotlib.font_manager as fm
+import sys
+
+# 获取 config.py 文件所在的目录
+config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/model'))
+# 将该目录添加到 sys.path 中
+sys.path.append(config_dir)
+
+from cell_area import weighted_mean
+from analysis_cache import AnalysisCache
+from emission_cube import REGIONS
 
 # 设置 matplotlib 参数
 plt.rcParams['font.size'] = 12
@@ -23,19 +32,15 @@ plt.rcParams['axes.unicode_minus'] = False
 
 # 读取数据
 base_dir = r"/mnt/d/gasdata/"
-cache_dir = os.path.join(base_dir, "cache")
-os.makedirs(cache_dir, exist_ok=True)
-
-# 定义缓存文件路径
-cache_file = os.path.join(cache_dir, "regional_emissions.pkl")
-
-# 定义区域划分
-regions = {
-    'East': ['北京市', '天津市', '河北省', '上海市', '江苏省', '浙江省', '福建省', '山东省', '广东省', '海南省'],
-    'Middle': ['山西省', '安徽省', '江西省', '河南省', '湖北省', '湖南省'],
-    'West': ['内蒙古自治区', '广西壮族自治区', '重庆市', '四川省', '贵州省', '云南省', 
-           '西藏自治区', '陕西省', '甘肃省', '青海省', '宁夏回族自治区', '新疆维吾尔自治区']
-}
+hcl_file = base_dir + "result/maskedFinalHcl.nc"
+pcl_file = base_dir + "result/maskedFinalpcl.nc"
+shp_file = base_dir + "2024年全国shp/中国_省.shp"
+
+# 分析结果缓存：键为输入文件指纹 + 区域划分 + 计算代码，输入不变时一直复用（analysis_cache.py）
+analysis_cache = AnalysisCache()
+
+# 定义区域划分（与排放汇总立方体相同）
+regions = REGIONS
 
 # 定义中英文区域名称映射
 region_name_mapping = {
@@ -72,34 +77,27 @@ def calculate_regional_emissions(data, province_shapes, region_dict):
         lon_grid, lat_grid = np.meshgrid(lon, lat)
         mask = region_mask.contains(gpd.points_from_xy(lon_grid.flatten(), lat_grid.flatten())).reshape(lon_grid.shape)
         
-        # 应用掩码并计算区域排放量
-        masked_data = total_emissions.where(xr.DataArray(mask, dims=['lat', 'lon']))
-        regional_data[region] = masked_data.mean(dim=['lat', 'lon'])
+        # 应用掩码并计算区域排放量（按格点面积加权，见 cell_area.py）
+        regional_data[region] = weighted_mean(total_emissions.transpose(..., 'lat', 'lon').values, lat, lon, mask)
     
     return pd.DataFrame(regional_data)
 
 def load_or_calculate_emissions():
     """加载缓存数据或重新计算排放量"""
-    if os.path.exists(cache_file):
-        print("从缓存加载区域排放数据...")
-        with open(cache_file, 'rb') as f:
-            return pickle.load(f)
-    
-    print("计算区域排放数据...")
-    # 读取原始数据
-    hcl_data = xr.open_dataset(base_dir + "result/maskedFinalHcl.nc")
-    pcl_data = xr.open_dataset(base_dir + "result/maskedFinalpcl.nc")
-    china_map = gpd.read_file(base_dir + "2024年全国shp/中国_省.shp")
-    
-    # 计算区域排放量
-    hcl_regional = calculate_regional_emissions(hcl_data, china_map, regions)
-    pcl_regional = calculate_regional_emissions(pcl_data, china_map, regions)
-    
-    # 保存结果到缓存
-    with open(cache_file, 'wb') as f:
-        pickle.dump((hcl_regional, pcl_regional), f)
-    
-    return hcl_regional, pcl_regional
+    def compute():
+        print("计算区域排放数据...")
+        # 读取原始数据
+        hcl_data = xr.open_dataset(hcl_file)
+        pcl_data = xr.open_dataset(pcl_file)
+        china_map = gpd.read_file(shp_file)
+        
+        # 计算区域排放量
+        return {'hcl': calculate_regional_emissions(hcl_data, china_map, regions),
+                'pcl': calculate_regional_emissions(pcl_data, china_map, regions)}
+    
+    results = analysis_cache.cached('regional_emissions', [hcl_file, pcl_file, shp_file], {'regions': regions},
+                                    compute, code=[calculate_regional_emissions, calculate_total_emissions, weighted_mean])
+    return results['hcl'], results['pcl']
 
 def plot_regional_comparison(hcl_regional, pcl_regional):
     """绘制区域对比图"""
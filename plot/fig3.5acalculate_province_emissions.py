@@ -5,118 +5,23 @@ import xarray as xr
 import numpy as np
 import geopandas as gpd
 import pandas as pd
-import multiprocessing as mp
-from functools import partial
 import os
-from shapely.geometry import Point
+import sys
 
-def calculate_total_emissions(dataset, time_index=None, total_times=None):
-    """计算数据集的总排放量
-    
-    Parameters:
-        dataset (xarray.Dataset): 包含排放数据的数据集
-        time_index (int, optional): 时间索引
-        total_times (int, optional): 总时间点数
-    
-    Returns:
-        xarray.DataArray: 总排放量
-    """
-    total = 0
-    is_last_year = (time_index is not None and total_times is not None and 
-                   time_index >= total_times - 12)
-    
-    for var in dataset.data_vars:
-        if var.endswith('_wstop'):
-            if not is_last_year:  # 只在非最后一年计算_wstop
-                total += dataset[var]
-        else:
-            total += dataset[var].isel(lev=0)
-    return total
+# 获取 config.py 文件所在的目录
+config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/model'))
+# 将该目录添加到 sys.path 中
+sys.path.append(config_dir)
 
-def calculate_province_emission(masked_data, area_m2):
-    """计算省份的月排放量
-    
-    Parameters:
-        masked_data (xarray.DataArray): 掩码后的排放通量数据 (kg/m²/s)
-        area_m2 (float): 省份面积 (m²)
-    
-    Returns:
-        float: 月排放总量 (kg/month)
-    """
-    # 计算每个格点的排放通量 (kg/m²/s)
-    flux = masked_data.mean(dim=['lat', 'lon'])
-    
-    # 转换为月排放量
-    seconds_per_month = 30.44 * 24 * 3600  # 平均每月秒数
-    monthly_flux = flux * seconds_per_month
-    
-    # 考虑省份面积，得到总排放量 (kg/month)
-    total_emission = monthly_flux * area_m2
-    
-    # 将NaN值替换为0
-    total_emission = total_emission.fillna(0)
-    
-    return total_emission
-
-def calculate_province_data(province_info, hcl_data, pcl_data):
-    """计算单个省份的排放数据
-    
-    Parameters:
-        province_info (tuple): (省份名, 省份形状, 投影后的省份形状)
-        hcl_data (xarray.Dataset): HCl排放数据
-        pcl_data (xarray.Dataset): PCl排放数据
-    
-    Returns:
-        tuple: (省份名, 包含HCl和PCl月排放量的字典)
-    """
-    province, province_shape, province_shape_proj = province_info
-    
-    # 获取省份掩码和面积
-    province_mask = province_shape.geometry.iloc[0]
-    province_area = province_shape_proj.geometry.area.iloc[0]
-    print(province_area)
-    # 创建省份掩码
-    lon = hcl_data.lon.values
-    lat = hcl_data.lat.values
-    lon_mesh, lat_mesh = np.meshgrid(lon, lat)
-    points = gpd.GeoSeries([Point(x, y) for x, y in zip(lon_mesh.flatten(), lat_mesh.flatten())])
-    mask = points.within(province_mask).values.reshape(lon_mesh.shape)
-    
-    # 获取总时间点数
-    total_times = len(hcl_data.time.values)
-    
-    # 计算每个时间点的排放量
-    hcl_series = []
-    pcl_series = []
-    
-    for t in range(total_times):
-        # 计算HCl和PCl的月排放量，考虑最后一年的特殊处理
-        hcl_masked = calculate_total_emissions(
-            hcl_data.isel(time=t), 
-            time_index=t,
-            total_times=total_times
-        ).where(mask)
-        
-        pcl_masked = calculate_total_emissions(
-            pcl_data.isel(time=t), 
-            time_index=t,
-            total_times=total_times
-        ).where(mask)
-        
-        hcl_emission = calculate_province_emission(hcl_masked, province_area)
-        pcl_emission = calculate_province_emission(pcl_masked, province_area)
-        
-        hcl_series.append(float(hcl_emission))
-        pcl_series.append(float(pcl_emission))
-    
-    return province, {
-        'hcl_monthly': np.array(hcl_series),
-        'pcl_monthly': np.array(pcl_series),
-        'area': province_area
-    }
+from province_emissions import sector_flux, all_province_emissions
+from cell_area import seconds_in_month
 
 def calculate_all_provinces(hcl_data, pcl_data, province_shapes):
-    """计算所有省份的排放数据（多线程版本）
+    """计算所有省份的排放数据（多进程版本）
+    
+    各部门通量求和后的 (time, lat, lon) 数组每个物种只在父进程生成一次并放入共享内存，
+    子进程按名字挂载后按省份分组计算掩码和排放量（见 province_emissions.py）。
+    省份面积和 kg/m²/s -> kg/month 的换算都使用 cell_area.py 的格点面积和实际日历月长。
     
     Parameters:
         hcl_data (xarray.Dataset): HCl排放数据
@@ -126,22 +31,12 @@ def calculate_all_provinces(hcl_data, pcl_data, province_shapes):
     Returns:
         dict: 包含所有省份排放数据的字典
     """
-    # 将地理坐标系转换为投影坐标系（使用Web Mercator投影）
-    province_shapes_proj = province_shapes.to_crs("EPSG:3857")
-    
-    # 准备省份信息
-    province_info = []
-    for province in province_shapes['name'].unique():
-        province_shape = province_shapes[province_shapes['name'] == province]
-        province_shape_proj = province_shapes_proj[province_shapes_proj['name'] == province]
-        province_info.append((province, province_shape, province_shape_proj))
-    
-    # 使用多进程计算省份数据
-    with mp.Pool() as pool:
-        calc_func = partial(calculate_province_data, hcl_data=hcl_data, pcl_data=pcl_data)
-        results = pool.map(calc_func, province_info)
-    
-    return dict(results)
+    fluxes = {'hcl': sector_flux(hcl_data), 'pcl': sector_flux(pcl_data)}
+    names, monthly, areas = all_province_emissions(fluxes, hcl_data.lat.values, hcl_data.lon.values,
+                                                   province_shapes, seconds_in_month(hcl_data.time.values))
+    
+    return {name: {'hcl_monthly': monthly['hcl'][i], 'pcl_monthly': monthly['pcl'][i], 'area': areas[i]}
+            for i, name in enumerate(names)}
 
 def save_results_to_csv(results, output_dir):
     """将结果保存为CSV文件
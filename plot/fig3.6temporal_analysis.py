@@ -6,12 +6,18 @@ import pandas as pd
 from matplotlib.gridspec import GridSpec
 import seaborn as sns
 import os
-import pickle
 from pypinyin import lazy_pinyin
-from shapely.geometry import Point
-import time
-import multiprocessing as mp
-from functools import partial
+import sys
+
+# 获取 config.py 文件所在的目录
+config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/model'))
+# 将该目录添加到 sys.path 中
+sys.path.append(config_dir)
+
+from province_emissions import sector_flux, province_masks, all_province_emissions, SECONDS_PER_MONTH
+from cell_area import cell_areas, seconds_in_month
+from analysis_cache import AnalysisCache
+from series_stats import linear_trend, lag_correlation, dominant_period
 
 # 设置matplotlib参数
 plt.rcParams['font.size'] = 12
@@ -20,12 +26,12 @@ plt.rcParams['figure.figsize'] = (15, 12)
 
 # 读取数据
 base_dir = r"/mnt/d/gasdata/"
-cache_dir = os.path.join(base_dir, "cache")
-os.makedirs(cache_dir, exist_ok=True)
+hcl_file = base_dir + "result/maskedFinalhcl.nc"
+pcl_file = base_dir + "result/maskedFinalpcl.nc"
+shp_file = base_dir + "2024年全国shp/中国_省.shp"
 
-# 定义缓存文件路径
-cache_file = os.path.join(cache_dir, "temporal_emissions.pkl")
-analysis_cache_file = os.path.join(cache_dir, "temporal_analysis.pkl")
+# 分析结果缓存：键为输入文件指纹 + 计算代码，输入不变时一直复用（analysis_cache.py）
+analysis_cache = AnalysisCache()
 
 def calculate_total_emissions(dataset, time_index=None, total_times=None):
     """计算数据集的总排放量
@@ -51,154 +57,62 @@ def calculate_total_emissions(dataset, time_index=None, total_times=None):
             total += dataset[var].isel(lev=0)
     return total
 
-def calculate_province_emission(masked_data, area_m2):
+def calculate_province_emission(masked_data):
     """
     计算省份的排放量
     
+    排放量 = Σ 通量 × 格点面积 × 当月秒数，格点面积和月长取自 cell_area.py
+    
     Parameters:
     -----------
     masked_data : xarray.DataArray
         掩码后的排放通量数据 (kg/m²/s)
-    area_m2 : float
-        省份面积 (m²)
     
     Returns:
     --------
-    float
+    xarray.DataArray
         月排放总量 (kg/month)
     """
-    # 计算每个格点的排放通量 (kg/m²/s)
-    flux = masked_data.sum(dim=['lat', 'lon'])
-    
-    # 转换为月排放量
-    # 1. 从 kg/m²/s 转换为 kg/m²/month
-    seconds_per_month = 30.44 * 24 * 3600  # 平均每月秒数
-    monthly_flux = flux * seconds_per_month
-    
-    # 2. 考虑省份面积，得到总排放量 (kg/month)
-    total_emission = monthly_flux * area_m2
-    
-    return total_emission
-
-def calculate_province_data(province_info, hcl_data, pcl_data):
-    """计算单个省份的排放数据"""
-    province, province_shape, province_shape_proj = province_info
-    
-    province_mask = province_shape.geometry.iloc[0]
-    province_area = province_shape_proj.geometry.area.iloc[0]
-    
-    # 创建省份掩码
-    lon = hcl_data.lon.values
-    lat = hcl_data.lat.values
-    lon_mesh, lat_mesh = np.meshgrid(lon, lat)
-    points = gpd.GeoSeries([Point(x, y) for x, y in zip(lon_mesh.flatten(), lat_mesh.flatten())])
-    mask = points.within(province_mask).values.reshape(lon_mesh.shape)
-    
-    # 获取总时间点数
-    total_times = len(hcl_data.time.values)
-    
-    # 计算每个时间点的排放量
-    hcl_series = []
-    pcl_series = []
-    
-    for t in range(total_times):
-        # 计算HCl和PCl的月排放量，考虑最后一年的特殊处理
-        hcl_masked = calculate_total_emissions(
-            hcl_data.isel(time=t), 
-            time_index=t,
-            total_times=total_times
-        ).where(mask)
-        
-        pcl_masked = calculate_total_emissions(
-            pcl_data.isel(time=t), 
-            time_index=t,
-            total_times=total_times
-        ).where(mask)
-        
-        # 计算月排放量 (kg/month)
-        hcl_emission = calculate_province_emission(hcl_masked, province_area)
-        pcl_emission = calculate_province_emission(pcl_masked, province_area)
-        
-        hcl_series.append(float(hcl_emission))
-        pcl_series.append(float(pcl_emission))
-    
-    # 转换为numpy数组
-    hcl_series = np.array(hcl_series)
-    pcl_series = np.array(pcl_series)
-    
-    return province, {
-        'hcl': hcl_series,
-        'pcl': pcl_series,
-        'total': float(np.mean(hcl_series)),
-        'area': province_area
-    }
-
-def analyze_province_trends(province_data, months):
-    """分析单个省份的趋势"""
-    province, data = province_data
-    if np.mean(data['hcl']) > 0:
-        hcl_trend = np.polyfit(months/12, data['hcl'], 1)[0]
-        pcl_trend = np.polyfit(months/12, data['pcl'], 1)[0]
-        return province, hcl_trend, pcl_trend, data['total']
-    return None
+    # 每个格点的排放速率 (kg/s) 求和
+    areas = xr.DataArray(cell_areas(masked_data.lat.values, masked_data.lon.values),
+                         coords={'lat': masked_data.lat, 'lon': masked_data.lon}, dims=['lat', 'lon'])
+    flux = (masked_data * areas).sum(dim=['lat', 'lon'])
+    
+    # 转换为月排放量 (kg/month)
+    if 'time' in masked_data.dims:
+        seconds = xr.DataArray(seconds_in_month(masked_data.time.values), coords={'time': masked_data.time}, dims='time')
+    else:
+        seconds = SECONDS_PER_MONTH
+    return flux * seconds
 
-def analyze_province_periodicity(province_data):
-    """分析省份排放量的周期性
+def trim_trailing_zeros(series):
+    """每条序列最后一个非零值之后记为缺测（全零或只有第一个值非零的序列保持不变）
     
     Parameters:
-        province_data: tuple, (province_name, province_data_dict)
-            province_data_dict contains 'hcl' and 'pcl' arrays
+        series (ndarray): (省份, time)
     
     Returns:
-        tuple or None: (province, hcl_autocorr, pcl_autocorr) if significant periodicity found
+        ndarray: (省份, time)，截去部分为 NaN
     """
-    province, data = province_data
-    
-    # 确保数据是numpy数组
-    hcl_series = np.array(data['hcl'])
-    pcl_series = np.array(data['pcl'])
-    
-    # 找到最后一个非零值的位置
-    last_nonzero_hcl = np.nonzero(hcl_series)[0][-1] if np.any(hcl_series != 0) else -1
-    last_nonzero_pcl = np.nonzero(pcl_series)[0][-1] if np.any(pcl_series != 0) else -1
-    
-    # 只使用到最后一个非零值的数据
-    if last_nonzero_hcl > 0:
-        hcl_series = hcl_series[:last_nonzero_hcl+1]
-    if last_nonzero_pcl > 0:
-        pcl_series = pcl_series[:last_nonzero_pcl+1]
-    
-    # 如果数据点太少，返回None
-    if len(hcl_series) < 24 or len(pcl_series) < 24:  # 至少需要2年的数据
-        return None
-    
-    # 计算自相关系数
-    hcl_autocorr = np.corrcoef(hcl_series[:-12], hcl_series[12:])[0,1]
-    pcl_autocorr = np.corrcoef(pcl_series[:-12], pcl_series[12:])[0,1]
-    
-    # 如果自相关系数显著，返回结果
-    if abs(hcl_autocorr) > 0.5 or abs(pcl_autocorr) > 0.5:
-        return province, hcl_autocorr, pcl_autocorr
-    return None
+    n = series.shape[1]
+    last = n - 1 - np.argmax(series[:, ::-1] != 0, axis=1)
+    last = np.where(last > 0, last, n - 1)
+    return np.where(np.arange(n) <= last[:, None], series, np.nan)
 
 def analyze_all_provinces(hcl_data, pcl_data, province_shapes):
-    """分析所有省份的排放特征（多线程版本）"""
+    """分析所有省份的排放特征（省份掩码与排放量在进程池中计算，趋势与周期性对全部省份批量计算）"""
     print("\n=== 全国省份排放特征分析 ===")
     
-    # 将地理坐标系转换为投影坐标系（使用Web Mercator投影，适用于中国区域）
-    province_shapes_proj = province_shapes.to_crs("EPSG:3857")
-    
-    # 准备省份信息
-    province_info = []
-    for province in province_shapes['name'].unique():
-        province_shape = province_shapes[province_shapes['name'] == province]
-        province_shape_proj = province_shapes_proj[province_shapes_proj['name'] == province]
-        province_info.append((province, province_shape, province_shape_proj))
-    
-    # 使用多进程计算省份数据
-    with mp.Pool() as pool:
-        calc_func = partial(calculate_province_data, hcl_data=hcl_data, pcl_data=pcl_data)
-        results = pool.map(calc_func, province_info)
+    # 通量数组只在父进程生成一次并放入共享内存，子进程按名字挂载（不再 pickle 整个数据集）
+    # 与 calculate_total_emissions 一致：最后一年及含 NaN 的时次不计 _wstop
+    # 与 calculate_province_emission 一致：Σ 通量 × 格点面积 × 当月秒数，省份面积为省内格点面积之和
+    fluxes = {'hcl': sector_flux(hcl_data, skip_nan_wstop=True), 'pcl': sector_flux(pcl_data, skip_nan_wstop=True)}
+    names, monthly, areas = all_province_emissions(fluxes, hcl_data.lat.values, hcl_data.lon.values,
+                                                   province_shapes, seconds_in_month(hcl_data.time.values),
+                                                   reduce='sum')
+    results = [(name, {'hcl': monthly['hcl'][i], 'pcl': monthly['pcl'][i],
+                       'total': float(np.mean(monthly['hcl'][i])), 'area': areas[i]})
+               for i, name in enumerate(names)]
     
     # 整理结果
     all_province_data = dict(results)
@@ -223,50 +137,41 @@ def analyze_all_provinces(hcl_data, pcl_data, province_shapes):
         print(f"省际月均排放量变异系数: {cv:.3f}")
         print(f"最大/最小省份排放比: {max(province_means)/min(province_means):.2f}")
     
-    # 分析排放量随时间的变化特征
+    # 分析排放量随时间的变化特征：全部省份一次最小二乘（series_stats.py）
     print("\n3. 时间变化特征分析 (显著趋势省份):")
-    valid_provinces = {k: v for k, v in all_province_data.items() 
-                      if isinstance(v['hcl'], (list, np.ndarray)) and 
-                      isinstance(v['pcl'], (list, np.ndarray)) and
-                      len(v['hcl']) > 0 and len(v['pcl']) > 0}
-    
-    if valid_provinces:
-        first_province = next(iter(valid_provinces.values()))
-        if isinstance(first_province['hcl'], list):
-            first_province['hcl'] = np.array(first_province['hcl'])
-        months = np.arange(0, len(first_province['hcl'])) * 4
+    hcl_series, pcl_series = monthly['hcl'], monthly['pcl']
+    years = np.arange(hcl_series.shape[1]) * 4 / 12
+    hcl_trend, _ = linear_trend(hcl_series, years)
+    pcl_trend, _ = linear_trend(pcl_series, years)
+    active = hcl_series.mean(axis=1) > 0
+    if active.any():
+        trend_threshold = np.mean(np.abs(hcl_trend[active]))
         
-        with mp.Pool() as pool:
-            trend_func = partial(analyze_province_trends, months=months)
-            trend_results = pool.map(trend_func, valid_provinces.items())
-        
-        # 过滤掉None结果并计算趋势阈值
-        trend_results = [r for r in trend_results if r is not None]
-        if trend_results:
-            trends = [abs(r[1]) for r in trend_results]
-            trend_threshold = np.mean(trends)
-            
-            # 打印显著趋势
-            for province, hcl_trend, pcl_trend, total in trend_results:
-                if abs(hcl_trend) > trend_threshold:
-                    print(f"{province}:")
-                    print(f"  HCl趋势: {hcl_trend:.2e} kg/year")
-                    print(f"  PCl趋势: {pcl_trend:.2e} kg/year")
-                    if total > 0:
-                        print(f"  相对变化率: {(hcl_trend/total)*100:.1f}%/year")
-    
-    # 分析排放量的周期性
+        # 打印显著趋势
+        for i in np.flatnonzero(active & (np.abs(hcl_trend) > trend_threshold)):
+            total = all_province_data[names[i]]['total']
+            print(f"{names[i]}:")
+            print(f"  HCl趋势: {hcl_trend[i]:.2e} kg/year")
+            print(f"  PCl趋势: {pcl_trend[i]:.2e} kg/year")
+            if total > 0:
+                print(f"  相对变化率: {(hcl_trend[i]/total)*100:.1f}%/year")
+    
+    # 分析排放量的周期性：只使用到最后一个非零值的数据，全部省份一次 FFT 求自相关和周期图
     print("\n4. 排放周期性分析 (显著周期性省份):")
-    with mp.Pool() as pool:
-        period_results = pool.map(analyze_province_periodicity, valid_provinces.items())
+    hcl_trimmed, pcl_trimmed = trim_trailing_zeros(hcl_series), trim_trailing_zeros(pcl_series)
+    hcl_autocorr = lag_correlation(hcl_trimmed, 12)
+    pcl_autocorr = lag_correlation(pcl_trimmed, 12)
+    hcl_period = dominant_period(hcl_trimmed)
+    # 至少需要2年的数据
+    enough = (np.isfinite(hcl_trimmed).sum(axis=1) >= 24) & (np.isfinite(pcl_trimmed).sum(axis=1) >= 24)
+    significant = enough & ((np.abs(hcl_autocorr) > 0.5) | (np.abs(pcl_autocorr) > 0.5))
     
     # 打印显著周期性
-    for result in period_results:
-        if result is not None:
-            province, hcl_autocorr, pcl_autocorr = result
-            print(f"{province}:")
-            print(f"  HCl年周期性: {hcl_autocorr:.3f}")
-            print(f"  PCl年周期性: {pcl_autocorr:.3f}")
+    for i in np.flatnonzero(significant):
+        print(f"{names[i]}:")
+        print(f"  HCl年周期性: {hcl_autocorr[i]:.3f}")
+        print(f"  PCl年周期性: {pcl_autocorr[i]:.3f}")
+        print(f"  HCl主周期: {hcl_period[i]:.1f} 个时次")
 
 def get_representative_provinces(data, province_shapes):
     """选择最具代表性的省份"""
@@ -283,22 +188,15 @@ def get_representative_provinces(data, province_shapes):
     province_data = {}
     total_emissions = calculate_total_emissions(data)
     
+    # 创建省份掩码
+    names, masks = province_masks(data.lat.values, data.lon.values,
+                                  province_shapes[province_shapes['name'].isin(representative_provinces)])
+    masks = dict(zip(names, masks))
+    
     for province in representative_provinces:
-        province_shape = province_shapes[province_shapes['name'] == province]
-        province_shape_proj = province_shapes.to_crs("EPSG:3857")[province_shapes['name'] == province]
-        province_mask = province_shape.geometry.iloc[0]
-        province_area = province_shape_proj.geometry.area.iloc[0]
-        
-        # 创建省份掩码
-        lon = data.lon.values
-        lat = data.lat.values
-        lon_mesh, lat_mesh = np.meshgrid(lon, lat)
-        points = gpd.GeoSeries([Point(x, y) for x, y in zip(lon_mesh.flatten(), lat_mesh.flatten())])
-        mask = points.within(province_mask).values.reshape(lon_mesh.shape)
-        
         # 计算该省份的排放量
-        masked_emissions = total_emissions.where(mask)
-        province_data[province] = calculate_province_emission(masked_emissions, province_area)
+        masked_emissions = total_emissions.where(xr.DataArray(masks[province], dims=['lat', 'lon']))
+        province_data[province] = calculate_province_emission(masked_emissions)
     
     return pd.DataFrame(province_data)
 
@@ -307,50 +205,32 @@ def convert_to_pinyin(province_name):
     pinyin_list = lazy_pinyin(province_name.rstrip('省市'))
     return ''.join(word.capitalize() for word in pinyin_list)
 
-def load_or_calculate_emissions(hcl_data, pcl_data, cache_file):
+def load_or_calculate_emissions(hcl_data, pcl_data):
     """从缓存加载或重新计算省份排放数据"""
-    # 如果缓存文件存在且较新，则从缓存加载
-    if os.path.exists(cache_file) and (time.time() - os.path.getmtime(cache_file) < 36000):
-        print("从缓存加载省份时间序列数据...")
-        with open(cache_file, 'rb') as f:
-            return pickle.load(f)
-    
-    print("计算省份时间序列数据...")
-    
-    # 加载省份地图数据
-    china_map = gpd.read_file(base_dir + "2024年全国shp/中国_省.shp")
-    
-    # 获取代表性省份数据
-    hcl_province = get_representative_provinces(hcl_data, china_map)
+    def compute():
+        print("计算省份时间序列数据...")
+        # 加载省份地图数据
+        china_map = gpd.read_file(shp_file)
+        # 获取代表性省份数据
+        return {'hcl': get_representative_provinces(hcl_data, china_map),
+                'pcl': get_representative_provinces(pcl_data, china_map)}
+    
+    results = analysis_cache.cached(
+        'temporal_emissions', [hcl_file, pcl_file, shp_file], {}, compute,
+        code=[get_representative_provinces, calculate_province_emission, calculate_total_emissions, province_masks,
+              cell_areas, seconds_in_month])
+    hcl_province, pcl_province = results['hcl'], results['pcl']
     provinces = list(hcl_province.columns)
     
     # 转换为拼音
     province_names_pinyin = {province: convert_to_pinyin(province) for province in provinces}
     
-    # 计算PCl省份数据
-    pcl_province = get_representative_provinces(pcl_data, china_map)
-    
-    # 保存结果到缓存
-    with open(cache_file, 'wb') as f:
-        pickle.dump((hcl_province, pcl_province, provinces, province_names_pinyin), f)
-    
     return hcl_province, pcl_province, provinces, province_names_pinyin
 
-def load_or_calculate_analysis(hcl_data, pcl_data, china_map, cache_file):
+def load_or_calculate_analysis(hcl_data, pcl_data, china_map):
     """从缓存加载或重新计算完整分析结果"""
-    # 如果缓存文件存在且较新，则从缓存加载
-    if os.path.exists(analysis_cache_file) and (time.time() - os.path.getmtime(analysis_cache_file) < 36000):
-        print("从缓存加载分析结果...")
-        with open(analysis_cache_file, 'rb') as f:
-            hcl_province, pcl_province, key_provinces, province_names_pinyin = pickle.load(f)
-    else:
-        print("计算完整分析结果...")
-        # 加载或计算排放数据
-        hcl_province, pcl_province, key_provinces, province_names_pinyin = load_or_calculate_emissions(hcl_data, pcl_data, cache_file)
-        
-        # 保存结果到缓存
-        with open(analysis_cache_file, 'wb') as f:
-            pickle.dump((hcl_province, pcl_province, key_provinces, province_names_pinyin), f)
+    # 加载或计算排放数据
+    hcl_province, pcl_province, key_provinces, province_names_pinyin = load_or_calculate_emissions(hcl_data, pcl_data)
     
     # 进行全省份分析
     analyze_all_provinces(hcl_data, pcl_data, china_map)
@@ -457,12 +337,12 @@ def analyze_emissions(hcl_province, pcl_province, key_provinces, province_names_
         print(f"  PCl极值比: {pcl_ratio:.2f}")
 
 # 加载数据并进行分析
-hcl_data = xr.open_dataset(base_dir + "result/maskedFinalhcl.nc")
-pcl_data = xr.open_dataset(base_dir + "result/maskedFinalpcl.nc")
-china_map = gpd.read_file(base_dir + "2024年全国shp/中国_省.shp")
+hcl_data = xr.open_dataset(hcl_file)
+pcl_data = xr.open_dataset(pcl_file)
+china_map = gpd.read_file(shp_file)
 
 # 从缓存加载或计算分析结果
-hcl_province, pcl_province, key_provinces, province_names_pinyin = load_or_calculate_analysis(hcl_data, pcl_data, china_map, cache_file)
+hcl_province, pcl_province, key_provinces, province_names_pinyin = load_or_calculate_analysis(hcl_data, pcl_data, china_map)
 
 # 绘制并保存图像
 fig = plot_temporal_analysis(hcl_province, pcl_province, key_provinces, province_names_pinyin)
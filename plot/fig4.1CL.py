@@ -1,7 +1,13 @@
-import pandas as pd
-import xarray as xr
 import matplotlib.pyplot as plt
 import os
+import sys
+
+# 获取 config.py 文件所在的目录
+config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/model'))
+# 将该目录添加到 sys.path 中
+sys.path.append(config_dir)
+
+from profile_store import build_profile_store, load_profiles, window_mean, profile_difference, species_profile
 
 '''
 垂直廓线图
@@ -29,48 +35,17 @@ species_mapping = {
     # 'O3': 'O₃',
 }
 
-def get_last_year(file, ds):
-    """
-    读取文件并筛选出 2038 年的数据。
-
-    参数:
-    file (str): 要读取的文件路径。
-    ds (xarray.Dataset): 包含高度信息的数据集。
-
-    返回:
-    pandas.DataFrame: 包含 2038 年数据的 DataFrame。
-    """
-    df = pd.read_csv(file)
-    df['time'] = pd.to_datetime(df['time'])
-    # 筛选 2038 年的数据
-    df = df[df['time'].dt.year == 2038]
-    # 计算 final_df 的平均值并去掉第一列（假设第一列是时间列）
-    df = df.mean().iloc[1:]
-
-    # 确保 ds.lev 的长度和 final_mean 的行数一致
-    if len(ds.lev) == len(df):
-        # 将 Series 转换为 DataFrame
-        df = df.reset_index()
-        # 将 DataArray 转换为一维 numpy 数组
-        lev_array = ds.lev.values
-        # 设置索引
-        df = df.set_index(lev_array)
-        df = df.drop(columns='index')
-    elif len(ds.ilev) == len(df):
-        df = df.reset_index()
-        lev_array = ds.ilev.values
-        df = df.set_index(lev_array)
-        df = df.drop(columns='index')
-    else:
-        print(f"警告: ds.lev 的长度 ({len(ds.lev)}) 与 DataFrame final_mean 的行数 ({len(df)}) 不匹配，无法重命名索引。")
-    return df
-
 def plot_final_figures(final_folder, nochg_folder, output_dir):
     exampleFile = "/mnt/d/fin/fin/cam/merge2025.nc"
-    ds = xr.open_dataset(exampleFile)
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
+    # 一次性读取全部物种廓线，并计算 2038 年平均及 S1 与 SSP370 的差异
+    fin_profiles = load_profiles(build_profile_store(final_folder, exampleFile))
+    nochg_profiles = load_profiles(build_profile_store(nochg_folder, exampleFile))
+    fin_mean = window_mean(fin_profiles, years=2038)
+    result = profile_difference(fin_profiles, nochg_profiles, years=2038)
+
     # 初始化一个包含所有子图的图形，布局为 2 行 3 列
     fig, axes = plt.subplots(2, 3, figsize=(18, 12))
     axes = axes.flatten()
@@ -79,23 +54,19 @@ def plot_final_figures(final_folder, nochg_folder, output_dir):
     relative_differences = {}
 
     for spice, academic_spice in species_mapping.items():
-        final_file = os.path.join(final_folder, spice + "_levels.csv")
-
-
         try:
             # 获取 2038 年的数据
-            final_df = get_last_year(final_file, ds)
+            final_df = species_profile(fin_mean, spice).to_frame()
             print(spice,final_df.iloc[-1,0].mean())
             # print(spice,final_df.iloc[:,0].mean())
 
             if spice != 'CLNO2':
-                nochg_file = os.path.join(nochg_folder, spice + "_levels.csv")
-                nochg_df = get_last_year(nochg_file, ds)
+                nochg_df = species_profile(result, spice, 'ssp370').to_frame()
                 # print(spice,nochg_df.iloc[-17:,0].mean())
                 print(spice,final_df.iloc[-1,0].mean()-nochg_df.iloc[-1,0].mean())
 
                 # 计算相对差异
-                relative_difference = (final_df.iloc[:, 0] - nochg_df.iloc[:, 0]) / nochg_df.iloc[:, 0]
+                relative_difference = species_profile(result, spice, 'rel')
                 relative_differences[academic_spice] = relative_difference
                 relative_difference.to_csv(output_dir + f'4.1{spice}_relative_difference.csv')
             # 绘制每个物种的 s1 和 ssp370 图
@@ -2,11 +2,19 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import os
 import matplotlib.dates as mdates
+import sys
+
+# 获取 config.py 文件所在的目录
+config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data/model'))
+# 将该目录添加到 sys.path 中
+sys.path.append(config_dir)
+
 import config as cfg
+from aggregate_store import AggregateStore
+from deviation_report import deviation_rates
 import xarray as xr  # 新增导入 xarray 用于读取 NetCDF 文件
 
 # 柱浓度的逐年趋势图
-file_name = "fldmean.csv"
 output_dir = "/home/tgm/gasplot/plot/output/yearlysurface_trend/"
 example_dir = cfg.fin_dir + "merge2037.nc"
 
@@ -19,72 +27,14 @@ except Exception as e:
     print(f"读取 NetCDF 文件 {example_dir} 时出错: {e}")
     var_units = {}
 
-def read_data(fin_dir, nochg_dir, file_name):
-    findf = pd.read_csv(fin_dir + file_name)
-    nochgdf = pd.read_csv(nochg_dir + file_name)
-
-    # 将时间列转换为 datetime 类型
-    findf['time'] = pd.to_datetime(findf['time'])
-    nochgdf['time'] = pd.to_datetime(nochgdf['time'])
-
-    # 过滤掉 2039 年的数据
-    findf = findf[findf['time'].dt.year != 2039]
-    nochgdf = nochgdf[nochgdf['time'].dt.year != 2039]
-
-    # 保存时间列
-    time_col_findf = findf['time'].dt.year
-    time_col_nochgdf = nochgdf['time'].dt.year
-
-    # 按年份分组并计算平均值，不包含时间列
-    findf = findf.drop(columns=['time']).groupby(time_col_findf).mean()
-    nochgdf = nochgdf.drop(columns=['time']).groupby(time_col_nochgdf).mean()
-
-    # 重新添加时间列
-    findf['time'] = findf.index
-    nochgdf['time'] = nochgdf.index
-    # print(findf)
-    # 重置索引
-    findf = findf.reset_index(drop=True)
-    nochgdf = nochgdf.reset_index(drop=True)
-
-    return findf, nochgdf
-
-(findf, nochgdf) = read_data(cfg.fldmean_fin, cfg.fldmean_nochg, file_name)
-(cnfindf, cnnochgdf) = read_data(cfg.cnmean_fin, cfg.cnmean_nochg, file_name)
+# 从年/季节聚合存储中读取各区域的年均序列
+store = AggregateStore()
+(findf, nochgdf) = store.frames('surface', 'Global')
+(cnfindf, cnnochgdf) = store.frames('surface', 'China')
 boxdata = []
-i = 0
-for box in cfg.box_list:
-    
-    (box_name, lon1, lon2, lat1, lat2) = box
-    boxfindf = pd.read_csv(cfg.box_fin_dir + box_name + "/boxfldmean/" + file_name)
-    boxnochgdf = pd.read_csv(cfg.box_nochg_dir + box_name + "/boxfldmean/" + file_name)
-    # 将时间列转换为 datetime 类型
-    boxfindf['time'] = pd.to_datetime(boxfindf['time'])
-    boxnochgdf['time'] = pd.to_datetime(boxnochgdf['time'])
-
-
-    # 过滤掉 2039 年的数据
-    boxfindf = boxfindf[boxfindf['time'].dt.year != 2039]
-    boxnochgdf = boxnochgdf[boxnochgdf['time'].dt.year != 2039]
-
-    # 保存时间列
-    time_col_boxcolfindf = boxfindf['time'].dt.year
-    time_col_boxcolnochgdf = boxnochgdf['time'].dt.year
-
-    # 按年份分组并计算平均值，不包含时间列
-    boxfindf = boxfindf.drop(columns=['time']).groupby(time_col_boxcolfindf).mean()
-    boxnochgdf = boxnochgdf.drop(columns=['time']).groupby(time_col_boxcolnochgdf).mean()
-
-    # 重新添加时间列
-    boxfindf['time'] = boxfindf.index
-    boxnochgdf['time'] = boxnochgdf.index
-
-    # 重置索引
-    boxfindf = boxfindf.reset_index(drop=True)
-    boxnochgdf = boxnochgdf.reset_index(drop=True)
-
-    boxdata.append((cfg.Enbox_list[i][0], boxfindf, boxnochgdf))
-    i += 1
+for box, enbox in zip(cfg.box_list, cfg.Enbox_list):
+    (boxfindf, boxnochgdf) = store.frames('surface', box[0])
+    boxdata.append((enbox[0], boxfindf, boxnochgdf))
 
 if not os.path.exists(output_dir):
     os.makedirs(output_dir)
@@ -92,30 +42,9 @@ if not os.path.exists(output_dir):
 # 设置图片清晰度
 plt.rcParams['figure.dpi'] = 300
 
-# 计算偏离率并求历年平均
-deviation_rates = {}
-
-# 全局数据
-global_diff = findf.drop(columns=['time']) - nochgdf.drop(columns=['time'])
-global_deviation_rate = global_diff / nochgdf.drop(columns=['time'])
-global_avg_deviation_rate = global_deviation_rate[-5:].mean()
-deviation_rates['Global'] = global_avg_deviation_rate
-
-# 中国数据
-china_diff = cnfindf.drop(columns=['time']) - cnnochgdf.drop(columns=['time'])
-china_deviation_rate = china_diff / cnnochgdf.drop(columns=['time'])
-china_avg_deviation_rate = china_deviation_rate[-5:].mean()
-deviation_rates['China'] = china_avg_deviation_rate
-
-# 各个区域数据
-for box_name, boxfindf, boxnochgdf in boxdata:
-    box_diff = boxfindf.drop(columns=['time']) - boxnochgdf.drop(columns=['time'])
-    box_deviation_rate = box_diff / boxnochgdf.drop(columns=['time'])
-    box_avg_deviation_rate = box_deviation_rate[-5:].mean()
-    deviation_rates[box_name] = box_avg_deviation_rate
-
-# 将结果保存为 DataFrame
-result_df = pd.DataFrame(deviation_rates)
+# 计算偏离率并求近 5 年平均（全部变量、区域一次计算）
+box_labels = {box[0]: enbox[0] for box, enbox in zip(cfg.box_list, cfg.Enbox_list)}
+result_df = deviation_rates(store, 'surface', window='last5', labels=box_labels)
 
 # 保存为 CSV 文件
 result_df.to_csv(os.path.join(output_dir, 'deviation_rates.csv'))
@@ -132,8 +61,6 @@ for column in findf.columns:
         cnfindf['time'] = pd.to_datetime(cnfindf['time'], format='%Y')
         nochgdf['time'] = pd.to_datetime(nochgdf['time'], format='%Y')
         cnnochgdf['time'] = pd.to_datetime(cnnochgdf['time'], format='%Y')
-        china_diff['time'] = pd.to_datetime(cnnochgdf['time'], format='%Y')
-        global_diff['time'] = pd.to_datetime(cnnochgdf['time'], format='%Y')
         
         # 创建包含三个子图的画布
         y_min = min(findf[column].min(), cnfindf[column].min(),
@@ -0,0 +1,66 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "model"))
+
+from ccm_screening import lagged_correlation, screen_pairs  # noqa: E402
+
+'''
+    CCM 预筛选：滞后相关应为每个滞后上重叠段的 Pearson 相关，
+    相互独立的噪声几乎全部不通过，滞后耦合的变量对通过传递熵检验
+'''
+
+N = 300
+
+
+def brute_lagged(a, b, k):
+    if k >= 0:
+        return np.corrcoef(a[:N - k], b[k:])[0, 1]
+    return np.corrcoef(a[-k:], b[:N + k])[0, 1]
+
+
+def test_lagged_correlation_matches_corrcoef():
+    # 随机游走各段均值差别很大，按全序列均值方差归一化时 |r| 会超过 1
+    walks = np.random.default_rng(0).normal(size=(N, 4)).cumsum(axis=0)
+    r, lag = lagged_correlation(walks, max_lag=10)
+    assert np.abs(r).max() <= 1
+    for a in range(4):
+        for b in range(4):
+            curve = np.array([brute_lagged(walks[:, a], walks[:, b], k) for k in range(-10, 11)])
+            best = np.argmax(np.abs(curve))
+            assert r[a, b] == pytest.approx(curve[best])
+            assert lag[a, b] == best - 10
+
+
+def test_lagged_correlation_finds_lead():
+    x = np.random.default_rng(1).normal(size=N)
+    values = np.column_stack([x, np.roll(x, 5)])
+    r, lag = lagged_correlation(values, max_lag=24)
+    assert r[0, 1] == pytest.approx(1)
+    assert lag[0, 1] == 5 and lag[1, 0] == -5
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_independent_noise_is_rejected(seed):
+    rng = np.random.default_rng(seed)
+    noise = pd.DataFrame(rng.normal(size=(N, 40)), columns=[f'v{i}' for i in range(40)])
+    table = screen_pairs(noise, list(noise.columns), seed=seed)
+    assert len(table) == 780
+    assert table['passed'].mean() < 0.02
+
+
+def test_coupled_pair_passes_transfer_entropy():
+    rng = np.random.default_rng(3)
+    x = rng.normal(size=N)
+    y = np.zeros(N)
+    for t in range(1, N):
+        y[t] = 0.3 * y[t - 1] + 0.8 * x[t - 1] + 0.5 * rng.normal()
+    data = pd.DataFrame(rng.normal(size=(N, 10)), columns=[f'v{i}' for i in range(10)])
+    data['x'], data['y'] = x, y
+    # 相关阈值设得很高，只看传递熵
+    table = screen_pairs(data, list(data.columns), corr_threshold=0.99).set_index(['key1', 'key2'])
+    row = table.loc[('x', 'y')]
+    assert row['passed'] and row['q_12'] < 0.05 and row['te_12'] > 0
+    assert table['passed'].sum() <= 2
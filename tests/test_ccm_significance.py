@@ -0,0 +1,56 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "model"))
+
+from ccm_significance import significance_table, surrogate_pvalue  # noqa: E402
+
+'''
+    CCM 收敛性与显著性：
+    相互独立、各自带趋势和年循环的序列（按时间顺序增大库时 rho(L) 会随趋势上升）及相互独立的白噪声
+    不应判为收敛，耦合 logistic 映射（x 驱动 y，y 的影子流形可以预测 x）应判为收敛且显著
+'''
+
+N = 288
+LIB_SIZES = range(26, N - 26 + 1)
+
+
+def coupled_logistic(n=N):
+    x = np.zeros(n)
+    y = np.zeros(n)
+    x[0], y[0] = 0.4, 0.2
+    for t in range(n - 1):
+        x[t + 1] = x[t] * (3.8 - 3.8 * x[t] - 0.02 * y[t])
+        y[t + 1] = y[t] * (3.5 - 3.5 * y[t] - 0.1 * x[t])
+    return x, y
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_independent_series_do_not_converge(seed):
+    rng = np.random.default_rng(seed)
+    t = np.arange(N)
+    data = pd.DataFrame({
+        'a': 0.01 * t + np.sin(2 * np.pi * t / 12) + rng.normal(0, 0.5, N),
+        'b': 0.02 * t + np.cos(2 * np.pi * t / 12) + rng.normal(0, 0.5, N),
+        'c': rng.normal(size=N),
+        'd': rng.normal(size=N),
+    })
+    table = significance_table(data, [('a', 'b', 3), ('c', 'd', 3)], LIB_SIZES, n_surrogates=50, max_workers=1)
+    assert len(table) == 4
+    assert not table['significant'].any()
+
+
+def test_coupled_logistic_converges():
+    x, y = coupled_logistic()
+    table = significance_table(pd.DataFrame({'x': x, 'y': y}), [('x', 'y', 3)], LIB_SIZES,
+                               n_surrogates=50, max_workers=1)
+    row = table.set_index(['key1', 'key2']).loc[('y', 'x')]
+    assert row['delta_rho'] > 0.2
+    assert row['significant']
+
+
+def test_surrogate_pvalue_missing_observed():
+    assert np.isnan(surrogate_pvalue(np.nan, np.array([0.1, 0.2])))
+    assert surrogate_pvalue(0.5, np.array([0.1, 0.6, np.nan])) == pytest.approx(2 / 3)
@@ -0,0 +1,42 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import xarray as xr
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "emissions"))
+
+from emission_merge import write_streamed  # noqa: E402
+
+'''
+    排放文件合并：输出时间轴为各文件时次的并集，重叠时次取排在前面的文件，
+    缺少某变量或某维度的文件按缺测 / 广播补齐
+'''
+
+
+def part(path, start, periods, value, lev=False):
+    time = pd.date_range(start, periods=periods, freq='MS')
+    shape = (periods, 2, 3, 2) if lev else (periods, 2, 3)
+    dims = ('time', 'lat', 'lon', 'lev') if lev else ('time', 'lat', 'lon')
+    data = {'HCl_ene': (dims, np.full(shape, value, dtype=np.float64))}
+    if lev:
+        data['HCl_agri'] = (dims, np.full(shape, -value, dtype=np.float64))
+    ds = xr.Dataset(data, coords={'time': time, 'lat': [10.0, 20.0], 'lon': [100.0, 110.0, 120.0]})
+    ds.to_netcdf(path)
+    return str(path)
+
+
+def test_overlap_keeps_first_part(tmp_path):
+    # ACEIC 式的 2018 全年在前，GEHC 式的 2017-06 到 2019-05 在后，与 2018 年重叠
+    first = part(tmp_path / 'a.nc', '2018-01-01', 12, 1.0)
+    second = part(tmp_path / 'b.nc', '2017-06-01', 24, 2.0, lev=True)
+    output = str(tmp_path / 'merged.nc')
+    write_streamed([first, second], output)
+    with xr.open_dataset(output) as ds:
+        times = pd.DatetimeIndex(ds['time'].values)
+        assert list(times) == list(pd.date_range('2017-06-01', '2019-05-01', freq='MS'))
+        ene = ds['HCl_ene'].isel(lat=0, lon=0, lev=0).values
+        in_2018 = times.year == 2018
+        assert (ene[in_2018] == 1).all() and (ene[~in_2018] == 2).all()
+        # 前一个文件没有 HCl_agri，重叠时次保持缺测
+        agri = ds['HCl_agri'].isel(lat=0, lon=0, lev=0).values
+        assert np.isnan(agri[in_2018]).all() and (agri[~in_2018] == -2).all()
@@ -0,0 +1,45 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "model"))
+
+xr = pytest.importorskip("xarray")
+pytest.importorskip("netCDF4")
+from nc_writer import write_netcdf, PRESETS  # noqa: E402
+
+'''
+    nc_writer 往返测试：源文件 time 为无限维、带标量坐标 lev，
+    各预设写出后数值、坐标与无限维不变，且不留下临时文件
+'''
+
+
+@pytest.fixture
+def source(tmp_path):
+    rng = np.random.default_rng(0)
+    ds = xr.Dataset({
+        'T': (('time', 'lat', 'lon'), rng.random((5, 30, 40)), {'units': 'K'}),
+        'area': (('lat', 'lon'), rng.random((30, 40))),
+        'tb': (('time',), np.arange(5.)),
+    }, coords={'time': pd.date_range('2000', periods=5, freq='MS'),
+               'lat': np.linspace(-10, 10, 30), 'lon': np.arange(40.)})
+    ds = ds.assign_coords(lev=1000.)
+    path = tmp_path / "src.nc"
+    ds.to_netcdf(path, unlimited_dims=['time'])
+    with xr.open_dataset(path) as opened:
+        yield opened
+
+
+@pytest.mark.parametrize('preset', list(PRESETS))
+def test_round_trip_unlimited(source, tmp_path, preset):
+    output_file = str(tmp_path / f"{preset}.nc")
+    write_netcdf(source, output_file, preset=preset)
+    with xr.open_dataset(output_file) as result:
+        atol = 1e-6 if result['T'].dtype == np.float32 else 0
+        np.testing.assert_allclose(result['T'].values, source['T'].values, atol=atol)
+        np.testing.assert_allclose(result['area'].values, source['area'].values, atol=atol)
+        assert 'lev' in result.coords
+        assert result['T'].attrs['units'] == 'K'
+        assert set(result.encoding.get('unlimited_dims', ())) == {'time'}
+    assert sorted(os.listdir(tmp_path)) == sorted(["src.nc", f"{preset}.nc"])
@@ -0,0 +1,102 @@
+import os
+import sys
+import numpy as np
+import pytest
+from scipy import stats
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "model"))
+
+from series_stats import lag_correlation, linear_trend, mann_kendall, theil_sen  # noqa: E402
+
+'''
+    批量时间序列统计：与逐条序列的 numpy / scipy 结果比对，
+    缺测只去掉对应时次，Mann–Kendall 的 S 与含结值修正的 p 值与逐点对求和一致
+'''
+
+T = 60
+
+
+def series(seed=0, rows=8, missing=0.0):
+    rng = np.random.default_rng(seed)
+    values = 0.05 * np.arange(T) + np.sin(np.arange(T) / 3) + rng.normal(size=(rows, T))
+    values[rng.random(values.shape) < missing] = np.nan
+    return values
+
+
+@pytest.mark.parametrize('missing', [0.0, 0.2])
+def test_linear_trend_matches_polyfit(missing):
+    values = series(missing=missing)
+    t = np.linspace(2000, 2005, T)
+    slope, intercept = linear_trend(values, t)
+    for k, y in enumerate(values):
+        finite = np.isfinite(y)
+        expected = np.polyfit(t[finite], y[finite], 1)
+        np.testing.assert_allclose([slope[k], intercept[k]], expected, rtol=1e-8)
+
+
+def test_linear_trend_short_series_is_nan():
+    values = np.full((2, T), np.nan)
+    values[1, 3] = 1.0
+    slope, intercept = linear_trend(values)
+    assert np.isnan(slope).all() and np.isnan(intercept).all()
+
+
+@pytest.mark.parametrize('missing', [0.0, 0.2])
+def test_lag_correlation_matches_corrcoef(missing):
+    values = series(1, missing=missing)
+    r = lag_correlation(values, 12)
+    for k, y in enumerate(values):
+        a, b = y[:-12], y[12:]
+        finite = np.isfinite(a) & np.isfinite(b)
+        assert r[k] == pytest.approx(np.corrcoef(a[finite], b[finite])[0, 1])
+
+
+@pytest.mark.parametrize('missing', [0.0, 0.2])
+def test_theil_sen_matches_scipy(missing):
+    values = series(2, missing=missing)
+    t = np.linspace(2000, 2005, T)
+    slope, intercept = theil_sen(values, t)
+    for k, y in enumerate(values):
+        finite = np.isfinite(y)
+        expected = stats.theilslopes(y[finite], t[finite])
+        assert slope[k] == pytest.approx(expected.slope)
+        assert intercept[k] == pytest.approx(expected.intercept)
+
+
+def brute_mann_kendall(y):
+    """逐点对求 S，方差按各组相等值个数做结值修正"""
+    y = y[np.isfinite(y)]
+    n = len(y)
+    s = sum(np.sign(y[j] - y[i]) for i in range(n) for j in range(i + 1, n))
+    _, counts = np.unique(y, return_counts=True)
+    var = (n * (n - 1) * (2 * n + 5) - (counts * (counts - 1) * (2 * counts + 5)).sum()) / 18
+    z = (s - np.sign(s)) / np.sqrt(var)
+    return s, 2 * stats.norm.sf(abs(z))
+
+
+@pytest.mark.parametrize('missing', [0.0, 0.2])
+def test_mann_kendall_matches_brute_force_with_ties(missing):
+    values = np.round(series(3, missing=missing))  # 取整产生大量结值
+    s, z, p = mann_kendall(values)
+    for k, y in enumerate(values):
+        expected_s, expected_p = brute_mann_kendall(y)
+        assert s[k] == expected_s
+        assert p[k] == pytest.approx(expected_p)
+
+
+def test_mann_kendall_all_nan_is_nan():
+    s, z, p = mann_kendall(np.full((2, T), np.nan))
+    assert (s == 0).all() and np.isnan(z).all() and np.isnan(p).all()
+
+
+def test_trend_map_keeps_empty_cells_nan():
+    pytest.importorskip("shapely")  # trend_map 经 province_emissions 依赖 shapely
+    from trend_map import trend_map
+    values = series(4, rows=6).T.reshape(T, 2, 3)
+    values[:, 0, 1] = np.nan
+    values[::3, 1, 2] = np.nan  # 部分缺测的格点仍计算
+    ds = trend_map(values, np.arange(T) / 12, lat=[10, 20], lon=[100, 110, 120])
+    for name in ['slope', 'intercept', 'S', 'z', 'p']:
+        assert np.isnan(ds[name].values[0, 1])
+        assert np.isfinite(ds[name].values[1, 2])
+    slope, _ = theil_sen(values[:, 1, 2], np.arange(T) / 12)
+    assert ds['slope'].values[1, 2] == pytest.approx(slope)
@@ -0,0 +1,66 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "model"))
+
+from smap import THETAS, interaction_strengths, smap  # noqa: E402
+
+'''
+    S-map：批量求解的局部回归系数应与 pyEDM SMap（embedded=True，默认 lstsq 求解）逐点一致，
+    interaction_strengths 在标准化时应换回原始单位
+'''
+
+N = 200
+
+
+def coupled_logistic(n=N):
+    x, y, z = np.zeros(n), np.zeros(n), np.zeros(n)
+    x[0], y[0], z[0] = 0.4, 0.2, 0.3
+    for t in range(n - 1):
+        x[t + 1] = x[t] * (3.8 - 3.8 * x[t] - 0.02 * y[t])
+        y[t + 1] = y[t] * (3.5 - 3.5 * y[t] - 0.1 * x[t])
+        z[t + 1] = z[t] * (3.7 - 3.7 * z[t] - 0.2 * y[t])
+    # 各变量量级不同，检验单位换算
+    return pd.DataFrame({'x': x, 'y': 10 * y, 'z': 0.1 * z})
+
+
+def pyedm_coefficients(frame, theta):
+    pyEDM = pytest.importorskip("pyEDM")
+    data = frame.reset_index(drop=True).rename_axis('time').reset_index()
+    out = pyEDM.SMap(dataFrame=data, columns='x y z', target='y', lib=[1, N], pred=[1, N - 1],
+                     E=3, theta=theta, embedded=True, Tp=1)
+    coefficients = out['coefficients'].iloc[:, 1:].to_numpy()
+    return coefficients[np.isfinite(coefficients).all(axis=1)]
+
+
+def test_theta_sweep_matches_pyedm():
+    frame = coupled_logistic()
+    result = smap(frame, 'y', ['x', 'y', 'z'], standardize=False)
+    for i, theta in enumerate(THETAS):
+        np.testing.assert_allclose(result['coefficients'][i], pyedm_coefficients(frame, theta), atol=1e-10)
+
+
+def test_interaction_strengths_in_original_units():
+    frame = coupled_logistic()
+    jacobian, theta, skill = interaction_strengths(frame, 'y', ['x', 'y', 'z'])
+    standardized = (frame - frame.mean()) / frame.std()
+    expected = pyedm_coefficients(standardized, theta)[:, 1:] * (frame['y'].std() / frame.std().values)
+    assert list(jacobian.columns) == ['dy/dx', 'dy/dy', 'dy/dz']
+    np.testing.assert_allclose(jacobian.to_numpy(), expected, atol=1e-10)
+
+
+def test_collinear_columns_match_lstsq():
+    # 重复列使法方程奇异，应与 lstsq 一样给出最小范数解
+    frame = coupled_logistic()
+    frame['x2'] = frame['x']
+    result = smap(frame, 'y', ['x', 'x2', 'y'], thetas=[2], standardize=False)
+    X, y = frame[['x', 'x2', 'y']].to_numpy()[:-1], frame['y'].to_numpy()[1:]
+    A = np.hstack([np.ones((len(X), 1)), X])
+    row = 50
+    dist = np.sqrt(((X - X[row]) ** 2).sum(axis=1))
+    w = np.exp(-2 * dist / (dist.sum() / (len(X) - 1)))
+    w[row] = 0
+    expected = np.linalg.lstsq(w[:, None] * A, w * y, rcond=None)[0]
+    np.testing.assert_allclose(result['coefficients'][0, row], expected, atol=1e-10)